@@ -0,0 +1,88 @@
+"""Signing operations per route update cycle and per FLOOD as degree grows.
+
+A router with N neighbors learns routes to a synthetic topology of --routers
+routers, and --churn of them change next hop every cycle. Every cycle it
+sends its route updates and originates a FLOOD. Route updates and FLOODs are
+signed once and sent to all neighbors, they used to be signed once per
+neighbor.
+
+    python3 -m benchmarks.broadcast_signing [--degrees N N ...]
+        [--routers N] [--churn N] [--cycles N] [--scheme rsa_pss|ed25519]
+"""
+import argparse
+import random
+
+from sim.basic_router import BasicRouter
+from sim.codec import WireFormat
+from sim.signatures import SignatureScheme
+from sim.topology import address
+
+from benchmarks.route_updates import CountingSocket
+
+
+def run(args, degree):
+    """Runs args.cycles update cycles with degree neighbors.
+    @return     (signatures per cycle, signatures per FLOOD, ms signing per
+                cycle, bytes sent per cycle)
+    """
+    rng = random.Random(0)
+    router = BasicRouter('10.255.255.255', test=True,
+                         wire_format=WireFormat.BINARY,
+                         scheme=SignatureScheme[args.scheme.upper()],
+                         full_sync_interval=args.cycles + 1)
+    neighbors = [address(i) for i in range(degree)]
+    sockets = []
+    for neighbor in neighbors:
+        router.neighbors.add(neighbor)
+        router.sockets[neighbor] = CountingSocket()
+        sockets.append(router.sockets[neighbor])
+        router.routes[neighbor] = neighbor
+    destinations = [address(i) for i in range(degree, args.routers)]
+    for dst in destinations:
+        router.routes[dst] = rng.choice(neighbors)
+    # The first cycle sends every neighbor the full table
+    router.send_route_updates()
+    for s in sockets:
+        s.bytes = 0
+
+    signed = router.metrics.sign_seconds
+    updates = floods = seconds = 0
+    for i in range(args.cycles):
+        for dst in rng.sample(destinations, args.churn):
+            router.routes[dst] = rng.choice(neighbors)
+        count, total = signed.count, signed.sum
+        router.send_route_updates()
+        updates += signed.count - count
+        count = signed.count
+        router.send_flood(rng.choice(destinations), 'hello-{}'.format(i))
+        floods += signed.count - count
+        seconds += signed.sum - total
+    return (
+        updates / args.cycles,
+        floods / args.cycles,
+        seconds / args.cycles * 1e3,
+        sum(s.bytes for s in sockets) / args.cycles,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--degrees', type=int, nargs='+',
+                        default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--churn', type=int, default=10)
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--scheme', default='rsa_pss',
+                        choices=[s.name.lower() for s in SignatureScheme])
+    args = parser.parse_args()
+
+    print('{:<8}{:>16}{:>16}{:>16}{:>16}'.format(
+        'degree', 'signs/cycle', 'signs/flood', 'sign ms/cycle',
+        'bytes/cycle'))
+    for degree in args.degrees:
+        updates, floods, ms, sent = run(args, degree)
+        print('{:<8}{:>16.1f}{:>16.1f}{:>16.2f}{:>16.0f}'.format(
+            degree, updates, floods, ms, sent))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Encode/decode throughput of the JSON and binary BBBPacket wire formats.
+
+    python3 -m benchmarks.codec_throughput [--packets N]
+"""
+import argparse
+import time
+
+from sim.base import BBBPacket, BBBPacketType, PACKET_LEN
+from sim.basic_router import BasicRouter
+from sim.codec import FrameReader, WireFormat, encode_packet
+
+
+PAYLOAD_SIZES = [16, 256, 4096]
+
+
+def bench(packets, wire_format):
+    """Returns (encoded bytes per packet, encodes/sec, decodes/sec).
+    """
+    start = time.perf_counter()
+    encoded = [encode_packet(packet, wire_format) for packet in packets]
+    encode_rate = len(packets) / (time.perf_counter() - start)
+
+    stream = b''.join(encoded)
+    start = time.perf_counter()
+    decoded = sum(1 for _ in FrameReader().feed(stream))
+    decode_rate = decoded / (time.perf_counter() - start)
+    return len(stream) / len(packets), encode_rate, decode_rate
+
+
+def fits_json(packet):
+    """
+    @return     True if packet fits in the JSON format's PACKET_LEN bytes
+    """
+    try:
+        packet.to_bytes()
+        return True
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=20000)
+    args = parser.parse_args()
+
+    router = BasicRouter('10.0.0.1', test=True)
+    template = BBBPacket('10.0.0.1', '10.0.0.2', BBBPacketType.FLOOD, '', 0)
+    router.sign(template)
+
+    print('{:<8}{:>8}{:>12}{:>14}{:>14}'.format(
+        'format', 'payload', 'bytes/pkt', 'encodes/sec', 'decodes/sec'))
+    for size in PAYLOAD_SIZES:
+        # Signatures do not matter to the codec, reuse a single one
+        packets = [
+            BBBPacket('10.0.0.1', '10.0.0.2', BBBPacketType.FLOOD, 'x' * size,
+                      seq, signature=template.signature)
+            for seq in range(args.packets)
+        ]
+        for wire_format in WireFormat:
+            if wire_format == WireFormat.JSON and not fits_json(packets[0]):
+                print('{:<8}{:>8}  does not fit in {} bytes'.format(
+                    wire_format.name, size, PACKET_LEN))
+                continue
+            size_per_packet, encode_rate, decode_rate = bench(packets, wire_format)
+            print('{:<8}{:>8}{:>12.0f}{:>14.0f}{:>14.0f}'.format(
+                wire_format.name, size, size_per_packet, encode_rate,
+                decode_rate))
+
+if __name__ == "__main__":
+    main()
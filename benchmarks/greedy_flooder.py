@@ -0,0 +1,165 @@
+"""Goodput honest sources keep while a GreedyFloodingRouter floods at its
+maximum rate, with a single FIFO send queue versus NPBR style per-source
+buffers and deficit round-robin (FairSendQueue).
+
+--honest sources send DATA packets at --rate packets/sec each, and a greedy
+source as fast as it can, through one router to a destination behind a link
+of --link-mbps. The router drops packets once the buffer of their source,
+or its whole queue without fair queuing, holds --buffer packets. The fair
+run uses the router's default queueing.
+
+    python3 -m benchmarks.greedy_flooder [--honest N] [--rate PPS]
+        [--link-mbps M] [--buffer N] [--seconds S]
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+from sim.base import BBBPacketType, ROUTER_PORT
+from sim.basic_router import BasicRouter
+from sim.byzantine_routers import GreedyFloodingRouter
+from sim.codec import FrameReader, WireFormat
+from sim.send_queue import BackpressurePolicy
+from sim.signatures import SignatureScheme
+
+
+DESTINATION = '10.0.1.1'
+
+
+class Wire(object):
+    """Stands in for a source's socket to the router, hands the frames
+    written to it to the router like its client thread would.
+    """
+    def __init__(self, router, src):
+        self.router = router
+        self.address = (src, ROUTER_PORT)
+        self.reader = FrameReader()
+        self.closed = False
+
+    def sendall(self, data):
+        if self.closed:
+            raise ConnectionError('wire closed')
+        for packet in self.reader.feed(data):
+            self.router.receive_packet(packet, self.address)
+
+
+class Link(object):
+    """Stands in for the router's socket to the destination. Takes as long
+    to write as a link of mbps would, and counts the packets of every
+    source that made it through.
+    """
+    def __init__(self, mbps):
+        self.bytes_per_second = mbps * 1e6 / 8
+        self.reader = FrameReader()
+        self.received = Counter()
+
+    def sendall(self, data):
+        time.sleep(len(data) / self.bytes_per_second)
+        for packet in self.reader.feed(data):
+            self.received[packet.src] += 1
+
+
+def source(router_cls, ip, router):
+    """
+    @return     router_cls instance at ip, connected to router
+    """
+    src = router_cls(ip, test=True, wire_format=WireFormat.BINARY,
+                     scheme=SignatureScheme.ED25519)
+    src.neighbors.add(router.ip_address)
+    src.sockets[router.ip_address] = Wire(router, ip)
+    src.routes[DESTINATION] = router.ip_address
+    router.keys[ip] = src.public_key
+    router.neighbors.add(ip)
+    return src
+
+
+def send_honest(src, rate, seconds, sent):
+    """Sends DATA packets from src at rate packets/sec.
+    """
+    for i in range(int(rate * seconds)):
+        src.send_data(DESTINATION, 'hello-{}'.format(i))
+        sent[src.ip_address] += 1
+        time.sleep(1 / rate)
+
+
+def send_greedy(src):
+    """Sends DATA packets from src until its wire is closed.
+    """
+    try:
+        src.send_hello_flood(DESTINATION, 10 ** 9,
+                             packet_type=BBBPacketType.DATA)
+    except ConnectionError:
+        pass
+
+
+def run(args, fair_queuing):
+    """
+    @return     (honest packets sent, honest packets delivered, greedy
+                packets delivered)
+    """
+    if fair_queuing:
+        # The router's default queueing
+        queueing = {}
+    else:
+        # Dropping, so the greedy source cannot block the honest ones on
+        # their way into the queue
+        queueing = dict(fair_queuing=False,
+                        backpressure=BackpressurePolicy.DROP_NEWEST)
+    router = BasicRouter('10.0.0.1', test=True,
+                         wire_format=WireFormat.BINARY,
+                         scheme=SignatureScheme.ED25519,
+                         send_queue_len=args.buffer, **queueing)
+    link = Link(args.link_mbps)
+    router.neighbors.add(DESTINATION)
+    router.routes[DESTINATION] = DESTINATION
+    router.register_socket(DESTINATION, link)
+
+    greedy = source(GreedyFloodingRouter, '10.0.2.1', router)
+    honest = [source(BasicRouter, '10.0.3.{}'.format(i + 1), router)
+              for i in range(args.honest)]
+    sent = Counter()
+    threading.Thread(target=send_greedy, args=(greedy,), daemon=True).start()
+    threads = [
+        threading.Thread(target=send_honest,
+                         args=(src, args.rate, args.seconds, sent))
+        for src in honest
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    greedy.sockets[router.ip_address].closed = True
+    # Let the queue drain
+    deadline = time.monotonic() + 2
+    while router.send_queues[DESTINATION].depth() and \
+            time.monotonic() < deadline:
+        time.sleep(0.05)
+    router.unregister_socket(DESTINATION, link)
+    return (
+        sum(sent.values()),
+        sum(link.received[src.ip_address] for src in honest),
+        link.received[greedy.ip_address],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--honest', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=20)
+    parser.add_argument('--link-mbps', type=float, default=0.5)
+    parser.add_argument('--buffer', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print('{:<10}{:>14}{:>18}{:>12}{:>18}'.format(
+        'queueing', 'honest sent', 'honest delivered', 'goodput',
+        'greedy delivered'))
+    for name, fair_queuing in [('fifo', False), ('fair', True)]:
+        sent, delivered, greedy = run(args, fair_queuing)
+        print('{:<10}{:>14}{:>18}{:>11.1f}%{:>18}'.format(
+            name, sent, delivered, delivered / sent * 100 if sent else 0,
+            greedy))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Import time of the sim entry points, measured with python -X importtime.
+
+Every module is imported in a fresh interpreter --runs times. Reports the
+median cumulative import time of the module and the imports it pulled in
+that took longest.
+
+    python3 -m benchmarks.import_time [--runs N] [--top N] [module ...]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+
+MODULES = ['sim.master', 'sim.basic_router', 'sim.byzantine_routers']
+
+
+def import_times(module):
+    """Imports module in a new interpreter.
+    @return     dict of imported module name: cumulative microseconds, for
+                the imports of module only
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, check=True,
+        universal_newlines=True,
+    )
+    times = {}
+    lines = [l for l in result.stderr.splitlines()
+             if l.startswith('import time:') and '|' in l]
+    # Imports are reported children first, so the imports of module are
+    # the lines after the last top level import before it
+    top_level = [i for i, l in enumerate(lines)
+                 if not l.rsplit('|', 1)[1].startswith('  ')]
+    last = top_level.index(next(i for i in top_level
+                                if lines[i].rsplit('|', 1)[1].strip()
+                                == module))
+    first = top_level[last - 1] + 1 if last else 0
+    for line in lines[first:top_level[last] + 1]:
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = defaultdict(list)
+        for _ in range(args.runs):
+            for name, us in import_times(module).items():
+                runs[name].append(us)
+        total = statistics.median(runs.pop(module))
+        print('{:<28}{:>10.1f} ms'.format(module, total / 1e3))
+        heaviest = sorted(runs.items(), key=lambda r: -statistics.median(r[1]))
+        for name, times in heaviest[:args.top]:
+            print('    {:<24}{:>10.1f} ms'.format(
+                name, statistics.median(times) / 1e3))
+
+if __name__ == "__main__":
+    main()
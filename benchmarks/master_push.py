@@ -0,0 +1,103 @@
+"""Time the Master takes to push a topology to many routers, with different
+numbers of push workers, on localhost. Also reports the bytes of the first
+push, which carries the list of all routers, and of a full push, which does
+not.
+
+    python3 -m benchmarks.master_push [--routers N] [--workers N N ...]
+"""
+import argparse
+import contextlib
+import json
+import os
+import selectors
+import socket
+import tempfile
+import threading
+
+from sim.base import ROUTER_PORT
+from sim.master import Master
+from sim.topology import generate
+
+
+class Sink(object):
+    """Listens on many router addresses and discards everything received,
+    on a single thread.
+    """
+    def __init__(self, ips):
+        self.selector = selectors.DefaultSelector()
+        self.bytes = 0
+        for ip in ips:
+            listener = socket.socket()
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((ip, ROUTER_PORT))
+            listener.listen(128)
+            listener.setblocking(False)
+            self.selector.register(listener, selectors.EVENT_READ, True)
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.data:
+                    client, _ = key.fileobj.accept()
+                    client.setblocking(False)
+                    self.selector.register(client, selectors.EVENT_READ, False)
+                    continue
+                try:
+                    data = key.fileobj.recv(65536)
+                except OSError:
+                    data = b''
+                if not data:
+                    self.selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                self.bytes += len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 16, 64])
+    args = parser.parse_args()
+
+    # Routers on 127.1.0.0/16, so the sink can listen on all of them
+    generated = generate('random-regular', args.routers, degree=4)
+    local = {
+        ip: '127.1.{}.{}'.format(i >> 8 & 255, i & 255)
+        for i, ip in enumerate(generated)
+    }
+    topology = {
+        local[ip]: dict(config, neighbors=[local[n]
+                                           for n in config['neighbors']])
+        for ip, config in generated.items()
+    }
+    Sink(topology)
+    fd, topo_path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(topology, f)
+
+    print('{:>8}{:>14}{:>14}{:>14}{:>14}{:>14}{:>8}'.format(
+        'workers', 'connect s', 'full push s', 'diff push s', 'first MB',
+        'full MB', 'failed'))
+    devnull = open(os.devnull, 'w')
+    try:
+        for workers in args.workers:
+            with contextlib.redirect_stdout(devnull):
+                master = Master(topo_path, workers=workers, test=True)
+                first = master.push()
+                master.push_count = 0   # force a full push over the pool
+                full = master.push()
+                # One router's config changes
+                host = next(iter(master.topology))
+                master.topology[host]['hosts'] = ['172.0.0.1']
+                diff = master.push()
+                master.stop()
+            print('{:>8}{:>14.3f}{:>14.3f}{:>14.4f}{:>14.2f}{:>14.2f}{:>8}'
+                  .format(workers, first['seconds'], full['seconds'],
+                          diff['seconds'], first['bytes'] / 1e6,
+                          full['bytes'] / 1e6,
+                          first['failed'] + full['failed'] + diff['failed']))
+    finally:
+        os.remove(topo_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Memory per packet in flight and per routing table entry.
+
+Packets are decoded from binary frames and kept alive, like packets queued
+in a router. Routes are learned from ROUTEUPDATE packets by --routers
+routers that all know the same --destinations, like in the simulator.
+
+    python3 -m benchmarks.memory_footprint [--packets N] [--routers N]
+                                           [--destinations N]
+"""
+import argparse
+import json
+import tracemalloc
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter, RECV_LEN
+from sim.codec import FrameReader, WireFormat, encode_packet
+from sim.signatures import SignatureScheme
+from sim.topology import address
+
+
+def traced(function):
+    """
+    @return     (bytes still allocated after calling function, its result)
+    """
+    tracemalloc.start()
+    result = function()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return allocated, result
+
+
+def packets(args):
+    """
+    @return     bytes per decoded packet
+    """
+    sender = BasicRouter('10.0.0.1', test=True, scheme=SignatureScheme.ED25519)
+    frames = []
+    for seq in range(args.packets):
+        packet = BBBPacket(address(seq % 256), address(seq % 256 + 256),
+                           BBBPacketType.FLOOD, 'hello-{}'.format(seq), seq)
+        sender.sign(packet)
+        frames.append(encode_packet(packet, WireFormat.BINARY))
+    stream = b''.join(frames)
+
+    def decode():
+        # Fed in chunks of one recv, like handle_client does
+        reader = FrameReader()
+        return [packet for i in range(0, len(stream), RECV_LEN)
+                for packet in reader.feed(stream[i:i + RECV_LEN])]
+
+    allocated, decoded = traced(decode)
+    return allocated / len(decoded)
+
+
+def routes(args):
+    """
+    @return     bytes per routing table entry
+    """
+    routers = [BasicRouter(address(i), test=True,
+                           scheme=SignatureScheme.ED25519)
+               for i in range(args.routers)]
+    neighbor = address(args.routers)
+    destinations = [address(args.routers + 1 + i)
+                    for i in range(args.destinations)]
+    # Every router decodes its own update, like it would from the wire
+    updates = [
+        FrameReader().feed(encode_packet(BBBPacket(
+            neighbor, router.ip_address, BBBPacketType.ROUTEUPDATE,
+            json.dumps(destinations), 0), WireFormat.BINARY))
+        for router in routers
+    ]
+
+    def learn():
+        for router, update in zip(routers, updates):
+            router.handle_routeupdate(next(update))
+            router.routes.pop_changes()
+        return routers
+
+    allocated, _ = traced(learn)
+    return allocated / sum(len(router.routes) for router in routers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=100000)
+    parser.add_argument('--routers', type=int, default=50)
+    parser.add_argument('--destinations', type=int, default=2000)
+    args = parser.parse_args()
+
+    print('{:<28}{:>10.1f}'.format('bytes per packet', packets(args)))
+    print('{:<28}{:>10.1f}'.format('bytes per route entry', routes(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Packets/sec the flood command originates at, signing on the CLI thread
+versus signing ahead on a SigningPipeline.
+
+The router has --neighbors neighbors, behind links that each take
+--link-mbps to write a packet. Without sign-ahead every packet is signed and
+then written, with it packets are signed while earlier ones are written.
+
+    python3 -m benchmarks.origination_rate [--packets N] [--neighbors N]
+        [--link-mbps M] [--workers N N ...] [--scheme rsa_pss|ed25519]
+"""
+import argparse
+import os
+import time
+
+from sim.basic_router import BasicRouter
+from sim.codec import WireFormat
+from sim.signatures import SignatureScheme
+
+
+class LinkSocket(object):
+    """Stands in for a neighbor's socket, takes as long to write as a link
+    of mbps would.
+    """
+    def __init__(self, mbps):
+        self.bytes_per_second = mbps * 1e6 / 8
+
+    def sendall(self, data):
+        time.sleep(len(data) / self.bytes_per_second)
+
+
+def run(args, workers):
+    """Floods args.packets packets.
+    @return     packets per second
+    """
+    router = BasicRouter('10.0.0.1', test=True,
+                         wire_format=WireFormat.BINARY,
+                         scheme=SignatureScheme[args.scheme.upper()],
+                         sign_workers=workers, metrics_port=0)
+    for i in range(args.neighbors):
+        neighbor = '10.1.0.{}'.format(i + 1)
+        router.neighbors.add(neighbor)
+        router.sockets[neighbor] = LinkSocket(args.link_mbps)
+    # Worker processes start with the first batch
+    if router.signing:
+        router.send_hello_flood('10.2.0.1', router.signing.batch_size,
+                                period=0)
+    rate = router.send_hello_flood('10.2.0.1', args.packets, period=0)
+    if router.signing:
+        router.signing.executor.shutdown()
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=500)
+    parser.add_argument('--neighbors', type=int, default=4)
+    parser.add_argument('--link-mbps', type=float, default=10)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count()}))
+    parser.add_argument('--scheme', default='rsa_pss',
+                        choices=[s.name.lower() for s in SignatureScheme])
+    args = parser.parse_args()
+
+    results = [('inline', run(args, 0))]
+    for workers in args.workers:
+        results.append(('{} workers'.format(workers), run(args, workers)))
+    print()
+    print('{:<16}{:>16}'.format('signing', 'packets/sec'))
+    for name, rate in results:
+        print('{:<16}{:>16.1f}'.format(name, rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""CPU time and bytes per route update cycle, full tables versus deltas.
+
+A router with --neighbors neighbors learns routes to a synthetic topology of
+--routers routers, and --churn of them change next hop every cycle.
+
+    python3 -m benchmarks.route_updates [--routers N] [--neighbors N]
+                                        [--churn N] [--cycles N]
+"""
+import argparse
+import random
+import time
+
+from sim.basic_router import BasicRouter
+from sim.codec import WireFormat
+from sim.signatures import SignatureScheme
+from sim.topology import address
+
+
+class CountingSocket(object):
+    """Stands in for a neighbor's socket, only counts what is written.
+    """
+    def __init__(self):
+        self.bytes = 0
+        self.packets = 0
+
+    def sendall(self, data):
+        self.bytes += len(data)
+        self.packets += 1
+
+
+def run(args, full_sync_interval):
+    """Runs args.cycles update cycles.
+    @return     (CPU ms per cycle, bytes per cycle, packets per cycle)
+    """
+    rng = random.Random(0)
+    router = BasicRouter('10.255.255.255', test=True,
+                         wire_format=WireFormat.BINARY,
+                         scheme=SignatureScheme.ED25519,
+                         full_sync_interval=full_sync_interval)
+    neighbors = [address(i) for i in range(args.neighbors)]
+    sockets = {}
+    for neighbor in neighbors:
+        router.neighbors.add(neighbor)
+        router.sockets[neighbor] = sockets[neighbor] = CountingSocket()
+        router.routes[neighbor] = neighbor
+    destinations = [address(i) for i in range(args.neighbors, args.routers)]
+    for dst in destinations:
+        router.routes[dst] = rng.choice(neighbors)
+    # The first cycle sends every neighbor its full table in both modes
+    router.send_route_updates()
+    for s in sockets.values():
+        s.bytes = s.packets = 0
+
+    cpu = 0
+    for _ in range(args.cycles):
+        for dst in rng.sample(destinations, args.churn):
+            router.routes[dst] = rng.choice(neighbors)
+        start = time.process_time()
+        router.send_route_updates()
+        cpu += time.process_time() - start
+    return (
+        cpu / args.cycles * 1e3,
+        sum(s.bytes for s in sockets.values()) / args.cycles,
+        sum(s.packets for s in sockets.values()) / args.cycles,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--neighbors', type=int, default=8)
+    parser.add_argument('--churn', type=int, default=10)
+    parser.add_argument('--cycles', type=int, default=50)
+    args = parser.parse_args()
+
+    print('{:<14}{:>14}{:>16}{:>16}'.format(
+        'mode', 'cpu ms/cycle', 'bytes/cycle', 'packets/cycle'))
+    for mode, interval in [('full table', 1), ('incremental', args.cycles + 1)]:
+        cpu, sent, packets = run(args, interval)
+        print('{:<14}{:>14.2f}{:>16.0f}{:>16.1f}'.format(
+            mode, cpu, sent, packets))
+
+if __name__ == "__main__":
+    main()
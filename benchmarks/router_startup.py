@@ -0,0 +1,123 @@
+"""Time from starting a router until it accepts connections.
+
+Compares the original startup, which generates a new packet key and
+registers it in BigchainDB before listening, with a key reused from disk and
+registration in the background. BigchainDB is stood in for by an in-process
+ledger that takes --bdb-latency seconds per request.
+
+    python3 -m benchmarks.router_startup [--runs N] [--bdb-latency S]
+"""
+import argparse
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from sim.base import ROUTER_PORT
+from sim.basic_router import BasicRouter
+from sim.keystore import load_or_generate
+from sim.signatures import SignatureScheme, get_scheme
+
+
+class SlowBigchainDB(object):
+    """Ledger of assets answering like the BigchainDB driver, after latency
+    seconds per request.
+    """
+    def __init__(self, latency):
+        self.latency = latency
+        self.assets = self
+        self.transactions = self
+        self.stored = []
+
+    def get(self, search):
+        time.sleep(self.latency)
+        return [{'data': data} for data in self.stored
+                if data['ip_address'] == search]
+
+    def prepare(self, operation, signers, asset):
+        time.sleep(self.latency)
+        return asset
+
+    def fulfill(self, transaction, private_keys):
+        return transaction
+
+    def send(self, transaction):
+        time.sleep(self.latency)
+        self.stored.append(transaction['data'])
+
+
+class Keypair(object):
+    public_key = private_key = None
+
+
+def start(ip_address, scheme, key_dir, bdb, background):
+    """Starts a router like RouterBase and serve do.
+    @return     (seconds until it accepted a connection, seconds until its
+                key was registered)
+    """
+    started = time.perf_counter()
+    router = BasicRouter(ip_address, test=True, scheme=scheme,
+                         key_dir=key_dir, metrics_port=0)
+    router.bdb = bdb
+    router.bdb_keypair = Keypair()
+    if not background:
+        router.register_key()
+    router.socket = socket.socket()
+    router.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    router.socket.bind((ip_address, ROUTER_PORT))
+    router.socket.listen()
+    if background:
+        threading.Thread(target=router.register_key, daemon=True).start()
+    threading.Thread(target=router.accept_connections, daemon=True).start()
+    socket.create_connection((ip_address, ROUTER_PORT)).close()
+    accepting = time.perf_counter() - started
+    router.registered.wait()
+    return accepting, time.perf_counter() - started
+
+
+def restarted(ip_address, scheme, key_dir, bdb):
+    """Stores a key for ip_address and registers it, like a router started
+    before would have.
+    """
+    implementation = get_scheme(scheme)
+    key = load_or_generate(key_dir, ip_address, implementation)
+    bdb.stored.append({
+        'public_key': implementation.export_public_key(
+            implementation.public_key(key)),
+        'signature_scheme': scheme.name,
+        'ip_address': ip_address,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--bdb-latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print('{:<10}{:<24}{:>14}{:>14}{:>14}'.format(
+        'scheme', 'startup', 'accepting s', 'max s', 'registered s'))
+    ips = ('127.2.{}.{}'.format(i >> 8, i & 255)
+           for i in range(1, 65536) if i & 255)
+    for scheme in SignatureScheme:
+        for name, restart in [('new key, blocking', False),
+                              ('stored key, background', True)]:
+            key_dir = tempfile.mkdtemp()
+            bdb = SlowBigchainDB(args.bdb_latency)
+            accepting, registered = [], []
+            for _ in range(args.runs):
+                ip = next(ips)
+                if restart:
+                    restarted(ip, scheme, key_dir, bdb)
+                a, r = start(ip, scheme, key_dir if restart else None, bdb,
+                             background=restart)
+                accepting.append(a)
+                registered.append(r)
+            shutil.rmtree(key_dir)
+            print('{:<10}{:<24}{:>14.3f}{:>14.3f}{:>14.3f}'.format(
+                scheme.name, name, sum(accepting) / len(accepting),
+                max(accepting), sum(registered) / len(registered)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Forwarding benchmark for the threaded BasicRouter and the AsyncRouter.
+
+Runs a localhost topology where a driver (posing as 127.0.N.1) sends signed
+FLOOD packets to the router under test (127.0.N.2), which floods them to a
+number of sink neighbors (127.0.N.3 and up). Every run uses its own N. Reports packets/sec seen at the
+sinks and the p50/p99 forwarding latency. With --trace-rate, also reports
+where the router spent the time of the traced packets, per stage.
+
+    python3 -m benchmarks.router_throughput [--packets N] [--neighbors K]
+                                            [--wire-format json|binary]
+                                            [--trace-rate RATE]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import socket
+import threading
+import time
+
+from sim.base import BBBPacket, BBBPacketType, ROUTER_PORT
+from sim.basic_router import BasicRouter
+from sim.async_router import AsyncRouter
+from sim.codec import FrameReader, WireFormat, encode_packet
+
+
+def listening_socket(ip_address):
+    """Returns a socket listening on ROUTER_PORT at ip_address.
+    """
+    s = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind((ip_address, ROUTER_PORT))
+    s.listen()
+    return s
+
+
+class Sink(object):
+    """Neighbor of the router under test that timestamps every FLOOD packet.
+    """
+    def __init__(self, ip_address, record):
+        self.socket = listening_socket(ip_address)
+        self.record = record
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        conn, _ = self.socket.accept()
+        reader = FrameReader()
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                return
+            for packet in reader.feed(data):
+                if packet.type == BBBPacketType.FLOOD:
+                    self.record(packet.seq)
+
+
+class Run(object):
+    """State of a single benchmark run against one router implementation.
+    """
+    def __init__(self, router_cls, neighbors, subnet, wire_format,
+                 trace_rate=0):
+        self.driver_ip = '127.0.{}.1'.format(subnet)
+        router_ip = '127.0.{}.2'.format(subnet)
+        self.received = {}
+        self.cond = threading.Condition()
+        self.sinks = []
+        self.neighbors = neighbors
+        self.wire_format = wire_format
+        self.router = router_cls(router_ip, test=True, wire_format=wire_format,
+                                 trace_rate=trace_rate)
+        self.router.socket = listening_socket(router_ip)
+        self.driver_key = BasicRouter(self.driver_ip, test=True)
+        self.router.keys[self.driver_ip] = \
+            self.driver_key.packet_key.publickey()
+        sink_ips = ['127.0.{}.{}'.format(subnet, 3 + i)
+                    for i in range(neighbors)]
+        for ip in sink_ips:
+            self.sinks.append(Sink(ip, self.record))
+        self.router.neighbors.update(sink_ips + [self.driver_ip])
+        self.start_router(sink_ips)
+        self.driver = socket.create_connection(
+            (router_ip, ROUTER_PORT), source_address=(self.driver_ip, 0))
+
+    def start_router(self, sink_ips):
+        if isinstance(self.router, AsyncRouter):
+            started = threading.Event()
+
+            async def main():
+                self.router.loop = asyncio.get_running_loop()
+                for ip in sink_ips:
+                    await self.router.connect_neighbor(ip)
+                started.set()
+                await self.router.run(cli=False, route_updates=False)
+
+            threading.Thread(
+                target=asyncio.run, args=(main(),), daemon=True).start()
+            started.wait()
+        else:
+            for ip in sink_ips:
+                self.router.connect_neighbor(ip)
+            threading.Thread(
+                target=self.router.accept_connections, daemon=True).start()
+
+    def record(self, seq):
+        with self.cond:
+            self.received.setdefault(seq, []).append(time.perf_counter())
+            self.cond.notify_all()
+
+    def packets(self, start, count):
+        """Pre-signs count FLOOD packets so signing is not measured.
+        """
+        packets = []
+        for seq in range(start, start + count):
+            packet = BBBPacket(self.driver_ip, '10.0.0.1', BBBPacketType.FLOOD,
+                               'bench-{}'.format(seq), seq)
+            self.driver_key.sign(packet)
+            packets.append(encode_packet(packet, self.wire_format))
+        return packets
+
+    def wait_for(self, seq):
+        with self.cond:
+            self.cond.wait_for(
+                lambda: len(self.received.get(seq, ())) == self.neighbors,
+                timeout=10)
+
+    def latency(self, start, count):
+        """Sends packets one at a time, returns forwarding latencies in ms.
+        """
+        latencies = []
+        for seq, data in enumerate(self.packets(start, count), start):
+            sent = time.perf_counter()
+            self.driver.sendall(data)
+            self.wait_for(seq)
+            latencies.append((max(self.received[seq]) - sent) * 1000)
+        return latencies
+
+    def throughput(self, start, count):
+        """Sends packets back to back, returns forwarded packets/sec.
+        """
+        packets = self.packets(start, count)
+        sent = time.perf_counter()
+        for data in packets:
+            self.driver.sendall(data)
+        self.wait_for(start + count - 1)
+        elapsed = time.perf_counter() - sent
+        delivered = sum(len(self.received.get(seq, ()))
+                        for seq in range(start, start + count))
+        return delivered / elapsed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def bench(router_cls, packets, neighbors, subnet, wire_format, trace_rate):
+    run = Run(router_cls, neighbors, subnet, wire_format, trace_rate)
+    latencies = run.latency(0, packets)
+    pps = run.throughput(packets, packets)
+    return (pps, percentile(latencies, 50), percentile(latencies, 99),
+            run.router.tracer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=500)
+    parser.add_argument('--neighbors', type=int, default=4)
+    parser.add_argument('--router', choices=['basic', 'async'])
+    parser.add_argument('--wire-format', default='json',
+                        choices=[f.name.lower() for f in WireFormat])
+    parser.add_argument('--trace-rate', type=float, default=0,
+                        help='fraction of packets traced per stage')
+    args = parser.parse_args()
+    wire_format = WireFormat[args.wire_format.upper()]
+
+    routers = {'basic': BasicRouter, 'async': AsyncRouter}
+    names = [args.router] if args.router else list(routers)
+    results = []
+    for subnet, name in enumerate(names, 1):
+        # Router output would dominate the measurement
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            results.append((name, bench(routers[name], args.packets,
+                                        args.neighbors, subnet, wire_format,
+                                        args.trace_rate)))
+
+    print('{} packets, {} neighbors, {} wire format'.format(
+        args.packets, args.neighbors, wire_format.name))
+    print('{:<8}{:>14}{:>12}{:>12}'.format('router', 'packets/sec',
+                                           'p50 ms', 'p99 ms'))
+    for name, (pps, p50, p99, _) in results:
+        print('{:<8}{:>14.0f}{:>12.3f}{:>12.3f}'.format(name, pps, p50, p99))
+    if args.trace_rate:
+        for name, (_, _, _, tracer) in results:
+            print()
+            print(name)
+            print(tracer.format_report())
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
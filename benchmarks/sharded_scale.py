@@ -0,0 +1,42 @@
+"""Simulated packets/sec of the sharded simulator as the number of worker
+processes grows, on a grid of routers.
+
+    python3 -m benchmarks.sharded_scale [--routers N] [--time SECONDS]
+                                        [--workers N N ...]
+"""
+import argparse
+import os
+
+from sim.sharding import ShardedNetwork
+from sim.topology import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=400)
+    parser.add_argument('--time', type=float, default=120,
+                        help='virtual seconds to simulate')
+    parser.add_argument('--floods', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count()}))
+    args = parser.parse_args()
+
+    topology = generate('grid', args.routers)
+    print('{:>8}{:>10}{:>12}{:>12}{:>14}{:>10}'.format(
+        'workers', 'wall s', 'frames', 'delivered', 'frames/s', 'windows'))
+    for workers in args.workers:
+        network = ShardedNetwork(topology, workers=workers, latency=0.01,
+                                 latency_jitter=0.5)
+        try:
+            network.start_timers()
+            network.schedule_floods(args.floods, 0, args.time)
+            network.run(args.time)
+            stats = network.stats()
+        finally:
+            network.close()
+        print('{:>8}{:>10.2f}{:>12}{:>12}{:>14.0f}{:>10}'.format(
+            workers, stats['elapsed'], stats['frames'], stats['delivered'],
+            stats['frames_per_sec'], stats['windows']))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Key generation, signing and verification costs of every SignatureScheme.
+
+    python3 -m benchmarks.signature_schemes [--keys N] [--signatures N]
+"""
+import argparse
+import time
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.signatures import SCHEMES
+
+
+def per_op(function, count):
+    """Returns the average time of function in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=5)
+    parser.add_argument('--signatures', type=int, default=500)
+    args = parser.parse_args()
+
+    data = BBBPacket('10.0.0.1', '10.0.0.2', BBBPacketType.FLOOD, 'hello',
+                     0).to_bytes()
+    print('{:<10}{:>14}{:>14}{:>14}{:>12}'.format(
+        'scheme', 'keygen us', 'sign us', 'verify us', 'sig bytes'))
+    for scheme in SCHEMES.values():
+        keygen = per_op(scheme.generate, args.keys)
+        key = scheme.generate()
+        public_key = scheme.public_key(key)
+        signature = scheme.sign(key, data)
+        sign = per_op(lambda: scheme.sign(key, data), args.signatures)
+        verify = per_op(lambda: scheme.verify(public_key, data, signature),
+                        args.signatures)
+        print('{:<10}{:>14.0f}{:>14.1f}{:>14.1f}{:>12}'.format(
+            scheme.scheme.name, keygen, sign, verify, len(signature)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Startup, convergence and FLOOD throughput of the in-process simulator on
+square grids of routers.
+
+    python3 -m benchmarks.simulator_scale [--sizes N N ...] [--floods N]
+"""
+import argparse
+import random
+import time
+
+from sim.simulator import Network
+from sim.topology import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 400, 1000])
+    parser.add_argument('--floods', type=int, default=20)
+    args = parser.parse_args()
+
+    print('{:>8}{:>10}{:>12}{:>8}{:>12}{:>10}{:>10}{:>12}'.format(
+        'routers', 'start s', 'converge s', 'rounds', 'delivered',
+        'avg hops', 'flood s', 'frames/s'))
+    rng = random.Random(0)
+    for size in args.sizes:
+        start = time.perf_counter()
+        network = Network(generate('grid', size))
+        started = time.perf_counter() - start
+        start = time.perf_counter()
+        rounds = network.converge()
+        converged = time.perf_counter() - start
+
+        ips = sorted(network.routers)
+        frames = network.frames
+        start = time.perf_counter()
+        for i in range(args.floods):
+            src, dst = rng.sample(ips, 2)
+            network.flood(src, dst, 'hello-{}'.format(i))
+        flooded = time.perf_counter() - start
+        stats = network.stats()
+        print('{:>8}{:>10.2f}{:>12.2f}{:>8}{:>12}{:>10.1f}{:>10.2f}{:>12.0f}'
+              .format(len(network.routers), started, converged, rounds,
+                      stats['delivered'], stats['avg_hops'], flooded,
+                      (network.frames - frames) / flooded))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Throughput, latency, memory and convergence of the simulator across
+topology families, sizes and fractions of byzantine routers.
+
+    python3 -m benchmarks.topology_suite [--families F F ...]
+        [--sizes N N ...] [--byzantine FRACTION ...] [--placement P]
+        [--output results.json]
+"""
+import argparse
+import json
+import random
+import tracemalloc
+
+from sim.simulator import Network
+from sim.topology import FAMILIES, PLACEMENTS, generate
+
+
+CONVERGE_TIME = 120     # virtual seconds the routes get to converge
+FLOOD_TIME = 60         # virtual seconds FLOODs are sent over
+
+
+def run(family, size, byzantine, args):
+    """Simulates one topology.
+    @return     dict of results
+    """
+    rng = random.Random(args.seed)
+    topology = generate(family, size, degree=args.degree,
+                        byzantine=byzantine, placement=args.placement,
+                        seed=args.seed)
+    # Memory is measured up to convergence only, tracemalloc slows down
+    # everything it traces
+    tracemalloc.start()
+    network = Network(topology, latency=0.01, latency_jitter=0.5,
+                      seed=args.seed)
+    network.start_timers()
+    network.run(until=CONVERGE_TIME)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    converged = network.convergence_time(0)
+
+    ips = sorted(network.routers)
+    for i in range(args.floods):
+        src, dst = rng.sample(ips, 2)
+        network.scheduler.schedule_at(
+            CONVERGE_TIME + rng.uniform(0, FLOOD_TIME),
+            network.send_flood, src, dst, 'hello-{}'.format(i))
+    frames, elapsed = network.frames, network.elapsed
+    network.run(until=CONVERGE_TIME + FLOOD_TIME + 10)
+    stats = network.stats()
+    return {
+        'family': family,
+        'routers': stats['routers'],
+        'links': stats['links'] // 2,
+        'byzantine': byzantine,
+        'converged_s': converged,
+        'memory_mb': memory / 2 ** 20,
+        'frames_per_sec':
+            (stats['frames'] - frames) / (stats['elapsed'] - elapsed),
+        'delivery_ratio': stats['delivered'] / args.floods if args.floods else 0,
+        'avg_hops': stats['avg_hops'],
+        'avg_latency_ms': stats['avg_latency'] * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--families', nargs='+',
+                        default=sorted(FAMILIES) + ['fat-tree'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 256])
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--byzantine', type=float, nargs='+',
+                        default=[0, 0.1])
+    parser.add_argument('--placement', default='random', choices=PLACEMENTS)
+    parser.add_argument('--floods', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    columns = ['family', 'routers', 'links', 'byzantine', 'converged_s',
+               'memory_mb', 'frames_per_sec', 'delivery_ratio', 'avg_hops',
+               'avg_latency_ms']
+    print(''.join('{:>16}'.format(c) for c in columns))
+    results = []
+    for family in args.families:
+        for size in args.sizes:
+            for byzantine in args.byzantine:
+                result = run(family, size, byzantine, args)
+                results.append(result)
+                print(''.join(
+                    '{:>16.3f}'.format(result[c])
+                    if isinstance(result[c], float)
+                    else '{:>16}'.format(str(result[c]))
+                    for c in columns))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Link transmissions and delivery latency of DATA packets forwarded along
+routes versus FLOODs, on generated topologies.
+
+Routes converge on the routers' timers first, then --packets packets are
+sent between random pairs of routers, the same pairs in both modes.
+
+    python3 -m benchmarks.unicast_vs_flood [--families F F ...]
+        [--sizes N N ...] [--packets N] [--degree N] [--seed N]
+"""
+import argparse
+import random
+
+from sim.simulator import Network
+from sim.topology import FAMILIES, generate
+
+
+CONVERGE_TIME = 120     # virtual seconds the routes get to converge
+SEND_TIME = 60          # virtual seconds the packets are sent over
+
+
+def run(family, size, unicast, args):
+    """Simulates one topology.
+    @return     (transmissions per packet, delivery ratio, average latency in
+                ms, average hops)
+    """
+    rng = random.Random(args.seed)
+    topology = generate(family, size, degree=args.degree, seed=args.seed)
+    network = Network(topology, latency=0.01, latency_jitter=0.5,
+                      seed=args.seed)
+    network.start_timers()
+    network.run(until=CONVERGE_TIME)
+
+    send = network.send_data if unicast else network.send_flood
+    ips = sorted(network.routers)
+    for i in range(args.packets):
+        src, dst = rng.sample(ips, 2)
+        network.scheduler.schedule_at(
+            CONVERGE_TIME + rng.uniform(0, SEND_TIME),
+            send, src, dst, 'hello-{}'.format(i))
+    # Route updates keep being sent meanwhile, they are not counted
+    frames = network.stats()['frames']
+    updates = sum(r.metrics.packets.get('ROUTEUPDATE', 'out')
+                  for r in network.routers.values())
+    network.run(until=CONVERGE_TIME + SEND_TIME + 10)
+    stats = network.stats()
+    updates = sum(r.metrics.packets.get('ROUTEUPDATE', 'out')
+                  for r in network.routers.values()) - updates
+    return (
+        (stats['frames'] - frames - updates) / args.packets,
+        stats['delivered'] / args.packets,
+        stats['avg_latency'] * 1e3,
+        stats['avg_hops'],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--families', nargs='+', default=sorted(FAMILIES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--packets', type=int, default=200)
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{:<16}{:>8}{:>10}{:>16}{:>12}{:>14}{:>10}'.format(
+        'family', 'routers', 'mode', 'tx/packet', 'delivered',
+        'latency ms', 'hops'))
+    for family in args.families:
+        for size in args.sizes:
+            for mode, unicast in [('flood', False), ('unicast', True)]:
+                tx, delivered, latency, hops = run(family, size, unicast, args)
+                print('{:<16}{:>8}{:>10}{:>16.1f}{:>12.3f}{:>14.2f}'
+                      '{:>10.2f}'.format(family, size, mode, tx, delivered,
+                                         latency, hops))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Throughput honest sources keep while a neighbor tries to exhaust a
+router's signature verification, with and without AdmissionControl.
+
+--honest sources send DATA packets at --rate packets/sec each through one
+router to a destination. The router verifies them on a VerificationPipeline
+of --verify-workers processes, whose queue is what the attack fills up:
+honest packets count as delivered if they reach the destination within the
+run. An attacker sends, as fast as it can, DATA packets
+with forged signatures of the right length, signatures of the wrong length,
+oversized payloads and replays of a packet the router already accepted.
+All packets are signed ahead, so the sources cost the router's CPU only
+what it takes to decode, check and forward them.
+
+    python3 -m benchmarks.verification_attack [--honest N] [--rate PPS]
+        [--verify-workers N] [--admit-rate PPS] [--seconds S]
+"""
+import argparse
+import binascii
+import os
+import threading
+import time
+from collections import Counter
+
+from sim.admission import ADMIT_BURST, ADMIT_RATE, MAX_PAYLOAD_LEN
+from sim.base import BBBPacket, BBBPacketType, ROUTER_PORT
+from sim.basic_router import BasicRouter
+from sim.codec import FrameReader, WireFormat, encode_packet
+from sim.signatures import SignatureScheme
+
+
+DESTINATION = '10.0.1.1'
+ATTACKER = '10.0.2.1'
+ATTACK_FRAMES = 4096    # distinct frames the attacker cycles through
+OVERSIZED_EVERY = 512   # one in every this many attack frames is oversized
+
+
+class Wire(object):
+    """Stands in for a source's socket to the router, hands the frames
+    written to it to the router like its client thread would.
+    """
+    def __init__(self, router, src):
+        self.router = router
+        self.address = (src, ROUTER_PORT)
+        self.reader = FrameReader()
+
+    def sendall(self, data):
+        for packet in self.reader.feed(data):
+            self.router.receive_packet(packet, self.address)
+
+
+class Sink(object):
+    """Stands in for the router's socket to the destination, counts the
+    packets of every source that made it through.
+    """
+    def __init__(self):
+        self.reader = FrameReader()
+        self.received = Counter()
+
+    def sendall(self, data):
+        for packet in self.reader.feed(data):
+            self.received[packet.src] += 1
+
+
+def source(ip, router):
+    """
+    @return     BasicRouter at ip, whose key router knows
+    """
+    src = BasicRouter(ip, test=True, wire_format=WireFormat.BINARY,
+                      scheme=SignatureScheme.ED25519)
+    router.keys[ip] = src.public_key
+    router.neighbors.add(ip)
+    return src
+
+
+def data_frame(src, seq, payload, sign=True):
+    packet = BBBPacket(src.ip_address, DESTINATION, BBBPacketType.DATA,
+                       payload, seq)
+    if sign:
+        src.sign(packet)
+    return packet
+
+
+def attack_frames(attacker, router):
+    """
+    @return     list of encoded frames. Half of them carry forged signatures
+                of the right length, a quarter signatures of the wrong
+                length and a quarter are replays; one in OVERSIZED_EVERY
+                is oversized instead.
+    """
+    replay = data_frame(attacker, 0, 'hello')
+    router.receive_packet(replay, (ATTACKER, ROUTER_PORT))
+    signature_len = attacker.signature_scheme.signature_len
+    frames = []
+    for seq in range(1, ATTACK_FRAMES + 1):
+        if seq % OVERSIZED_EVERY == 0:
+            packet = data_frame(attacker, seq, 'x' * (MAX_PAYLOAD_LEN + 1))
+        elif seq % 4 < 2:
+            packet = forged(attacker, seq, signature_len)
+        elif seq % 4 == 2:
+            packet = forged(attacker, seq, 16)
+        else:
+            packet = replay
+        frames.append(encode_packet(packet, WireFormat.BINARY))
+    return frames
+
+
+def forged(attacker, seq, signature_len):
+    """
+    @return     DATA packet from attacker with random signature_len bytes as
+                its signature
+    """
+    packet = data_frame(attacker, seq, 'hello', sign=False)
+    packet.scheme = attacker.signature_scheme.scheme
+    packet.signature = binascii.b2a_base64(
+        os.urandom(signature_len)).decode()
+    return packet
+
+
+def send_paced(wire, frames, rate, deadline, sent):
+    """Writes frames to wire at rate frames/sec until deadline.
+    """
+    start = time.monotonic()
+    for i, frame in enumerate(frames):
+        delay = start + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        if time.monotonic() >= deadline:
+            return
+        wire.sendall(frame)
+        sent[wire.address[0]] += 1
+
+
+def send_flat_out(wire, frames, deadline, sent):
+    """Writes frames to wire, over and over, as fast as it can until
+    deadline.
+    """
+    while time.monotonic() < deadline:
+        for frame in frames[:256]:
+            wire.sendall(frame)
+        sent[wire.address[0]] += 256
+        frames = frames[256:] + frames[:256]
+
+
+def run(args, admission, attack):
+    """
+    @return     (honest packets sent, honest packets delivered, attack
+                packets sent, packets the pipeline checked, dict of admission
+                drops by reason)
+    """
+    router = BasicRouter('10.0.0.1', test=True,
+                         wire_format=WireFormat.BINARY,
+                         scheme=SignatureScheme.ED25519,
+                         verify_workers=args.verify_workers,
+                         admission=admission, admit_rate=args.admit_rate,
+                         admit_burst=args.admit_burst)
+    sink = Sink()
+    router.neighbors.add(DESTINATION)
+    router.routes[DESTINATION] = DESTINATION
+    router.register_socket(DESTINATION, sink)
+
+    honest = [source('10.0.3.{}'.format(i + 1), router)
+              for i in range(args.honest)]
+    count = int(args.rate * args.seconds)
+    honest_frames = {
+        src.ip_address: [
+            encode_packet(data_frame(src, seq, 'hello-{}'.format(seq)),
+                          WireFormat.BINARY)
+            for seq in range(count)
+        ]
+        for src in honest
+    }
+    attacker = source(ATTACKER, router)
+    frames = attack_frames(attacker, router)
+    # Wait for the replayed packet to be accepted
+    while not router.metrics.data_forwarded.values:
+        time.sleep(0.01)
+    verified = router.verification.verified + router.verification.rejected
+
+    sent = Counter()
+    deadline = time.monotonic() + args.seconds
+    threads = [
+        threading.Thread(target=send_paced, args=(
+            Wire(router, src.ip_address), honest_frames[src.ip_address],
+            args.rate, deadline, sent))
+        for src in honest
+    ]
+    if attack:
+        threads.append(threading.Thread(target=send_flat_out, args=(
+            Wire(router, ATTACKER), frames, deadline, sent)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    delivered = sum(sink.received[src.ip_address] for src in honest)
+    router.unregister_socket(DESTINATION, sink)
+    # Drop the backlog and let the batch being verified finish
+    with router.verification.incoming.mutex:
+        router.verification.incoming.queue.clear()
+    time.sleep(0.5)
+    router.verification.executor.shutdown()
+    return (
+        sum(sent[src.ip_address] for src in honest),
+        delivered,
+        sent[ATTACKER],
+        router.verification.verified + router.verification.rejected
+        - verified,
+        router.admission.stats() if router.admission else {},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--honest', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=500)
+    parser.add_argument('--verify-workers', type=int, default=1)
+    parser.add_argument('--admit-rate', type=float, default=ADMIT_RATE)
+    parser.add_argument('--admit-burst', type=float, default=ADMIT_BURST)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    offered = args.honest * args.rate
+    print('honest sources offer {:.0f} packets/sec'.format(offered))
+    print('{:<11}{:<8}{:>15}{:>13}{:>15}{:>10}  {}'.format(
+        'admission', 'attack', 'honest pkt/s', 'delivered', 'attack pkt/s',
+        'verified', 'dropped'))
+    for admission, attack in [(False, False), (False, True), (True, True)]:
+        sent, delivered, attack_sent, verified, dropped = \
+            run(args, admission, attack)
+        print('{:<11}{:<8}{:>15.0f}{:>12.1f}%{:>15.0f}{:>10}  {}'.format(
+            'on' if admission else 'off', 'yes' if attack else 'no',
+            delivered / args.seconds,
+            delivered / offered / args.seconds * 100,
+            attack_sent / args.seconds, verified,
+            ', '.join('{}={}'.format(k, v)
+                      for k, v in sorted(dropped.items())) or '-'))
+
+if __name__ == "__main__":
+    main()
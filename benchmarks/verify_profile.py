@@ -0,0 +1,117 @@
+"""Latency and allocation profile of the verify hot path.
+
+Compares how the signed bytes of a received packet are obtained:
+    before      deepcopy the packet, drop its signature and JSON re-serialize
+                it (what verify used to do)
+    json        canonical bytes rebuilt from a packet decoded from JSON
+    binary      canonical bytes kept from decoding a binary frame
+and the cost of a full BasicRouter.verify for each signature scheme.
+
+    python3 -m benchmarks.verify_profile [--packets N]
+"""
+import argparse
+import contextlib
+import os
+import time
+import tracemalloc
+from copy import deepcopy
+
+from Crypto.Hash import SHA256
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.codec import FRAME_PREFIX, decode_binary, encode_binary
+from sim.signatures import SignatureScheme
+
+
+def legacy_signed_bytes(packet):
+    copy = deepcopy(packet)
+    copy.signature = None
+    return copy.to_bytes()
+
+
+def allocated_per_call(function, packets):
+    """Total bytes allocated per call, including memory freed again.
+    """
+    tracemalloc.start()
+    total = 0
+    for packet in packets:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function(packet)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / len(packets)
+
+
+def per_call(function, packets):
+    start = time.perf_counter()
+    for packet in packets:
+        function(packet)
+    return (time.perf_counter() - start) / len(packets) * 1e6
+
+
+def received(router, count, binary):
+    """Returns count packets signed by router as a neighbor would receive
+    them, decoded from the JSON or binary wire format.
+    """
+    packets = []
+    for seq in range(count):
+        packet = BBBPacket(router.ip_address, '10.0.0.2', BBBPacketType.FLOOD,
+                           'hello-{}'.format(seq), seq)
+        router.sign(packet)
+        if binary:
+            packets.append(decode_binary(encode_binary(packet)[FRAME_PREFIX.size:]))
+        else:
+            packets.append(BBBPacket.from_bytes(packet.to_bytes()))
+    return packets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        routers = {
+            scheme: BasicRouter('10.0.1.{}'.format(scheme.value), test=True,
+                                scheme=scheme)
+            for scheme in SignatureScheme
+        }
+        receiver = BasicRouter('10.0.0.2', test=True,
+                               scheme=SignatureScheme.ED25519)
+    signer = routers[SignatureScheme.ED25519]
+    json_packets = received(signer, args.packets, binary=False)
+    binary_packets = received(signer, args.packets, binary=True)
+
+    print('signed bytes + SHA256 per packet')
+    print('{:<10}{:>10}{:>16}'.format('path', 'us', 'bytes alloc'))
+    paths = [
+        ('before', lambda p: SHA256.new(legacy_signed_bytes(p)), json_packets),
+        ('json', lambda p: SHA256.new(p.signed_bytes()), json_packets),
+        ('binary', lambda p: SHA256.new(p.signed_bytes()), binary_packets),
+    ]
+    for name, function, packets in paths:
+        print('{:<10}{:>10.2f}{:>16.0f}'.format(
+            name, per_call(function, packets),
+            allocated_per_call(function, packets)))
+
+    print()
+    print('full verify per packet')
+    print('{:<10}{:<8}{:>10}'.format('scheme', 'format', 'us'))
+    for scheme, router in routers.items():
+        count = min(args.packets, 200) if scheme == SignatureScheme.RSA_PSS \
+            else args.packets
+        for binary in (False, True):
+            packets = received(router, count, binary)
+            receiver.keys[router.ip_address] = router.public_key
+            receiver.sqn_numbers.clear()
+            receiver.flood_cache.forget(router.ip_address)
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(devnull):
+                us = per_call(receiver.verify, packets)
+            print('{:<10}{:<8}{:>10.1f}'.format(
+                scheme.name, 'binary' if binary else 'json', us))
+
+if __name__ == "__main__":
+    main()
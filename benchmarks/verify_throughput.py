@@ -0,0 +1,91 @@
+"""Signature verification throughput against the number of worker processes.
+
+Compares BasicRouter.verify (one packet at a time, in process) with the
+VerificationPipeline for 1 up to the number of cores.
+
+    python3 -m benchmarks.verify_throughput [--packets N] [--sources S]
+"""
+import argparse
+import contextlib
+import os
+import time
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.verification import VerificationPipeline, BATCH_SIZE
+
+
+def signed_packets(count, sources):
+    """Returns count FLOOD packets, interleaved from sources different routers.
+    """
+    routers = [BasicRouter('10.0.0.{}'.format(i + 2), test=True)
+               for i in range(sources)]
+    packets = []
+    for seq in range(count // sources):
+        for router in routers:
+            packet = BBBPacket(router.ip_address, '10.0.0.1',
+                               BBBPacketType.FLOOD, 'bench-{}'.format(seq), seq)
+            router.sign(packet)
+            packets.append(packet)
+    return routers, packets
+
+
+def receiver(routers):
+    router = BasicRouter('10.0.0.1', test=True)
+    for source in routers:
+        router.keys[source.ip_address] = source.packet_key.publickey()
+    return router
+
+
+def bench_inline(routers, packets):
+    router = receiver(routers)
+    start = time.perf_counter()
+    verified = sum(router.verify(packet) for packet in packets)
+    assert verified == len(packets)
+    return len(packets) / (time.perf_counter() - start)
+
+
+def bench_pipeline(routers, packets, workers, batch_size):
+    router = receiver(routers)
+    pipeline = VerificationPipeline(router, workers=workers)
+    # Warm up the pool, so process start up is not measured
+    pipeline.verify_batch(packets[:workers])
+    router.sqn_numbers.clear()
+    for source in routers:
+        router.flood_cache.forget(source.ip_address)
+
+    start = time.perf_counter()
+    verified = 0
+    for i in range(0, len(packets), batch_size):
+        verified += sum(pipeline.verify_batch(packets[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+    pipeline.executor.shutdown()
+    assert verified == len(packets)
+    return len(packets) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--packets', type=int, default=2000)
+    parser.add_argument('--sources', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        routers, packets = signed_packets(args.packets, args.sources)
+        inline = bench_inline(routers, packets)
+
+    print('{} packets from {} sources, batches of {}'.format(
+        len(packets), args.sources, args.batch_size))
+    print('{:<10}{:>18}'.format('workers', 'verifications/sec'))
+    print('{:<10}{:>18.0f}'.format('inline', inline))
+    counts = {2 ** i for i in range(args.max_workers.bit_length())}
+    for workers in sorted(counts | {args.max_workers}):
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            rate = bench_pipeline(routers, packets, workers, args.batch_size)
+        print('{:<10}{:>18.0f}'.format(workers, rate))
+
+if __name__ == "__main__":
+    main()
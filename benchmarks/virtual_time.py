@@ -0,0 +1,44 @@
+"""Virtual protocol time simulated per second of wall clock time, running the
+routers' timers on a grid of routers. Routers sign with the simulator's HMAC
+scheme unless --scheme says otherwise.
+
+    python3 -m benchmarks.virtual_time [--routers N] [--hours N]
+        [--scheme ed25519] [--seed N]
+"""
+import argparse
+import time
+
+from sim.signatures import SignatureScheme
+from sim.simulator import Network
+from sim.topology import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--hours', type=float, default=1)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--scheme', default='hmac',
+                        choices=[s.name.lower() for s in SignatureScheme])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    network = Network(generate('grid', args.routers),
+                      scheme=SignatureScheme[args.scheme.upper()],
+                      latency=args.latency, latency_jitter=0.5, seed=args.seed)
+    print('started {} routers in {:.2f}s'.format(
+        len(network.routers), time.perf_counter() - start))
+    network.start_timers()
+    duration = args.hours * 3600
+    network.run(until=duration)
+    stats = network.stats()
+    print('simulated {:.0f}s in {:.2f}s ({:.0f}x real time)'.format(
+        duration, stats['elapsed'], duration / stats['elapsed']))
+    print('converged after {:.3f}s of virtual time'.format(
+        network.convergence_time(0) or 0))
+    print('{} events, {} frames, {} bytes'.format(
+        stats['events'], stats['frames'], stats['bytes']))
+
+if __name__ == "__main__":
+    main()
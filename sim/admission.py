@@ -0,0 +1,124 @@
+import time
+from sim.base import BBBPacketType
+from sim.log import get_logger
+from sim.signatures import get_scheme
+
+
+ADMIT_RATE = 2000       # packets/sec admitted per neighbor, 0 is unlimited
+ADMIT_BURST = 4000      # packets a neighbor may send at once
+# Largest payload admitted, MASTERCONFIGs from the master are not limited
+MAX_PAYLOAD_LEN = 1 << 20
+
+log = get_logger('sim.admission')
+
+
+def base64_len(size):
+    """
+    @return     length of the base64 encoding of size bytes, without newline
+    """
+    return -(-size // 3) * 4
+
+
+class TokenBucket(object):
+    """Admits up to rate packets per second on average, and bursts of up to
+    burst packets.
+    """
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """
+        @now        current time in seconds
+        @return     True if a packet may pass
+        """
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class AdmissionControl(object):
+    """Cheap checks every received packet has to pass before its signature
+    is verified, so a neighbor cannot make a router spend its CPU on
+    verifying garbage. In order of cost:
+        rate_limited:   the neighbor sent more than its token bucket allows
+        oversized:      payload longer than max_payload_len
+        unsigned:       packet without a signature
+        malformed:      signature of the wrong length for its scheme
+        stale:          sequence number already accepted from the source
+    Dropped packets are counted per neighbor and reason.
+    """
+    def __init__(self, router, rate=ADMIT_RATE, burst=ADMIT_BURST,
+                 max_payload_len=MAX_PAYLOAD_LEN, clock=time.monotonic):
+        """
+        @router             BasicRouter the packets are received by
+        @rate               packets/sec admitted per neighbor, 0 is unlimited
+        @burst              packets a neighbor may send at once
+        @max_payload_len    largest payload admitted
+        @clock              function returning the current time in seconds
+        """
+        self.router = router
+        self.rate = rate
+        self.burst = burst
+        self.max_payload_len = max_payload_len
+        self.clock = clock
+        self.buckets = {}       # neighbor ip: TokenBucket
+
+    def check(self, packet, neighbor):
+        """
+        @neighbor   ip address the packet was received from
+        @return     reason the packet is dropped for, None if it is admitted
+        """
+        if self.rate:
+            bucket = self.buckets.get(neighbor)
+            now = self.clock()
+            if bucket is None:
+                bucket = self.buckets[neighbor] = TokenBucket(
+                    self.rate, self.burst, now)
+            if not bucket.take(now):
+                return 'rate_limited'
+        if packet.type == BBBPacketType.MASTERCONFIG:
+            return None
+        if len(packet.payload) > self.max_payload_len:
+            return 'oversized'
+        signature = packet.signature
+        if not signature:
+            return 'unsigned'
+        try:
+            expected = base64_len(get_scheme(packet.scheme).signature_len)
+        except KeyError:
+            return 'malformed'
+        if len(signature.rstrip('\n')) != expected:
+            return 'malformed'
+        if self.router.is_stale(packet):
+            return 'stale'
+        return None
+
+    def admit(self, packet, address):
+        """Counts and logs packets that fail check.
+        @address    tuple of (ip, port) the packet was received from
+        @return     True if packet may be verified
+        """
+        reason = self.check(packet, address[0])
+        if reason is None:
+            return True
+        self.router.metrics.admission_dropped.inc(address[0], reason)
+        log.debug('packet dropped', reason=reason, peer=address[0],
+                  src=packet.src, type=packet.type.name, seq=packet.seq)
+        return False
+
+    def stats(self):
+        """
+        @return     dict of reason: packets dropped, over all neighbors
+        """
+        dropped = {}
+        for (_, reason), count in \
+                list(self.router.metrics.admission_dropped.values.items()):
+            dropped[reason] = dropped.get(reason, 0) + count
+        return dropped
@@ -0,0 +1,373 @@
+from sim.base import (
+    BBBPacketType,
+    PACKET_LEN,
+    ROUTER_PORT
+)
+from sim.basic_router import (
+    BasicRouter, HELLO_FLOOD_PERIOD, RECV_LEN, log, main, report_rate
+)
+from sim.codec import FrameReader, encode_packet
+from sim.send_queue import BackpressurePolicy, SEND_QUEUE_LEN
+from collections import deque
+import asyncio
+import time
+
+
+class StreamSendQueue(object):
+    """Bounded outbound queue for a single neighbor's asyncio stream writer,
+    the AsyncRouter counterpart of SendQueue.
+    Data is written to the transport until it buffers more than limit bytes,
+    then the backpressure policy applies:
+        BLOCK:          data is still written, and client tasks wait for the
+                        transport to drain before they read more packets
+        DROP_OLDEST:    data waits in a queue of up to maxlen packets, the
+                        oldest queued packet is dropped to make room. Bytes
+                        the transport already buffers cannot be taken back.
+        DROP_NEWEST:    data is dropped
+    """
+    def __init__(self, writer, limit, maxlen=SEND_QUEUE_LEN,
+                 policy=BackpressurePolicy.BLOCK):
+        """
+        @writer         asyncio.StreamWriter to write to
+        @limit          bytes the transport may buffer before the policy
+                        applies
+        @maxlen         maximum number of queued packets, for DROP_OLDEST
+        @policy         BackpressurePolicy applied when the transport is full
+        """
+        self.writer = writer
+        self.limit = limit
+        self.maxlen = maxlen
+        self.policy = policy
+        self.queue = deque()
+        self.flushing = None    # task writing the queue once drained
+        self.closed = False
+        # Counters
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        # drain() waits while the transport buffers more than limit bytes
+        writer.transport.set_write_buffer_limits(high=limit)
+
+    def depth(self):
+        return len(self.queue)
+
+    def buffered(self):
+        """
+        @return     bytes buffered by the transport
+        """
+        return self.writer.transport.get_write_buffer_size()
+
+    def is_full(self):
+        return self.buffered() > self.limit
+
+    def put(self, data, source=None):
+        """Writes data, applying the backpressure policy.
+        @data       bytes to send
+        @source     ip address of the packet's source
+        @return     False if data was dropped
+        """
+        if self.closed:
+            self.dropped += 1
+            return False
+        if not self.queue and (not self.is_full()
+                               or self.policy == BackpressurePolicy.BLOCK):
+            self.writer.write(data)
+            self.sent += 1
+            return True
+        if self.policy == BackpressurePolicy.DROP_NEWEST:
+            self.dropped += 1
+            return False
+        if len(self.queue) >= self.maxlen:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(data)
+        self.max_depth = max(self.max_depth, self.depth())
+        if self.flushing is None:
+            self.flushing = asyncio.get_running_loop().create_task(
+                self.flush())
+        return True
+
+    async def flush(self):
+        """Writes the queue to the transport as it drains.
+        """
+        try:
+            while self.queue:
+                await self.writer.drain()
+                while self.queue and not self.is_full():
+                    self.writer.write(self.queue.popleft())
+                    self.sent += 1
+        except Exception as e:
+            log.info('writer stopped', error=e)
+            self.close()
+        finally:
+            self.flushing = None
+
+    async def wait(self):
+        """Waits for the transport to drain if it is full and the policy
+        is BLOCK.
+        """
+        if self.policy == BackpressurePolicy.BLOCK and self.is_full() \
+                and not self.closed:
+            try:
+                await self.writer.drain()
+            except Exception as e:
+                # The neighbor's own client task closes its connection
+                log.info('writer stopped', error=e)
+                self.close()
+
+    def close(self):
+        """Drops anything still queued.
+        """
+        self.closed = True
+        self.dropped += self.depth()
+        self.queue.clear()
+        if self.flushing is not None:
+            self.flushing.cancel()
+
+    def stats(self):
+        """
+        @return     dict of the queue's depth, counters and the bytes the
+                    transport buffers
+        """
+        return {
+            'depth': self.depth(),
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'buffered': self.buffered(),
+        }
+
+
+class AsyncRouter(BasicRouter):
+    """asyncio based Router Class
+    Single threaded event loop instead of a thread per socket, structured as
+    follows:
+        CLI Task:
+            Reads user input from stdin and dispatches cli commands
+        ROUTEUPDATE Task:
+            Periodically sends local routing information to neighboring nodes
+        Server:
+            asyncio server on the listening socket, runs a client task for
+            every open connection
+        Client Task:
+            Created for every open connection, reads packets from the stream
+            Dispatches read data to the proper handler
+    Packet handling (verify, sign and the handle_* methods) and the CLI are
+    shared with BasicRouter, so both routers behave identically.
+    Since every handler runs on the event loop, no socket lock is needed.
+    Writes go through a StreamSendQueue per neighbor, which applies
+    backpressure once the transport buffers send_queue_len * PACKET_LEN
+    bytes. Packets are queued in order of arrival, so fair_queuing,
+    verify_workers and sign_workers do not apply.
+    """
+    loop = None
+    route_event = None  # set when a triggered route update is due
+
+    def serve(self):
+        """Runs the event loop. Never returns.
+        """
+        self.start_metrics_server()
+        asyncio.run(self.run())
+
+    async def run(self, cli=True, route_updates=True):
+        """Serves the listening socket until cancelled.
+        @cli                read commands from stdin
+        @route_updates      periodically send ROUTEUPDATE packets
+        """
+        self.loop = asyncio.get_running_loop()
+        self.route_event = asyncio.Event()
+        server = await asyncio.start_server(
+            self.handle_connection,
+            sock=self.socket,
+        )
+        tasks = [server.serve_forever()]
+        if cli:
+            tasks.append(self.read_cli())
+        if route_updates:
+            tasks.append(self.update_neighbors())
+        async with server:
+            await asyncio.gather(*tasks)
+
+    async def read_cli(self):
+        """Reads user input without blocking the event loop.
+        """
+        while True:
+            cli_input = await self.loop.run_in_executor(None, input)
+            self.handle_cli(cli_input)
+
+    def start_hello_flood(self, dst, count, period, packet_type):
+        """Runs send_hello_flood for the flood and send commands as a task
+        on the event loop.
+        """
+        self.loop.create_task(
+            self.send_hello_flood(dst, count, period, packet_type))
+
+    def start_profiler(self, mode, path):
+        """Starts a capture of the Profiler. CPROFILE captures profile the
+        event loop, which handle_cli runs on.
+        """
+        self.profiler.start(mode, path, thread=True)
+
+    async def update_neighbors(self):
+        """Sends out routing information to neighbors, periodically and when
+        the routing table changes.
+        """
+        periodic = True
+        while True:
+            for neighbor in self.neighbors - set(self.sockets):
+                try:
+                    await self.connect_neighbor(neighbor)
+                except OSError as e:
+                    log.warning('could not connect to neighbor',
+                                neighbor=neighbor, error=e)
+            self.send_route_updates(periodic)
+            self.route_timer.sent(periodic)
+            while True:
+                timeout, periodic = self.route_timer.timeout()
+                if timeout <= 0:
+                    break
+                self.route_event.clear()
+                try:
+                    await asyncio.wait_for(self.route_event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    def trigger_route_update(self):
+        """Schedules a triggered route update and wakes up update_neighbors.
+        """
+        super().trigger_route_update()
+        if self.route_event and self.routes.has_changes():
+            self.route_event.set()
+
+    async def connect_neighbor(self, neighbor):
+        """Opens a connection to neighbor, stores its writer in the list of
+        open sockets and starts a client task for it.
+        @neighbor       ip address of the neighbor
+        """
+        neighbor_endpoint = (neighbor, ROUTER_PORT)
+        reader, writer = await asyncio.open_connection(*neighbor_endpoint)
+        self.register_socket(neighbor, writer)
+        self.loop.create_task(
+            self.handle_client(reader, writer, neighbor_endpoint)
+        )
+
+    def register_socket(self, neighbor, writer):
+        """Stores an open stream writer for neighbor with its
+        StreamSendQueue.
+        @neighbor       ip address of the neighbor
+        @writer         asyncio.StreamWriter connected to the neighbor
+        """
+        old_queue = self.send_queues.get(neighbor)
+        self.sockets[neighbor] = writer
+        # A new connection may be a restarted neighbor without our table
+        self.synced.discard(neighbor)
+        self.send_queues[neighbor] = StreamSendQueue(
+            writer,
+            limit=self.send_queue_len * PACKET_LEN,
+            maxlen=self.send_queue_len,
+            policy=self.backpressure,
+        )
+        if old_queue:
+            old_queue.close()
+
+    def send_packet(self, neighbor, packet):
+        """Sends packet to neighbor through its StreamSendQueue. Writers
+        without a queue (i.e. not registered through register_socket) are
+        written to directly.
+        @neighbor       ip address of the neighbor
+        @packet         BBBPacket instance to be sent
+        @return         False if the packet was dropped, e.g. because
+                        neighbor is not connected (yet)
+        """
+        queue = self.send_queues.get(neighbor)
+        writer = self.sockets.get(neighbor)
+        if queue is None and writer is None:
+            self.metrics.send_dropped.inc(packet.type.name, 'not_connected')
+            return False
+        self.metrics.packets.inc(packet.type.name, 'out')
+        trace = packet._trace
+        if trace:
+            trace.mark('handle')
+        data = encode_packet(packet, self.peer_format(neighbor))
+        if trace:
+            trace.mark('encode')
+        if queue:
+            sent = queue.put(data, packet.src)
+        else:
+            writer.write(data)
+            sent = True
+        if trace:
+            trace.mark('send')
+        return sent
+
+    async def wait_for_writers(self):
+        """Waits until every full BLOCK StreamSendQueue drained, so reading
+        stops while neighbors cannot keep up.
+        """
+        for queue in list(self.send_queues.values()):
+            await queue.wait()
+
+    async def handle_connection(self, reader, writer):
+        """Callback for the asyncio server, stores the writer for any accepted
+        connection and handles the client on the current task.
+        """
+        address = writer.get_extra_info('peername')
+        self.register_socket(address[0], writer)
+        await self.handle_client(reader, writer, address)
+
+    async def handle_client(self, reader, writer, address):
+        """Reads packets from the stream at address until it is closed.
+        @reader         asyncio.StreamReader for the connection
+        @writer         asyncio.StreamWriter for the connection
+        @address        tuple of (ip, port)
+        """
+        frame_reader = FrameReader()
+        while True:
+            try:
+                data = await reader.read(RECV_LEN)
+                if not data:
+                    raise Exception('Client disconnected')
+
+                start = time.perf_counter()
+                for packet in frame_reader.feed(data):
+                    self.tracer.start(packet, start)
+                    self.peer_formats[address[0]] = frame_reader.wire_format
+                    # process_packet, with verify_async
+                    if self.admit_packet(packet, address):
+                        self.finish_packet(packet, address,
+                                           await self.verify_async(packet))
+                    start = time.perf_counter()
+                await self.wait_for_writers()
+            except Exception as e:
+                log.info('connection closed', peer=address[0], error=e)
+                self.unregister_socket(address[0], writer)
+                writer.close()
+                return False
+
+    async def verify_async(self, packet):
+        """Verifies packet without blocking the event loop on BigchainDB.
+        Packets from sources with a known key are verified inline, otherwise
+        verify runs in the default executor since it queries BigchainDB.
+        """
+        if packet.type == BBBPacketType.MASTERCONFIG or packet.src in self.keys \
+                or self.key_directory is None \
+                or self.key_directory.cached(packet.src) is not None:
+            return self.verify(packet)
+        return await self.loop.run_in_executor(None, self.verify, packet)
+
+    async def send_hello_flood(self, dst, count, period=HELLO_FLOOD_PERIOD,
+                               packet_type=BBBPacketType.FLOOD):
+        """Function to simply send a packet with hello string as its payload.
+        Invoked via CLI. With a period of 0 the event loop still gets to run
+        between packets. Prints the rate achieved.
+        @return     packets per second
+        """
+        start = time.perf_counter()
+        for i in range(count):
+            if i:
+                await asyncio.sleep(period)
+            self.originate(dst, "hello-{0}".format(i), packet_type)
+        return report_rate(count, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main(AsyncRouter)
@@ -1,12 +1,18 @@
 import select
 import socket
+import struct
 import sys
 import threading
+from sys import intern
+import time
 import json
 from threading import Lock
-from Crypto.PublicKey import RSA
-from bigchaindb_driver import BigchainDB
-from bigchaindb_driver.crypto import CryptoKeypair
+from sim.flood_cache import FloodCache
+from sim.key_directory import KeyDirectory, latest_key_asset
+from sim.keystore import load_or_generate
+from sim.log import get_logger
+from sim.routing import RouteTable
+from sim.signatures import SignatureScheme, get_scheme
 from enum import Enum
 
 
@@ -14,6 +20,15 @@ DEBUG = True
 ROUTER_PORT = 42425
 PACKET_LEN = 1024
 PAD_CHAR = "~"
+BROADCAST_ADDRESS = '255.255.255.255'  # dst of packets sent to all neighbors
+# Header of the canonical form packets are signed in:
+# type, signature scheme, seq, src, dst, payload length (followed by payload)
+SIGNED_HEADER = struct.Struct('!BBQ4s4sI')
+NO_SCHEME = 0xff        # scheme byte of packets without a SignatureScheme
+REGISTER_RETRY = 1      # seconds before a failed key registration is retried
+REGISTER_RETRY_MAX = 60
+
+log = get_logger('sim.router')
 
 class BBBPacketType(Enum):
     """
@@ -21,13 +36,21 @@ class BBBPacketType(Enum):
     MASTERCONFIG:   Packet from MASTER configuring network topology
     ROUTEUPDATE:    Updates about network topology
     FLOOD:          Data packet sent using robust flooding
+    DATA:           Data packet forwarded along the route to its destination,
+                    flooded where no route is known
     """
     MASTERCONFIG = 0
     ROUTEUPDATE = 1
     FLOOD = 2
+    DATA = 3
+
+# Types whose packets may take different paths and arrive out of order.
+# Their sequence numbers are checked against the FloodCache.
+UNORDERED_TYPES = frozenset((BBBPacketType.FLOOD, BBBPacketType.DATA))
 
 PUBLIC_ENUMS = {
-    'BBBPacketType': BBBPacketType
+    'BBBPacketType': BBBPacketType,
+    'SignatureScheme': SignatureScheme,
 }
 
 class BBBPacketEncoder(json.JSONEncoder):
@@ -59,7 +82,15 @@ def unpad(message):
 
 # Packet class for BBB Routing
 class BBBPacket(object):
-    def __init__(self, src, dst, type, payload, seq, signature=None):
+    """Slotted, so packets in flight carry no per-instance dict. Addresses
+    are interned, so every packet and routing table entry refers to a single
+    string per address instead of a copy decoded from every packet.
+    """
+    __slots__ = ('src', 'dst', 'type', 'payload', 'seq', 'signature',
+                 'scheme', '_signed_bytes', '_trace')
+
+    def __init__(self, src, dst, type, payload, seq, signature=None,
+                 scheme=None):
         """
         Constructor for a BBBPacket
         @src                    address of source
@@ -67,26 +98,69 @@ class BBBPacket(object):
         @type BBBPacketType     A BBBPacket Type
         @payload                string payload
         @seq                    sequence number
+        @signature              base64 signature, None if unsigned
+        @scheme SignatureScheme scheme the packet is signed with
         """
-        self.src = src
-        self.dst = dst
+        self.src = intern(src)
+        self.dst = intern(dst)
         self.type = type
         self.payload = payload
         self.seq = seq
-        if signature:
-            self.signature = signature
+        self.signature = signature or None
+        self.scheme = scheme
+        # Canonical signed bytes kept by decoders, see signed_bytes
+        self._signed_bytes = None
+        # Trace of a sampled packet, see Tracer
+        self._trace = None
 
     def to_bytes(self):
         """
+        Raises ValueError if it does not fit in PACKET_LEN bytes.
         @return     byte representation of this class
         """
+        fields = {
+            'src': self.src,
+            'dst': self.dst,
+            'type': self.type,
+            'payload': self.payload,
+            'seq': self.seq,
+        }
+        if self.signature:
+            fields['signature'] = self.signature
+        if self.scheme is not None:
+            fields['scheme'] = self.scheme
         json_serialization = json.dumps(
-            vars(self),
+            fields,
             cls=BBBPacketEncoder,
             sort_keys=True,
         )
+        # Longer packets would be cut at PACKET_LEN by the receiver
+        if len(json_serialization) > PACKET_LEN:
+            raise ValueError('Packet too large: {} bytes'.format(
+                len(json_serialization)))
         return pad(json_serialization).encode()
 
+    def signed_bytes(self):
+        """Canonical byte representation of this packet without its
+        signature, which is what gets signed and verified. It does not depend
+        on the wire format, so packets can be forwarded in any format.
+        Decoders that already hold these bytes store them in _signed_bytes.
+        @return     bytes covered by the signature
+        """
+        signed = self._signed_bytes
+        if signed is not None:
+            return signed
+        payload = self.payload.encode()
+        scheme = self.scheme
+        return SIGNED_HEADER.pack(
+            self.type.value,
+            NO_SCHEME if scheme is None else scheme.value,
+            self.seq,
+            socket.inet_aton(self.src),
+            socket.inet_aton(self.dst),
+            len(payload),
+        ) + payload
+
     @classmethod
     def from_bytes(cls, bytes, object_hook=as_enum):
         """
@@ -100,11 +174,21 @@ class BBBPacket(object):
 class RouterBase(object):
     """Base Class for this Router.
     """
-    def __init__(self, ip_address, test=False):
-        self.routes = {}        # dst_ip: next_hop_ip
+    def __init__(self, ip_address, test=False,
+                 scheme=SignatureScheme.RSA_PSS, key_dir=None):
+        """
+        @ip_address     local IP to listen on
+        @scheme         SignatureScheme packets are signed with
+        @key_dir        directory the packet key is kept in across restarts,
+                        None generates a new key on every start
+        """
+        self.ip_address = ip_address
+        self.routes = RouteTable()  # dst_ip: next_hop_ip
         self.sockets = {}       # next_hop_ip: socket_instance
-        self.keys = {}          # ip: packet_public_key
+        self.keys = {}          # ip: packet_public_key, never expire
+        self.key_directory = None   # KeyDirectory for all other keys
         self.sqn_numbers = {}   # ip: most recent sequence number received
+        self.flood_cache = FloodCache() # (ip, sequence number) of FLOODs seen
         self.neighbors = set()  # ip addresses of neighbors
         self.hosts = []         # any hosts attached to this router
         self.buffer_lock = Lock()
@@ -116,14 +200,26 @@ class RouterBase(object):
         self.test = test
 
         # Key used for signing packets
-        self.packet_key = RSA.generate(2048)
+        self.signature_scheme = get_scheme(scheme)
+        if key_dir:
+            self.packet_key = load_or_generate(
+                key_dir, ip_address, self.signature_scheme)
+        else:
+            self.packet_key = self.signature_scheme.generate()
+        self.public_key = self.signature_scheme.public_key(self.packet_key)
 
-        self.keys[ip_address] = self.packet_key.publickey()
+        self.keys[ip_address] = self.public_key
+        self.registered = threading.Event()     # set once the key is in bdb
 
         # Connect to bigchaindb
         if not test:
+            # Imported here, the driver takes longer to import than the
+            # rest of sim
+            from bigchaindb_driver import BigchainDB
+            from bigchaindb_driver.crypto import CryptoKeypair
             bdb_root_url = 'http://localhost:9984' # TODO: is this right?
             self.bdb = BigchainDB(bdb_root_url)
+            self.key_directory = KeyDirectory(self.bdb)
             # Read bdb keypair from the .bigchaindb config file
             with open('build/.bigchaindb') as f:
                 d = json.load(f)
@@ -133,31 +229,67 @@ class RouterBase(object):
             )
             self.keyring = d['keyring']
 
-            print('My key:')
-            print(self.packet_key.publickey().export_key().decode())
-
-
-            # Add packet public key, IP addr to bigchaindb
-            asset = {'data':
-                        {
-                            'public_key': self.packet_key.publickey().export_key().decode(),
-                            'ip_address': ip_address,
-                        },
-                    }
-            prepared_transaction = self.bdb.transactions.prepare(
-                operation = 'CREATE',
-                signers = self.bdb_keypair.public_key,
-                asset = asset,
-            )
-            fulfilled_transaction = self.bdb.transactions.fulfill(
-                prepared_transaction,
-                private_keys = self.bdb_keypair.private_key,
-            )
-            sent_txn = self.bdb.transactions.send(fulfilled_transaction)
-
-
             self.socket = socket.socket()
             self.socket.bind((ip_address, ROUTER_PORT))
             self.socket.listen()
-        self.ip_address = ip_address
-        print("starting server on {0}:{1}".format(ip_address, ROUTER_PORT))
+
+            # Registration waits for BigchainDB, connections are accepted
+            # meanwhile
+            threading.Thread(target=self.register_key, daemon=True).start()
+        log.info('starting server', address=ip_address, port=ROUTER_PORT)
+
+    def key_asset(self):
+        """
+        @return     BigchainDB asset data publishing this router's packet
+                    public key
+        """
+        return {
+            'public_key': self.signature_scheme.export_public_key(
+                self.public_key),
+            'signature_scheme': self.signature_scheme.scheme.name,
+            'ip_address': self.ip_address,
+            'registered_at': time.time(),
+        }
+
+    def key_registered(self, data):
+        """
+        @data       asset data, see key_asset
+        @return     True if the latest asset BigchainDB has for this router
+                    already publishes data's key
+        """
+        latest = latest_key_asset(
+            self.bdb.assets.get(search=self.ip_address), self.ip_address)
+        return latest is not None and all(
+            latest.get(k) == v for k, v in data.items()
+            if k != 'registered_at')
+
+    def register_key(self, retry=REGISTER_RETRY):
+        """Adds packet public key, its scheme and IP addr to bigchaindb,
+        unless it is there already, e.g. from before a restart with the same
+        key. Retries with exponential backoff until it succeeds.
+        @retry      seconds to wait before the first retry
+        """
+        data = self.key_asset()
+        while True:
+            try:
+                if self.key_registered(data):
+                    log.info('key already registered', address=self.ip_address)
+                else:
+                    prepared_transaction = self.bdb.transactions.prepare(
+                        operation = 'CREATE',
+                        signers = self.bdb_keypair.public_key,
+                        asset = {'data': data},
+                    )
+                    fulfilled_transaction = self.bdb.transactions.fulfill(
+                        prepared_transaction,
+                        private_keys = self.bdb_keypair.private_key,
+                    )
+                    self.bdb.transactions.send(fulfilled_transaction)
+                    log.info('registered key', address=self.ip_address,
+                             key=data['public_key'])
+                self.registered.set()
+                return
+            except Exception as e:
+                log.warning('could not register key', error=e, retry=retry)
+                time.sleep(retry)
+                retry = min(retry * 2, REGISTER_RETRY_MAX)
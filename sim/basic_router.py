@@ -1,19 +1,37 @@
+from sim.admission import ADMIT_BURST, ADMIT_RATE, AdmissionControl
 from sim.base import (
     BBBPacket, BBBPacketType, RouterBase,
-    PACKET_LEN, ROUTER_PORT, DEBUG
+    BROADCAST_ADDRESS, ROUTER_PORT, UNORDERED_TYPES
 )
+from sim.codec import FrameReader, WireFormat, encode_packet
+from sim.keystore import KEY_DIRECTORY
+from sim.log import LEVELS, LOG_LEVEL, configure, get_logger
+from sim.metrics import METRICS_PORT, MetricsServer, RouterMetrics
+from sim.routing import (
+    FULL_SYNC_INTERVAL, broadcast_update, neighbor_update
+)
+from sim.send_queue import (
+    BackpressurePolicy, FairSendQueue, SendQueue, SEND_QUEUE_LEN
+)
+from sim.signing import SigningPipeline
+from sim.signatures import SignatureScheme, get_scheme
+from sim.timers import HOLD_DOWN, ROUTE_UPDATE_PERIOD, UpdateTimer
+from sim.tracing import ProfileMode, Profiler, TRACE_SAMPLE_RATE, Tracer
+from sim.verification import VerificationPipeline
+import argparse
 import binascii
 import socket
 import threading
 import time
 import json
-import sys
-from copy import deepcopy
-from Crypto.Signature import pss
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
-from pprint import pprint
+from sys import intern
+
+
+RECV_LEN = 65536
+HELLO_FLOOD_PERIOD = 10     # seconds between packets of the flood command
+CONNECT_TIMEOUT = 5         # seconds to connect to a neighbor
 
+log = get_logger('sim.router')
 
 class BasicRouter(RouterBase):
     """Basic Router Class
@@ -21,29 +39,118 @@ class BasicRouter(RouterBase):
         Main Thread:
             Implements a basic cli by taking in user input
         ROUTEUPDATE Thread:
-            Periodically sends local routing information to neighboring nodes
+            Periodically sends local routing information to neighboring nodes,
+            and whenever the routing table changes (see UpdateTimer)
         LISTEN Thread:
             Listens/Accepts new connections, dispatches a client thread to
             handle any new sockets
         Client Thread:
             Created for every open socket, listens to the socket for data
             Dispatches read data to the proper handler
+        Writer Thread:
+            Created for every open socket, drains the socket's SendQueue.
+            With fair_queuing, as in NPBR, every source has its own buffer
+            and sources take turns (see FairSendQueue)
+        VERIFY Thread:
+            Only if verify_workers is set. Client threads hand the packets
+            that pass AdmissionControl to a
+            VerificationPipeline, which verifies them in batches on a process
+            pool and dispatches them to the proper handler
+        SIGN Thread:
+            Only if sign_workers is set. Sends the packets originated by the
+            flood and send commands once a SigningPipeline signed them on a
+            process pool
+        METRICS Thread:
+            Only if metrics_port is set. Serves the router's RouterMetrics
+            over HTTP at /metrics
     """
-    def __init__(self, ip_address, test=False):
+    def __init__(self, ip_address, test=False, wire_format=WireFormat.JSON,
+                 send_queue_len=SEND_QUEUE_LEN,
+                 backpressure=None,
+                 verify_workers=0, scheme=SignatureScheme.RSA_PSS,
+                 full_sync_interval=FULL_SYNC_INTERVAL,
+                 route_update_period=ROUTE_UPDATE_PERIOD, hold_down=HOLD_DOWN,
+                 metrics_port=METRICS_PORT, trace_rate=TRACE_SAMPLE_RATE,
+                 key_dir=None, sign_workers=0, fair_queuing=True,
+                 admission=True, admit_rate=ADMIT_RATE,
+                 admit_burst=ADMIT_BURST):
         # Call parent's init
-        super().__init__(ip_address, test=test)
+        super().__init__(ip_address, test=test, scheme=scheme,
+                         key_dir=key_dir)
+
+        # Counters and histograms, served on metrics_port (0 disables it)
+        self.metrics = RouterMetrics(self)
+        self.metrics_port = metrics_port
+        # Per-stage spans of a sample of received packets, and captures
+        # started from the CLI
+        self.tracer = Tracer(trace_rate)
+        self.profiler = Profiler()
+
+        # WireFormat used for neighbors we have not heard from yet. Once a
+        # neighbor sends us a packet we answer in the format it used.
+        self.wire_format = wire_format
+        self.peer_formats = {}  # ip: WireFormat last received from ip
+
+        self.send_queues = {}   # next_hop_ip: SendQueue of its socket
+        # Packets queued per neighbor, or per source and neighbor with
+        # fair_queuing
+        self.send_queue_len = send_queue_len
+        # A blocked send queue blocks the client thread forwarding into it,
+        # and with it every packet behind on the same link, so full sources
+        # are dropped from by default with fair_queuing
+        if backpressure is None:
+            backpressure = BackpressurePolicy.DROP_NEWEST if fair_queuing \
+                else BackpressurePolicy.BLOCK
+        self.backpressure = backpressure
+        self.fair_queuing = fair_queuing
+
+        # Route advertisement state, see send_route_updates
+        self.synced = set()     # neighbor_ip that has our full table
+        self.full_sync_interval = full_sync_interval
+        self.route_cycle = 0
+        self.route_timer = UpdateTimer(
+            period=route_update_period, hold_down=hold_down)
+
+        # Cheap checks received packets pass before they are verified, so a
+        # neighbor sending garbage cannot keep us busy verifying it
+        self.admission = None
+        if admission:
+            self.admission = AdmissionControl(
+                self, rate=admit_rate, burst=admit_burst)
+        self.verification = None
+        if verify_workers:
+            self.verification = VerificationPipeline(
+                self, workers=verify_workers).start()
+        self.signing = None
+        if sign_workers:
+            self.signing = SigningPipeline(
+                self, workers=sign_workers).start()
 
         # For unit tests
         if not test:
-            # Start LISTEN and ROUTEUPDATE thread
-            threading.Thread(target=self.accept_connections).start()
-            threading.Thread(target=self.update_neighbors).start()
+            self.serve()
 
-            # Task main thread with handling CLI
-            while True:
-                cli_input = input()
-                self.handle_cli(cli_input)
+    def serve(self):
+        """Starts the LISTEN and ROUTEUPDATE threads and handles the CLI on
+        the main thread. Never returns.
+        """
+        self.start_metrics_server()
+        threading.Thread(target=self.accept_connections).start()
+        threading.Thread(target=self.update_neighbors).start()
 
+        # Task main thread with handling CLI
+        while True:
+            cli_input = input()
+            self.handle_cli(cli_input)
+
+    def start_metrics_server(self):
+        """Serves the router's metrics on its address, if metrics_port is set.
+        """
+        if self.metrics_port:
+            MetricsServer(self.metrics, self.ip_address,
+                          self.metrics_port).start()
+            log.info('serving metrics', address=self.ip_address,
+                     port=self.metrics_port)
 
     def handle_cli(self, cli_input):
         """Tokenizes and calls proper handler for any recognized cli commands
@@ -51,65 +158,251 @@ class BasicRouter(RouterBase):
         """
         cli_input_tokens = cli_input.split()
         try:
-            # Send command, format: send <ip> <cnt>
-            # Simply sends <cnt> packets to <ip> from this router
-            if cli_input_tokens[0] == "flood":
-                address, count = cli_input_tokens[1:]
-                threading.Thread(target=self.send_hello_flood(address, count)).start()
+            # Send command, format: flood <ip> <cnt> [period]
+            # Simply sends <cnt> packets to <ip> from this router, period
+            # seconds apart
+            # send <ip> <cnt> [period] does the same with DATA packets,
+            # which follow the route to <ip>
+            if cli_input_tokens[0] in ("flood", "send"):
+                address, count, *period = cli_input_tokens[1:]
+                period = float(period[0]) if period else HELLO_FLOOD_PERIOD
+                packet_type = BBBPacketType.FLOOD \
+                    if cli_input_tokens[0] == "flood" else BBBPacketType.DATA
+                self.start_hello_flood(address, int(count), period,
+                                       packet_type)
+            # Diagnostics command, format: diagnostics
+            elif cli_input_tokens[0] == "diagnostics":
+                self.print_diagnostics()
+            elif cli_input_tokens[0] in ("trace", "profile"):
+                self.handle_trace_cli(cli_input_tokens)
             else:
                 raise Exception()
         except Exception as e:
             print(e)
             print("unrecognized command")
 
+    def start_hello_flood(self, dst, count, period, packet_type):
+        """Runs send_hello_flood for the flood and send commands on its own
+        thread, so the CLI stays responsive.
+        """
+        threading.Thread(
+            target=self.send_hello_flood,
+            args=(dst, count, period, packet_type),
+        ).start()
+
+    def handle_trace_cli(self, cli_input_tokens):
+        """Handles the tracing and profiling commands:
+            trace                       prints per-stage percentiles
+            trace <rate>                traces a fraction rate of packets,
+                                        0 stops tracing
+            profile start [mode] [file] starts a cprofile (default) or
+                                        sample capture
+            profile stop                writes the capture to its file
+        @cli_input_tokens   list of str parsed from user input
+        """
+        command, args = cli_input_tokens[0], cli_input_tokens[1:]
+        if command == "trace":
+            if args:
+                self.tracer.set_rate(float(args[0]))
+            print(self.tracer.format_report())
+        elif args[0] == "start":
+            mode = ProfileMode[args[1].upper()] if len(args) > 1 \
+                else ProfileMode.CPROFILE
+            extension = '.prof' if mode == ProfileMode.CPROFILE else '.folded'
+            path = args[2] if len(args) > 2 \
+                else 'profile-{}{}'.format(self.ip_address, extension)
+            self.start_profiler(mode, path)
+            print('profiling to {}'.format(path))
+        elif args[0] == "stop":
+            print('wrote {}'.format(self.profiler.stop()))
+        else:
+            raise Exception()
+
+    def start_profiler(self, mode, path):
+        """Starts a capture of the Profiler. CPROFILE captures profile
+        packet handling in every client thread.
+        """
+        self.profiler.start(mode, path)
+
     def update_neighbors(self):
-        """Periodically sends out routing information to neighbors.
-        Implements Split Horizon to avoid Count-to-Infinity problems.
+        """Sends out routing information to neighbors, periodically and when
+        the routing table changes.
         """
+        periodic = True
         while True:
-            # Calculate a dictionary where each key is the ip of a neighbor
-            # and the value is a list of all the destinations we should display
-            # format: {neighbor_ip: [dst_ip]}
-            route_updates = {
-                n: [d for d in self.routes if self.routes[d] != n]
-                for n in self.neighbors
-            }
-
-            # Iterate through calculated updates
-            for neighbor, routes in route_updates.items():
-                if routes:
-                    # Get old socket for the neighbors_ip if it exists
-                    try:
-                        neighbor_socket = self.sockets[neighbor]
-                    except KeyError:
-                        # If it does not exist, make a new one, store it in
-                        # the list of open sockets and dispatch a client thread
-                        neighbor_endpoint = (neighbor, ROUTER_PORT)
-                        neighbor_socket = socket.socket()
-                        neighbor_socket.connect(neighbor_endpoint)
-                        self.sockets[neighbor] = neighbor_socket
-                        threading.Thread(
-                            target=self.handle_client,
-                            args=(neighbor_socket, neighbor_endpoint)
-                        ).start()
-
-                    # Create and send appropriate route packet for neighbor
-                    self.sqn_lock.acquire()
-                    route_packet = BBBPacket(
-                        src=self.ip_address,
-                        dst=neighbor,
-                        type=BBBPacketType.ROUTEUPDATE,
-                        payload=json.dumps(routes),
-                        seq=self.sqn_counter,
-                    )
-                    self.sqn_counter += 1
-                    self.sqn_lock.release()
-                    self.sign(route_packet)
-                    self.socket_lock.acquire()
-                    neighbor_socket.sendall(route_packet.to_bytes())
-                    self.socket_lock.release()
-            time.sleep(30)
+            self.connect_neighbors()
+            self.send_route_updates(periodic)
+            self.route_timer.sent(periodic)
+            periodic = self.route_timer.wait()
+
+    def trigger_route_update(self):
+        """Schedules a triggered route update if the routing table changed.
+        """
+        if self.routes.has_changes():
+            self.route_timer.trigger()
+
+    def connect_neighbors(self):
+        """Connects to every neighbor without a connection. Neighbors that
+        cannot be reached are retried on the next route update.
+        """
+        for neighbor in self.neighbors - set(self.sockets):
+            try:
+                self.connect_neighbor(neighbor)
+            except OSError as e:
+                log.warning('could not connect to neighbor',
+                            neighbor=neighbor, error=e)
+
+    def connect_neighbor(self, neighbor):
+        """Opens a connection to neighbor, stores it in the list of open
+        sockets and dispatches a client thread for it.
+        @neighbor       ip address of the neighbor
+        """
+        neighbor_endpoint = (neighbor, ROUTER_PORT)
+        neighbor_socket = socket.create_connection(
+            neighbor_endpoint, timeout=CONNECT_TIMEOUT)
+        neighbor_socket.settimeout(60)
+        self.register_socket(neighbor, neighbor_socket)
+        threading.Thread(
+            target=self.handle_client,
+            args=(neighbor_socket, neighbor_endpoint)
+        ).start()
+
+    def send_route_updates(self, periodic=True):
+        """Sends local routing information to every connected neighbor.
+        Updates are broadcast: one packet, signed once, is sent to all
+        neighbors, and carries the split horizon for each of them (see
+        broadcast_update) to avoid Count-to-Infinity problems.
+        Only destinations that changed since the last cycle are advertised,
+        as a delta. Neighbors that do not have our full table yet, and all
+        neighbors every full_sync_interval-th periodic cycle, get the full
+        table instead, like before deltas existed.
+        @periodic       False for triggered updates, which never full sync
+        """
+        changed = self.routes.pop_changes()
+        full_sync = False
+        if periodic:
+            full_sync = self.route_cycle % self.full_sync_interval == 0
+            self.route_cycle += 1
+
+        connected = [n for n in list(self.neighbors) if n in self.sockets]
+        # Start over with a full table once a neighbor is reconnected
+        self.synced.intersection_update(connected)
+        if full_sync:
+            full, delta = connected, []
+        else:
+            full = [n for n in connected if n not in self.synced]
+            delta = [n for n in connected if n in self.synced]
+
+        # An empty table only needs to be sent to withdraw what was
+        # advertised before
+        if full and (self.routes or self.synced.intersection(full)):
+            self.broadcast_route_update(
+                full, broadcast_update(self.routes, full))
+        else:
+            self.synced.update(full)
+        if delta and changed:
+            self.broadcast_route_update(
+                delta, broadcast_update(self.routes, delta, changed))
+
+    def broadcast_route_update(self, neighbors, update):
+        """Signs a ROUTEUPDATE with payload update once and sends it to
+        neighbors.
+        @neighbors      ip addresses of the neighbors to send it to
+        @update         payload, see broadcast_update
+        """
+        route_packet = BBBPacket(
+            src=self.ip_address,
+            dst=BROADCAST_ADDRESS,
+            type=BBBPacketType.ROUTEUPDATE,
+            payload=json.dumps(update, sort_keys=True),
+            seq=self.next_sqn(),
+        )
+        self.sign(route_packet)
+        for neighbor in neighbors:
+            if self.send_packet(neighbor, route_packet):
+                self.synced.add(neighbor)
+            else:
+                # The neighbor missed this update, resync it next cycle
+                self.synced.discard(neighbor)
+
+    def next_sqn(self):
+        """Allocates the next sequence number for a packet originated here.
+        """
+        self.sqn_lock.acquire()
+        seq = self.sqn_counter
+        self.sqn_counter += 1
+        self.sqn_lock.release()
+        return seq
+
+    def peer_format(self, neighbor):
+        """Returns the WireFormat to use when sending to neighbor.
+        """
+        return self.peer_formats.get(neighbor, self.wire_format)
+
+    def register_socket(self, neighbor, neighbor_socket):
+        """Stores an open socket for neighbor and starts its writer thread.
+        @neighbor           ip address of the neighbor
+        @neighbor_socket    socket_instance connected to the neighbor
+        """
+        old_queue = self.send_queues.get(neighbor)
+        self.sockets[neighbor] = neighbor_socket
+        # A new connection may be a restarted neighbor without our table
+        self.synced.discard(neighbor)
+        queue_cls = FairSendQueue if self.fair_queuing else SendQueue
+        self.send_queues[neighbor] = queue_cls(
+            neighbor_socket,
+            maxlen=self.send_queue_len,
+            policy=self.backpressure,
+            tracer=self.tracer,
+        ).start()
+        if old_queue:
+            old_queue.close()
 
+    def unregister_socket(self, neighbor, neighbor_socket):
+        """Forgets neighbor_socket and stops its writer thread, unless it has
+        already been replaced by a newer connection.
+        """
+        if self.sockets.get(neighbor) is neighbor_socket:
+            del self.sockets[neighbor]
+            self.synced.discard(neighbor)
+            queue = self.send_queues.pop(neighbor, None)
+            if queue:
+                queue.close()
+
+    def send_packet(self, neighbor, packet):
+        """Sends packet to neighbor.
+        The packet is put on the neighbor's SendQueue and written by its
+        writer thread. Sockets without a queue (i.e. not registered through
+        register_socket) are written to directly.
+        @neighbor       ip address of the neighbor
+        @packet         BBBPacket instance to be sent
+        @return         False if the packet was dropped, e.g. because
+                        neighbor is not connected (yet)
+        """
+        queue = self.send_queues.get(neighbor)
+        neighbor_socket = self.sockets.get(neighbor)
+        if queue is None and neighbor_socket is None:
+            self.metrics.send_dropped.inc(packet.type.name, 'not_connected')
+            return False
+        self.metrics.packets.inc(packet.type.name, 'out')
+        trace = packet._trace
+        if trace:
+            trace.mark('handle')
+        data = encode_packet(packet, self.peer_format(neighbor))
+        if trace:
+            trace.mark('encode')
+        if queue:
+            sent = queue.put(data, packet.src)
+        else:
+            self.socket_lock.acquire()
+            try:
+                neighbor_socket.sendall(data)
+            finally:
+                self.socket_lock.release()
+            sent = True
+        if trace:
+            trace.mark('send')
+        return sent
 
     def accept_connections(self):
         """Listens for any incoming connections and attempts to accept them.
@@ -118,7 +411,7 @@ class BasicRouter(RouterBase):
         while True:
             client, address = self.socket.accept()
             client.settimeout(60)
-            self.sockets[address[0]] = client
+            self.register_socket(address[0], client)
             threading.Thread(
                 target=self.handle_client,
                 args=(client, address)
@@ -139,50 +432,118 @@ class BasicRouter(RouterBase):
         if packet.type == BBBPacketType.MASTERCONFIG:
             return True
 
-        # Check if the packet has a sequence number greater than the the last
-        # seen sequence number for that sender.
+        # Spans of sampled packets, see Tracer
+        trace = packet._trace
+
+        # Check if the packet has a sequence number greater than the the
+        # last seen sequence number for that sender.
+        if self.is_stale(packet):
+            return self.reject(packet, 'stale')
+        if not packet.signature:
+            return self.reject(packet, 'unsigned')
+        if trace:
+            trace.mark('verify.check')
+
+        # Get public key of source. This may query BigchainDB, so it is
+        # done without holding the buffer lock.
         try:
-            self.buffer_lock.acquire()
-            if packet.src in self.sqn_numbers and packet.seq <= self.sqn_numbers[packet.src]:
-                return False
-            if not packet.signature:
-                return False
+            src_public_key = self.get_key(packet.src)
+        except Exception as e:
+            return self.reject(packet, 'no_key', e)
+        if trace:
+            trace.mark('verify.key')
 
-            # Check the signature included in the packet
-            copy = deepcopy(packet)
-            del copy.signature
-            serialization = copy.to_bytes()
-            h = SHA256.new(serialization)
-
-            # Get public key of source
-            if packet.src not in self.keys:
-                # Query BigchainDB
-                query = self.bdb.assets.get(search=packet.src)
-                # Replace this with fail silent?
-                assert query[0]['data']['ip_address'] == packet.src
-                self.keys[packet.src] = RSA.import_key(query[0]['data']['public_key'].encode())
-            src_public_key = self.keys[packet.src]
-            verifier = pss.new(src_public_key)
-            verifier.verify(h, binascii.a2b_base64(packet.signature))
+        # Check the signature included in the packet, using the scheme
+        # it was signed with
+        try:
+            scheme = get_scheme(packet.scheme)
+            signed = packet.signed_bytes()
+            signature = binascii.a2b_base64(packet.signature)
+        except Exception as e:
+            return self.reject(packet, 'bad_signature', e)
+        if trace:
+            trace.mark('verify.serialize')
+        start = time.perf_counter()
+        try:
+            scheme.verify(src_public_key, signed, signature)
+        except Exception as e:
+            return self.reject(packet, 'bad_signature', e)
+        finally:
+            self.metrics.verify_seconds.observe(time.perf_counter() - start)
+        if trace:
+            trace.mark('verify.signature')
+
+        if not self.accept_sqn(packet):
+            return self.reject(packet, 'stale')
+        if trace:
+            trace.mark('verify.sqn')
+        self.metrics.verify_results.inc('ok')
+        return True
+
+    def reject(self, packet, reason, error=None):
+        """Counts and logs a packet that failed verification.
+        @reason     why it failed, the result label of bbb_verify_total
+        @return     False
+        """
+        self.metrics.verify_results.inc(reason)
+        log.debug('packet rejected', reason=reason, src=packet.src,
+                  dst=packet.dst, type=packet.type.name, seq=packet.seq,
+                  error=error)
+        return False
+
+    def accept_sqn(self, packet):
+        """Records packet's sequence number once its signature is verified.
+        @return     False if the sequence number is stale
+        """
+        if packet.type in UNORDERED_TYPES:
+            return self.flood_cache.add(packet.src, packet.seq)
+        self.buffer_lock.acquire()
+        try:
+            # Another thread may have accepted this sequence number meanwhile
+            if self.is_stale(packet):
+                return False
             # We can verify the packet, so add the sqn number to our buffer
             self.sqn_numbers[packet.src] = packet.seq
             return True
-        except Exception as e:
-            print(e)
-            return False
         finally:
             self.buffer_lock.release()
 
+    def is_stale(self, packet):
+        """FLOOD and DATA packets are checked against the FloodCache, so
+        they may arrive out of order but are only accepted once. All other
+        packets need a higher sequence number than the last one accepted
+        from their source.
+        @return     True if packet must be rejected as a replay
+        """
+        if packet.type in UNORDERED_TYPES:
+            return not self.flood_cache.check(packet.src, packet.seq)
+        last_seq = self.sqn_numbers.get(packet.src)
+        return last_seq is not None and packet.seq <= last_seq
+
+    def get_key(self, ip):
+        """Returns the packet public key of ip.
+        Keys in self.keys take precedence, all others are looked up in the
+        KeyDirectory. Raises KeyError if no key is known.
+        """
+        try:
+            return self.keys[ip]
+        except KeyError:
+            if self.key_directory is None:
+                raise
+        return self.key_directory.get(ip)
 
     def sign(self, packet):
         """
-        Signs a packet. This modifies packet by adding a signature attribute
+        Signs a packet. This modifies packet by adding a signature attribute,
+        and a scheme attribute recording this router's SignatureScheme
         """
-        serialization = packet.to_bytes()
-        h = SHA256.new(serialization)
-
-        verifier = pss.new(self.packet_key)
-        signature = verifier.sign(h)
+        packet.scheme = self.signature_scheme.scheme
+        # Bytes kept from decoding no longer match once the scheme changed
+        packet._signed_bytes = None
+        start = time.perf_counter()
+        signature = self.signature_scheme.sign(
+            self.packet_key, packet.signed_bytes())
+        self.metrics.sign_seconds.observe(time.perf_counter() - start)
         packet.signature = binascii.b2a_base64(signature).decode('utf-8')
 
     def handle_masterconfig(self, packet):
@@ -192,21 +553,54 @@ class BasicRouter(RouterBase):
         Since these are purely for simulation purposes, no need to verify
         """
         config = json.loads(packet.payload)
-        for host in config['hosts']:
+        hosts = [intern(host) for host in config['hosts']]
+        neighbors = [intern(n) for n in config['neighbors']]
+        if self.key_directory:
+            self.key_directory.prefetch(
+                set(neighbors).union(map(intern, config.get('routers', []))))
+        for host in hosts:
             self.routes[host] = None
-        self.hosts = config['hosts']
-        self.neighbors = self.neighbors.union(config["neighbors"])
+        self.hosts = hosts
+        self.neighbors = self.neighbors.union(neighbors)
         for n in self.neighbors:
             self.routes[n] = n
+        self.trigger_route_update()
 
     def handle_routeupdate(self, packet):
         """Handles ROUTEUPDATE packets
         A ROUTEUPDATE packet causes a router to update its routes and neighbors.
+        The payload is either the full list of destinations reachable through
+        the sender, replacing all routes through it, or a delta of
+        {"add": [dst_ip], "withdraw": [dst_ip]}, after applying the split
+        horizon of broadcast updates.
         """
-        for dst in json.loads(packet.payload):
-            self.routes[dst] = packet.src
-            self.neighbors.add(packet.src)
+        update = neighbor_update(json.loads(packet.payload), self.ip_address)
+        if isinstance(update, list):
+            add = update
+            withdraw = [
+                d for d, next_hop in list(self.routes.items())
+                if next_hop == packet.src and d != packet.src
+            ]
+        else:
+            add = update.get('add', [])
+            withdraw = update.get('withdraw', [])
+
+        self.neighbors.add(packet.src)
+        # Interned like packet addresses, so every table shares one string
+        # per address
+        add = set(map(intern, add))
+        for dst in withdraw:
+            # Only forget routes that actually go through the sender
+            if dst not in add and self.routes.get(dst) == packet.src:
+                del self.routes[dst]
+        for dst in add:
+            # Routes carry no metric, so an existing route is kept until its
+            # next hop withdraws it. Replacing it would make routes flap
+            # around every cycle in the topology.
+            if dst != self.ip_address and dst not in self.routes:
+                self.routes[dst] = packet.src
         self.routes[packet.src] = packet.src
+        self.trigger_route_update()
 
     def handle_flood(self, packet, address):
         """Handles FLOOD packets
@@ -216,15 +610,46 @@ class BasicRouter(RouterBase):
         the packet came in on.
         """
         if packet.dst == self.ip_address or packet.dst in self.hosts:
-            print('Received FLOOD packet destined for this router: {}'.format(packet.payload))
+            self.metrics.floods_delivered.inc()
+            log.info('flood delivered', src=packet.src, dst=packet.dst,
+                     seq=packet.seq, payload=packet.payload)
             return
         for neighbor in self.neighbors:
             if neighbor != address[0]:
-                print('Sending FLOOD packet to neighbor {}'.format(neighbor))
-                neighbor_socket = self.sockets[neighbor]
-                self.socket_lock.acquire()
-                neighbor_socket.sendall(packet.to_bytes())
-                self.socket_lock.release()
+                self.metrics.floods_forwarded.inc()
+                self.send_packet(neighbor, packet)
+
+    def handle_data(self, packet, address):
+        """Handles DATA packets
+        A DATA packet destined for this Router or its hosts is accepted.
+        Otherwise it is forwarded to the next hop of its destination.
+        """
+        if packet.dst == self.ip_address or packet.dst in self.hosts:
+            self.metrics.data_delivered.inc()
+            log.info('data delivered', src=packet.src, dst=packet.dst,
+                     seq=packet.seq, payload=packet.payload)
+            return
+        self.forward_data(packet, address[0])
+
+    def forward_data(self, packet, incoming=None):
+        """Sends a DATA packet to the next hop of its destination. Without a
+        connected next hop, or if the route leads back where the packet came
+        from, it is flooded out of all other links instead, like a FLOOD.
+        Routing loops end at the FloodCache, which only accepts a packet
+        once per router.
+        @incoming       ip address of the neighbor the packet came from, None
+                        if it was originated here
+        """
+        next_hop = self.routes.get(packet.dst)
+        if next_hop is not None and next_hop != incoming \
+                and next_hop in self.sockets:
+            self.metrics.data_forwarded.inc('route')
+            self.send_packet(next_hop, packet)
+            return
+        self.metrics.data_forwarded.inc('flood')
+        for neighbor in list(self.neighbors):
+            if neighbor != incoming:
+                self.send_packet(neighbor, packet)
 
     def handle_packet(self, packet, address):
         """Main packet handler.
@@ -240,6 +665,8 @@ class BasicRouter(RouterBase):
             self.handle_routeupdate(packet)
         elif packet.type == BBBPacketType.FLOOD:
             self.handle_flood(packet, address)
+        elif packet.type == BBBPacketType.DATA:
+            self.handle_data(packet, address)
         else:
             raise Exception("Unsupported BBBPacketType")
 
@@ -250,62 +677,233 @@ class BasicRouter(RouterBase):
         @client_socket      socket_instance produced by accept()
         @address            tuple of (ip, port)
         """
+        reader = FrameReader()
         while True:
             try:
-                data = client_socket.recv(PACKET_LEN)
+                data = client_socket.recv(RECV_LEN)
                 if not data:
                     raise Exception('Client disconnected')
 
-                packet = BBBPacket.from_bytes(data)
-                print('Received packet from {} destined to {} of type {}'.format(
-                    packet.src, packet.dst, packet.type))
-                if self.verify(packet):
-                    print('Verified packet from {} destined to {} of type {}'.format(
-                        packet.src, packet.dst, packet.type))
-                    self.handle_packet(packet, address)
+                # Decoding of every packet starts when the one before it
+                # was handled
+                start = time.perf_counter()
+                for packet in reader.feed(data):
+                    self.tracer.start(packet, start)
+                    self.peer_formats[address[0]] = reader.wire_format
+                    self.receive_packet(packet, address)
+                    start = time.perf_counter()
 
             except Exception as e:
-                print(e)
+                log.info('connection closed', peer=address[0], error=e)
+                self.unregister_socket(address[0], client_socket)
                 client_socket.close()
                 return False
 
-    def send_hello_flood(self, dst, count):
+    def receive_packet(self, packet, address):
+        """Verifies a packet read from address and dispatches it to the
+        proper handler.
+        @packet         BBBPacket instance read from the connection
+        @address        tuple of (ip, port)
+        @return         True if the packet was verified and handled, None if
+                        it was handed to the VerificationPipeline
+        """
+        if self.profiler.mode == ProfileMode.CPROFILE:
+            with self.profiler.profile():
+                return self.process_packet(packet, address)
+        return self.process_packet(packet, address)
+
+    def process_packet(self, packet, address):
+        """receive_packet, without profiling.
+        """
+        if not self.admit_packet(packet, address):
+            return False
+        if self.verification:
+            self.verification.submit(packet, address)
+            return None
+        return self.finish_packet(packet, address, self.verify(packet))
+
+    def admit_packet(self, packet, address):
+        """Counts a received packet and runs it through AdmissionControl.
+        @return         False if the packet was dropped before verification
+        """
+        self.metrics.packets.inc(packet.type.name, 'in')
+        log.debug('packet received', peer=address[0], src=packet.src,
+                  dst=packet.dst, type=packet.type.name, seq=packet.seq)
+        if self.admission and not self.admission.admit(packet, address):
+            self.tracer.finish(packet, 'rejected')
+            return False
+        return True
+
+    def finish_packet(self, packet, address, verified):
+        """Dispatches a verified packet to the proper handler and ends its
+        trace.
+        @verified       result of verifying packet
+        @return         verified
+        """
+        if not verified:
+            self.tracer.finish(packet, 'rejected')
+            return False
+        self.handle_packet(packet, address)
+        self.tracer.finish(packet)
+        return True
+
+    def send_flood(self, dst, payload):
+        """Originates a FLOOD packet with payload to dst on every neighbor.
+        The packet is signed once and the same copy is sent on every link,
+        so dst accepts whichever copy reaches it first.
+        """
+        self.originate(dst, payload, BBBPacketType.FLOOD)
+
+    def send_data(self, dst, payload):
+        """Originates a DATA packet with payload to dst, along its route.
+        """
+        self.originate(dst, payload, BBBPacketType.DATA)
+
+    def originate(self, dst, payload, packet_type):
+        """Signs and sends a new packet from this router.
+        """
+        packet = BBBPacket(
+            src=self.ip_address,
+            dst=dst,
+            type=packet_type,
+            payload=payload,
+            seq=self.next_sqn(),
+        )
+        self.sign(packet)
+        self.send_originated(packet)
+
+    def send_originated(self, packet):
+        """Sends a signed packet originated here: DATA packets along their
+        route, all others to every neighbor.
+        """
+        if packet.type == BBBPacketType.DATA:
+            self.forward_data(packet)
+            return
+        for address in list(self.neighbors):
+            self.send_packet(address, packet)
+
+    def send_hello_flood(self, dst, count, period=HELLO_FLOOD_PERIOD,
+                         packet_type=BBBPacketType.FLOOD):
         """Function to simply send a packet with hello string as its payload.
-        Invoked via CLI.
+        Invoked via CLI. With a period of 0 packets are sent as fast as they
+        can be signed and written, and signed ahead by the SigningPipeline
+        if there is one. Prints the rate achieved.
+        @count          number of packets
+        @period         seconds between packets
+        @packet_type    FLOOD, or DATA to send them along the route
+        @return         packets per second
         """
-        for i in range(int(count)):
-            for address in self.neighbors:
-                self.sqn_lock.acquire()
-                packet = BBBPacket(
+        start = time.perf_counter()
+        payloads = ("hello-{0}".format(i) for i in range(count))
+        if self.signing and not period:
+            self.signing.originate(
+                BBBPacket(
                     src=self.ip_address,
                     dst=dst,
-                    type=BBBPacketType.FLOOD,
-                    payload="hello-{0}".format(i),
-                    seq=self.sqn_counter,
+                    type=packet_type,
+                    payload=payload,
+                    seq=self.next_sqn(),
                 )
-                self.sqn_counter += 1
-                self.sqn_lock.release()
-                self.sign(packet)
-                self.socket_lock.acquire()
-                self.sockets[address].sendall(packet.to_bytes())
-                self.socket_lock.release()
-            time.sleep(10)
+                for payload in payloads
+            )
+        else:
+            for i, payload in enumerate(payloads):
+                if i:
+                    time.sleep(period)
+                self.originate(dst, payload, packet_type)
+        return report_rate(count, time.perf_counter() - start)
 
     def print_diagnostics(self):
         """Prints diagnostic information about this router.
         """
+        from pprint import pprint
         print("***Routes***")
         pprint(self.routes, width=1)
         print("***neighbors***")
         pprint(self.neighbors, width=1)
         print("***sockets***")
         pprint(self.sockets, width=1)
+        print("***send queues***")
+        pprint({n: q.stats() for n, q in self.send_queues.items()}, width=1)
         print("***keys***")
         pprint(self.keys, width=1)
-        print()
+        print("***route timer***")
+        pprint(self.route_timer.stats(), width=1)
+        print("***flood cache***")
+        pprint(self.flood_cache.stats(), width=1)
+        if self.key_directory:
+            print("***key directory***")
+            pprint(self.key_directory.stats(), width=1)
+        if self.admission:
+            print("***admission***")
+            pprint(self.admission.stats(), width=1)
+        if self.verification:
+            print("***verification***")
+            pprint(self.verification.stats(), width=1)
+        if self.signing:
+            print("***signing***")
+            pprint(self.signing.stats(), width=1)
+        print("***metrics***")
+        print(self.metrics.render())
+
+def report_rate(count, elapsed):
+    """Prints the rate count packets were originated at.
+    @return     packets per second
+    """
+    rate = count / elapsed if elapsed else 0
+    print("sent {} packets in {:.2f}s, {:.1f} packets/sec".format(
+        count, elapsed, rate))
+    return rate
+
+def main(router_cls):
+    """Parses command line arguments and starts a router_cls instance.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('ip_address', help='local IP to listen on')
+    parser.add_argument('--wire-format', default='json',
+                        choices=[f.name.lower() for f in WireFormat])
+    parser.add_argument('--scheme', default='rsa_pss',
+                        choices=[s.name.lower() for s in SignatureScheme
+                                 if not get_scheme(s).simulator_only])
+    parser.add_argument('--route-update-period', type=float,
+                        default=ROUTE_UPDATE_PERIOD,
+                        help='seconds between periodic route updates')
+    parser.add_argument('--hold-down', type=float, default=HOLD_DOWN,
+                        help='minimum seconds between route updates')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='port of the HTTP metrics endpoint, 0 disables '
+                             'it')
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=LEVELS)
+    parser.add_argument('--trace-rate', type=float, default=TRACE_SAMPLE_RATE,
+                        help='fraction of packets traced per stage')
+    parser.add_argument('--key-dir', default=KEY_DIRECTORY,
+                        help='directory the packet key is kept in across '
+                             'restarts')
+    parser.add_argument('--sign-workers', type=int, default=0,
+                        help='worker processes signing packets originated '
+                             'by the flood command ahead of sending, 0 '
+                             'signs them on the CLI thread')
+    parser.add_argument('--admit-rate', type=float, default=ADMIT_RATE,
+                        help='packets/sec admitted for verification per '
+                             'neighbor, 0 is unlimited')
+    parser.add_argument('--admit-burst', type=float, default=ADMIT_BURST,
+                        help='packets a neighbor may send at once above '
+                             '--admit-rate')
+    args = parser.parse_args()
+    configure(args.log_level)
+    router_cls(
+        args.ip_address,
+        wire_format=WireFormat[args.wire_format.upper()],
+        scheme=SignatureScheme[args.scheme.upper()],
+        route_update_period=args.route_update_period,
+        hold_down=args.hold_down,
+        metrics_port=args.metrics_port,
+        trace_rate=args.trace_rate,
+        key_dir=args.key_dir,
+        sign_workers=args.sign_workers,
+        admit_rate=args.admit_rate,
+        admit_burst=args.admit_burst,
+    )
 
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        BasicRouter(sys.argv[1])
-    else:
-        print("please run python3 -m sim.basic_router <local-IP>")
+    main(BasicRouter)
@@ -1,5 +1,5 @@
-from sim.basic_router import BasicRouter
-import sys
+from sim.base import BBBPacketType
+from sim.basic_router import BasicRouter, HELLO_FLOOD_PERIOD, log, main
 
 class FaultyFloodingRouter(BasicRouter):
     """Router that does not flood
@@ -12,10 +12,30 @@ class FaultyFloodingRouter(BasicRouter):
         Otherwise the packet is dropped (and not forwarded).
         """
         if packet.dst == self.ip_address or packet.dst in self.hosts:
-            print(packet.payload)
+            self.metrics.floods_delivered.inc()
+            log.info('flood delivered', src=packet.src, dst=packet.dst,
+                     seq=packet.seq, payload=packet.payload)
+
+    def handle_data(self, packet, address):
+        """Handles DATA packets
+        If the packet is destined for this Router simply "accept it".
+        Otherwise the packet is dropped (and not forwarded).
+        """
+        if packet.dst == self.ip_address or packet.dst in self.hosts:
+            self.metrics.data_delivered.inc()
+            log.info('data delivered', src=packet.src, dst=packet.dst,
+                     seq=packet.seq, payload=packet.payload)
+
+class GreedyFloodingRouter(BasicRouter):
+    """Router that hogs the network
+    Ignores the period of the flood and send commands and originates
+    packets back to back, as fast as it can sign and send them, to starve
+    the traffic of other sources.
+    """
+
+    def send_hello_flood(self, dst, count, period=HELLO_FLOOD_PERIOD,
+                         packet_type=BBBPacketType.FLOOD):
+        return super().send_hello_flood(dst, count, 0, packet_type)
 
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        FaultyFloodingRouter(sys.argv[1])
-    else:
-        print("please run python3 -m sim.byzantine_routers <local-IP>")
+    main(FaultyFloodingRouter)
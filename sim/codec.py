@@ -0,0 +1,149 @@
+import binascii
+import socket
+import struct
+from enum import Enum
+from sim.base import (
+    BBBPacket, BBBPacketType,
+    PACKET_LEN, SIGNED_HEADER, NO_SCHEME
+)
+from sim.signatures import SignatureScheme
+
+
+class WireFormat(Enum):
+    """
+    Enum for the encodings a BBBPacket can have on the wire
+    JSON:       Legacy format, JSON padded to PACKET_LEN bytes
+    BINARY:     Length prefixed frames with a fixed binary header
+    """
+    JSON = 0
+    BINARY = 1
+
+CODEC_VERSION = 3
+# Frame length, not including the length prefix itself
+FRAME_PREFIX = struct.Struct('!I')
+# Packet headers by codec version
+# 1: version, type, seq, src, dst, payload length, signature length
+# 2: version, type, signature scheme, seq, src, dst, payload length,
+#    signature length
+# 3: version, signature length, then SIGNED_HEADER (type, signature scheme,
+#    seq, src, dst, payload length). SIGNED_HEADER and the payload are the
+#    packet's signed bytes, so decoding keeps them without re-serializing.
+PACKET_HEADERS = {
+    1: struct.Struct('!BBQ4s4sIH'),
+    2: struct.Struct('!BBBQ4s4sIH'),
+    3: struct.Struct('!BH' + SIGNED_HEADER.format[1:]),
+}
+PACKET_HEADER = PACKET_HEADERS[CODEC_VERSION]
+SIGNED_OFFSET = PACKET_HEADER.size - SIGNED_HEADER.size
+# Keeps the first byte of every binary frame at 0, which is how binary
+# frames are told apart from JSON packets (which always start with '{')
+MAX_FRAME_LEN = 1 << 24
+JSON_START = ord('{')
+
+
+def encode_binary(packet):
+    """Encodes packet as a length prefixed binary frame.
+    @packet     BBBPacket instance
+    @return     bytes of the frame
+    """
+    signed = packet.signed_bytes()
+    signature = packet.signature
+    signature = binascii.a2b_base64(signature) if signature else b''
+    body_len = SIGNED_OFFSET + len(signed) + len(signature)
+    if body_len > MAX_FRAME_LEN:
+        raise ValueError('Packet too large: {} bytes'.format(body_len))
+    return b''.join((
+        FRAME_PREFIX.pack(body_len),
+        struct.pack('!BH', CODEC_VERSION, len(signature)),
+        signed,
+        signature,
+    ))
+
+def decode_binary(body):
+    """Decodes the body of a binary frame (without its length prefix).
+    @body       bytes of the frame body
+    @return     BBBPacket instance corresponding to body
+    """
+    header = PACKET_HEADERS.get(body[0])
+    if header is None:
+        raise ValueError('Unsupported codec version {}'.format(body[0]))
+    if body[0] == 1:
+        version, type, seq, src, dst, payload_len, sig_len = \
+            header.unpack_from(body)
+        scheme = NO_SCHEME
+    elif body[0] == 2:
+        version, type, scheme, seq, src, dst, payload_len, sig_len = \
+            header.unpack_from(body)
+    else:
+        version, sig_len, type, scheme, seq, src, dst, payload_len = \
+            header.unpack_from(body)
+    if header.size + payload_len + sig_len != len(body):
+        raise ValueError('Malformed frame')
+    payload_end = header.size + payload_len
+    signature = None
+    if sig_len:
+        signature = binascii.b2a_base64(body[payload_end:]).decode()
+    packet = BBBPacket(
+        src=socket.inet_ntoa(src),
+        dst=socket.inet_ntoa(dst),
+        type=BBBPacketType(type),
+        payload=body[header.size:payload_end].decode(),
+        seq=seq,
+        signature=signature,
+        scheme=None if scheme == NO_SCHEME else SignatureScheme(scheme),
+    )
+    if version == CODEC_VERSION:
+        packet._signed_bytes = body[SIGNED_OFFSET:payload_end]
+    return packet
+
+def encode_packet(packet, wire_format):
+    """Encodes packet in the given WireFormat. JSON packets that do not fit
+    in PACKET_LEN bytes are sent as binary frames, which FrameReader takes
+    on the same stream.
+    """
+    if wire_format == WireFormat.JSON:
+        try:
+            return packet.to_bytes()
+        except ValueError:
+            pass
+    return encode_binary(packet)
+
+
+class FrameReader(object):
+    """Reassembles packets from a byte stream.
+    Accepts both JSON packets and binary frames on the same stream, so packets
+    split or coalesced by TCP are handled in either format.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        # WireFormat of the most recently decoded packet
+        self.wire_format = None
+
+    def feed(self, data):
+        """Adds data read from the stream and yields every complete packet.
+        self.wire_format is set to the format of each packet before it is
+        yielded.
+        @data       bytes read from the stream
+        """
+        self.buffer += data
+        while self.buffer:
+            if self.buffer[0] == JSON_START:
+                if len(self.buffer) < PACKET_LEN:
+                    return
+                record = bytes(self.buffer[:PACKET_LEN])
+                del self.buffer[:PACKET_LEN]
+                self.wire_format = WireFormat.JSON
+                yield BBBPacket.from_bytes(record)
+            else:
+                if len(self.buffer) < FRAME_PREFIX.size:
+                    return
+                body_len, = FRAME_PREFIX.unpack_from(self.buffer)
+                if body_len > MAX_FRAME_LEN:
+                    raise ValueError('Frame too large: {} bytes'.format(body_len))
+                frame_len = FRAME_PREFIX.size + body_len
+                if len(self.buffer) < frame_len:
+                    return
+                body = bytes(self.buffer[FRAME_PREFIX.size:frame_len])
+                del self.buffer[:frame_len]
+                self.wire_format = WireFormat.BINARY
+                yield decode_binary(body)
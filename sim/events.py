@@ -0,0 +1,64 @@
+import heapq
+import itertools
+
+
+class EventScheduler(object):
+    """Discrete-event scheduler running on a virtual clock.
+    Events run in order of their time, events scheduled for the same time in
+    the order they were scheduled, so a simulation driven by it is
+    deterministic. Time only advances from one event to the next, so idle
+    periods cost nothing.
+    """
+    def __init__(self, start=0):
+        """
+        @start      virtual time in seconds the clock starts at
+        """
+        self.now = start
+        self.events = []    # heap of (time, counter, callback, args)
+        self.counter = itertools.count()
+        self.processed = 0
+
+    def clock(self):
+        """
+        @return     current virtual time in seconds, can be passed wherever a
+                    clock function like time.monotonic is expected
+        """
+        return self.now
+
+    def schedule(self, delay, callback, *args):
+        """Runs callback(*args) delay seconds from now.
+        """
+        self.schedule_at(self.now + delay, callback, *args)
+
+    def schedule_at(self, time, callback, *args):
+        """Runs callback(*args) at virtual time time, or now if it is past.
+        """
+        heapq.heappush(
+            self.events,
+            (max(time, self.now), next(self.counter), callback, args))
+
+    def run(self, until=None):
+        """Runs events in order.
+        @until      virtual time to stop at, the clock is advanced to it.
+                    None runs until no events are left.
+        @return     number of events run
+        """
+        count = 0
+        while self.events:
+            time, _, callback, args = self.events[0]
+            if until is not None and time > until:
+                break
+            heapq.heappop(self.events)
+            self.now = time
+            callback(*args)
+            count += 1
+        if until is not None:
+            self.now = max(self.now, until)
+        self.processed += count
+        return count
+
+    def pending(self):
+        """
+        @return     number of scheduled events
+        """
+        return len(self.events)
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+FLOOD_WINDOW = 1024             # sequence numbers remembered per source
+FLOOD_CACHE_SOURCES = 65536     # sources tracked before the idlest is evicted
+FLOOD_CACHE_TTL = 600           # seconds an idle source is tracked
+
+
+class FloodCache(object):
+    """Bounded seen-set of (src, seq) for FLOOD packets.
+    Every source gets a sliding window over its most recent sequence numbers,
+    kept as a bitmap relative to the highest sequence number seen (like IPsec
+    anti-replay). Packets inside the window are accepted once, in any order;
+    packets older than the window are rejected. Lookups are O(1) and memory is
+    FLOOD_WINDOW bits per source, independent of the packet rate.
+    Sources are evicted when idle for longer than ttl or, least recently seen
+    first, when more than max_sources are tracked. An evicted source's highest
+    sequence number is kept as its floor, so its old packets cannot be
+    replayed once its window is gone.
+    """
+    def __init__(self, window=FLOOD_WINDOW, max_sources=FLOOD_CACHE_SOURCES,
+                 ttl=FLOOD_CACHE_TTL, clock=time.monotonic):
+        """
+        @window         number of sequence numbers tracked per source
+        @max_sources    maximum number of tracked sources
+        @ttl            seconds before an idle source is forgotten
+        @clock          function returning the current time in seconds
+        """
+        self.window = window
+        self.mask = (1 << window) - 1
+        self.max_sources = max_sources
+        self.ttl = ttl
+        self.clock = clock
+        self.sources = OrderedDict()    # src: [highest seq, bitmap, last seen]
+        self.floors = {}                # src: highest seq when it was evicted
+        self.lock = threading.Lock()
+        # Counters
+        self.accepted = 0
+        self.duplicates = 0
+        self.too_old = 0
+        self.evicted = 0
+
+    def check(self, src, seq):
+        """Cheap check before a packet is verified. Rejected packets are
+        counted, but accepted ones are not recorded until add is called.
+        @return     True if seq from src has not been seen and is inside the
+                    window
+        """
+        with self.lock:
+            return self._count(self._status(src, self.sources.get(src), seq))
+
+    def add(self, src, seq):
+        """Records seq from src as seen.
+        @return     False if it is a duplicate or older than the window
+        """
+        with self.lock:
+            now = self.clock()
+            self._expire(now)
+            entry = self.sources.get(src)
+            if not self._count(self._status(src, entry, seq)):
+                return False
+
+            if entry is None:
+                entry = self.sources[src] = [seq, 1, now]
+            elif seq - entry[0] >= self.window:
+                # Nothing seen is left in the window, and shifting would
+                # allocate a bitmap as wide as the jump
+                entry[1] = 1
+                entry[0] = seq
+            elif seq > entry[0]:
+                entry[1] = ((entry[1] << (seq - entry[0])) | 1) & self.mask
+                entry[0] = seq
+            else:
+                entry[1] |= 1 << (entry[0] - seq)
+            entry[2] = now
+            self.sources.move_to_end(src)
+            while len(self.sources) > self.max_sources:
+                self._evict(*self.sources.popitem(last=False))
+            self.accepted += 1
+            return True
+
+    def forget(self, src):
+        """Drops all state for src.
+        """
+        with self.lock:
+            self.sources.pop(src, None)
+            self.floors.pop(src, None)
+
+    def _status(self, src, entry, seq):
+        """
+        @return     None if seq is new, 'duplicate' or 'too_old' otherwise
+        """
+        floor = self.floors.get(src)
+        if floor is not None and seq <= floor:
+            return 'too_old'
+        if entry is None or seq > entry[0]:
+            return None
+        offset = entry[0] - seq
+        if offset >= self.window:
+            return 'too_old'
+        if entry[1] >> offset & 1:
+            return 'duplicate'
+        return None
+
+    def _count(self, status):
+        """Counts a rejected status.
+        @return     True if status means the sequence number is new
+        """
+        if status == 'duplicate':
+            self.duplicates += 1
+        elif status == 'too_old':
+            self.too_old += 1
+        return status is None
+
+    def _expire(self, now):
+        """Evicts sources idle for longer than the ttl. Sources are ordered by
+        last packet, so only the front of the OrderedDict is looked at.
+        """
+        while self.sources:
+            src, entry = next(iter(self.sources.items()))
+            if now - entry[2] < self.ttl:
+                return
+            del self.sources[src]
+            self._evict(src, entry)
+
+    def _evict(self, src, entry):
+        """Keeps the highest sequence number of an evicted source as its
+        floor.
+        """
+        self.floors[src] = max(entry[0], self.floors.get(src, entry[0]))
+        self.evicted += 1
+
+    def stats(self):
+        """
+        @return     dict of the cache's size and counters
+        """
+        return {
+            'sources': len(self.sources),
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'too_old': self.too_old,
+            'evicted': self.evicted,
+        }
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from sim.signatures import SignatureScheme, get_scheme
+
+
+KEY_TTL = 300           # seconds a fetched key is trusted
+KEY_CACHE_SIZE = 4096   # keys kept before least recently used are evicted
+PREFETCH_WORKERS = 8
+
+
+def latest_key_asset(assets, ip):
+    """
+    @assets     BigchainDB assets, as returned by assets.get
+    @ip         ip address to find the key asset of
+    @return     data of the most recently registered key asset of ip, by its
+                registered_at timestamp (0 for assets without one), None if
+                there is none
+    """
+    latest = None
+    for asset in assets:
+        data = asset['data']
+        if data.get('ip_address') == ip and (
+                latest is None or data.get('registered_at', 0)
+                > latest.get('registered_at', 0)):
+            latest = data
+    return latest
+
+
+class PendingLookup(object):
+    """A BigchainDB lookup in flight. Concurrent misses for the same ip wait
+    on it instead of sending their own request.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.key = None
+        self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error:
+            raise self.error
+        return self.key
+
+
+class KeyDirectory(object):
+    """Cache of packet public keys in front of BigchainDB.
+    Keys are stored as parsed key objects of the scheme recorded in their
+    BigchainDB asset (RSA_PSS for assets without one), expire after a TTL and
+    are evicted least recently used first. Only one BigchainDB request is ever
+    in flight per ip.
+    """
+    def __init__(self, bdb, ttl=KEY_TTL, maxsize=KEY_CACHE_SIZE,
+                 clock=time.monotonic):
+        """
+        @bdb        BigchainDB driver, or anything with an assets.get(search=)
+        @ttl        seconds before a cached key is fetched again
+        @maxsize    maximum number of cached keys
+        @clock      function returning the current time in seconds
+        """
+        self.bdb = bdb
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.cache = OrderedDict()  # ip: (expiry, public_key)
+        self.pending = {}           # ip: PendingLookup
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def cached(self, ip):
+        """
+        @return     cached key for ip, or None if it is missing or expired
+        """
+        with self.lock:
+            entry = self.cache.get(ip)
+            if entry is None or entry[0] <= self.clock():
+                return None
+            self.cache.move_to_end(ip)
+            return entry[1]
+
+    def get(self, ip):
+        """Returns the public key of ip, querying BigchainDB on a miss.
+        Raises KeyError if BigchainDB has no key for ip.
+        """
+        with self.lock:
+            entry = self.cache.get(ip)
+            if entry is not None and entry[0] > self.clock():
+                self.cache.move_to_end(ip)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            lookup = self.pending.get(ip)
+            owner = lookup is None
+            if owner:
+                lookup = self.pending[ip] = PendingLookup()
+
+        if owner:
+            try:
+                lookup.key = self.fetch(ip)
+                self.put(ip, lookup.key)
+            except Exception as e:
+                lookup.error = e
+            finally:
+                with self.lock:
+                    del self.pending[ip]
+                lookup.done.set()
+        return lookup.result()
+
+    def put(self, ip, public_key):
+        """Caches public_key for ip, evicting the least recently used key if
+        the cache is full.
+        """
+        with self.lock:
+            self.cache[ip] = (self.clock() + self.ttl, public_key)
+            self.cache.move_to_end(ip)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+    def fetch(self, ip):
+        """Queries BigchainDB for the latest key asset of ip, so a router
+        that registered a new key is not verified with its old one.
+        """
+        self.fetches += 1
+        data = latest_key_asset(self.bdb.assets.get(search=ip), ip)
+        if data is None:
+            raise KeyError('No public key for {}'.format(ip))
+        scheme = SignatureScheme[data.get('signature_scheme', 'RSA_PSS')]
+        return get_scheme(scheme).import_public_key(data['public_key'])
+
+    def prefetch(self, ips):
+        """Fetches the keys of all ips that are not cached in the background.
+        @ips        iterable of ip addresses
+        @return     list of futures, one per fetched ip
+        """
+        return [
+            self.executor.submit(self.get, ip)
+            for ip in set(ips) if self.cached(ip) is None
+        ]
+
+    def stats(self):
+        """
+        @return     dict of the cache's size and counters
+        """
+        return {
+            'size': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'fetches': self.fetches,
+        }
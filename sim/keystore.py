@@ -0,0 +1,51 @@
+import os
+from os.path import join as path_join
+from sim.log import get_logger
+
+
+KEY_DIRECTORY = "build/keys"
+
+log = get_logger('sim.keystore')
+
+
+def key_path(directory, ip_address, scheme):
+    """
+    @return     path of the packet key of ip_address for scheme
+    """
+    return path_join(directory, '{}.{}.key'.format(
+        ip_address, scheme.scheme.name.lower()))
+
+def load_key(directory, ip_address, scheme):
+    """
+    @scheme     implementation of a SignatureScheme, see get_scheme
+    @return     stored private key, or None if there is none
+    """
+    try:
+        with open(key_path(directory, ip_address, scheme)) as f:
+            return scheme.import_private_key(f.read())
+    except FileNotFoundError:
+        return None
+
+def save_key(directory, ip_address, scheme, private_key):
+    """Stores private_key, readable by its owner only. The key is written to
+    a temporary file first, so a crash never leaves a partial key behind.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = key_path(directory, ip_address, scheme)
+    tmp_path = path + '.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(scheme.export_private_key(private_key))
+    os.replace(tmp_path, path)
+
+def load_or_generate(directory, ip_address, scheme):
+    """Returns the stored packet key of ip_address, generating and storing
+    one on first use, so restarted routers keep their key.
+    """
+    private_key = load_key(directory, ip_address, scheme)
+    if private_key is None:
+        private_key = scheme.generate()
+        save_key(directory, ip_address, scheme, private_key)
+        log.info('generated packet key', address=ip_address,
+                 path=key_path(directory, ip_address, scheme))
+    return private_key
@@ -0,0 +1,77 @@
+import logging
+import sys
+
+
+LOG_LEVEL = 'warning'
+LEVELS = ['debug', 'info', 'warning', 'error']
+# Keyword arguments of logging calls that are not fields
+LOGGING_KWARGS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+# Nothing is logged unless a program calls configure
+logging.getLogger('sim').addHandler(logging.NullHandler())
+
+
+def quote(value):
+    """Formats a field value, quoting it if it contains spaces or quotes.
+    """
+    value = str(value)
+    if not value or ' ' in value or '"' in value or '=' in value:
+        return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as a single line of key=value fields:
+        ts=1546300800.123 level=info logger=sim.router msg="..." src=10.0.0.1
+    """
+    def format(self, record):
+        fields = [
+            'ts={:.3f}'.format(record.created),
+            'level=' + record.levelname.lower(),
+            'logger=' + record.name,
+            'msg=' + quote(record.getMessage()),
+        ]
+        for key, value in getattr(record, 'fields', {}).items():
+            fields.append('{}={}'.format(key, quote(value)))
+        if record.exc_info:
+            fields.append('exc=' + quote(
+                self.formatException(record.exc_info).replace('\n', ' | ')))
+        return ' '.join(fields)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger taking fields as keyword arguments:
+        log.info('packet received', src=packet.src, type=packet.type.name)
+    Fields are only formatted if the level is enabled, but their values are
+    evaluated by the caller, so hot paths keep them cheap.
+    """
+    def __init__(self, logger):
+        super().__init__(logger, {})
+
+    def process(self, msg, kwargs):
+        fields = {k: v for k, v in kwargs.items() if k not in LOGGING_KWARGS}
+        kwargs = {k: v for k, v in kwargs.items() if k in LOGGING_KWARGS}
+        kwargs['extra'] = dict(kwargs.get('extra') or {}, fields=fields)
+        return msg, kwargs
+
+
+def get_logger(name):
+    """
+    @name       dotted name of the logger, below "sim"
+    @return     StructuredLogger for name
+    """
+    return StructuredLogger(logging.getLogger(name))
+
+def configure(level=LOG_LEVEL, stream=None):
+    """Writes everything logged by sim at level or above to stream,
+    stderr by default. Replaces handlers of an earlier call.
+    @level      one of LEVELS
+    """
+    root = logging.getLogger('sim')
+    for handler in list(root.handlers):
+        if not isinstance(handler, logging.NullHandler):
+            root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(StructuredFormatter())
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper()))
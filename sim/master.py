@@ -1,57 +1,322 @@
+import argparse
+import os
+import selectors
 import socket
+import threading
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from os.path import join as path_join
 from time import sleep
 from sim.base import (
     BBBPacket, BBBPacketType,
     ROUTER_PORT
 )
+from sim.codec import WireFormat, encode_packet
 
 
 TOPO_DIRECTORY = "sim/topologies"
 TOPO_UPDATE_PERIOD = 30
+PUSH_WORKERS = 64           # configs pushed concurrently
+CONNECT_TIMEOUT = 5         # seconds to connect to and send to a router
+PUSH_DEADLINE = 20          # seconds a push cycle may take at most
+FULL_PUSH_INTERVAL = 10     # push cycles between resending every config
+RELOAD_CHECK_PERIOD = 1     # seconds between checks of the topology file
 
 class Master(object):
     """Master Node.
     Responsible for parsing topology information from a JSON file and sending
     corresponding packets to configure routers.
+    Configs are pushed concurrently over a pool of connections that are kept
+    open between pushes. Only routers whose config changed since it was last
+    delivered are sent one, except for every full_push_interval-th push.
+    The list of all routers is only sent to routers that do not have its
+    latest version yet.
+    The topology file is reloaded and pushed as soon as it changes.
     """
-    def __init__(self, topo_path="simple.json"):
+    def __init__(self, topo_path="simple.json",
+                 update_period=TOPO_UPDATE_PERIOD, workers=PUSH_WORKERS,
+                 timeout=CONNECT_TIMEOUT, deadline=PUSH_DEADLINE,
+                 full_push_interval=FULL_PUSH_INTERVAL,
+                 wire_format=WireFormat.BINARY, test=False):
         """Constructor
-        @topo_path      name of the topology file to parse
+        @topo_path          name of the topology file to parse, or its path
+        @update_period      seconds between pushes of the topology
+        @workers            number of configs pushed concurrently
+        @timeout            seconds to connect to and send to one router
+        @deadline           seconds after which a push stops waiting for
+                            routers, they are retried on the next push
+        @full_push_interval pushes between resending every config
+        @wire_format        WireFormat configs are sent in. Configs of large
+                            topologies do not fit into a JSON packet
         """
-        self.sockets = {}
-        seq_num = 0
+        self.topo_path = topo_path
+        if not os.path.exists(topo_path):
+            self.topo_path = path_join(TOPO_DIRECTORY, topo_path)
+        self.update_period = update_period
+        self.timeout = timeout
+        self.deadline = deadline
+        self.full_push_interval = full_push_interval
+        self.wire_format = wire_format
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.sockets = {}       # router_ip: socket_instance
+        self.pushed = {}        # router_ip: config it last received
+        self.routers = []       # ips of all routers in the topology
+        self.routers_version = 0    # incremented whenever routers changes
+        self.has_routers = {}   # router_ip: routers_version it last received
+        self.running = {}       # router_ip: Future of its push still running
+        self.pool_lock = threading.Lock()
+        self.seq_lock = threading.Lock()
+        self.seq_num = 0
+        self.push_count = 0
+        self.topology = {}
+        self.topo_mtime = None
+        self.last_push = {}     # stats of the last push
 
         # Load the network topology from the json file
-        self.topology = {}
-        with open(path_join(TOPO_DIRECTORY, topo_path), 'r') as topo_file:
-            self.topology = json.loads(topo_file.read())
+        self.reload()
 
+        # For unit tests
+        if not test:
+            self.serve()
+
+    def serve(self):
+        """Pushes the topology every update_period seconds, and whenever the
+        topology file changes. Never returns.
+        """
+        next_push = 0
         while True:
-            for host, config in self.topology.items():
-                # get corresponding socket for host
-                print("attempting to connect to: {0}".format(host))
-                endpoint = (host, ROUTER_PORT)
-                try:
-                    host_socket = self.sockets[endpoint]
-                except KeyError:
-                    # create and store a new socket if necessary
-                    host_socket = socket.socket()
-                    self.sockets[endpoint] = host_socket
-                    host_socket.connect(endpoint)
-
-                # create configuration packet and send it to the host
-                config_packet = BBBPacket(
-                    src=host_socket.getsockname()[0],
-                    dst=host,
-                    type=BBBPacketType.MASTERCONFIG,
-                    payload=json.dumps(config),
-                    seq=seq_num,
-                )
-                host_socket.sendall(config_packet.to_bytes())
-                seq_num += 1
-            sleep(TOPO_UPDATE_PERIOD)
+            if self.reload() or time.monotonic() >= next_push:
+                self.push()
+                print(self.last_push)
+                next_push = time.monotonic() + self.update_period
+            sleep(RELOAD_CHECK_PERIOD)
+
+    def reload(self):
+        """Reloads the topology file if it was modified since it was read.
+        @return     True if the topology was (re)loaded
+        """
+        try:
+            mtime = os.stat(self.topo_path).st_mtime_ns
+            if mtime == self.topo_mtime:
+                return False
+            with open(self.topo_path, 'r') as topo_file:
+                topology = json.loads(topo_file.read())
+        except (OSError, ValueError) as e:
+            # Keep the current topology while the file is being rewritten
+            print(e)
+            return False
+        self.topo_mtime = mtime
+        self.topology = topology
+        return True
+
+    def configs(self):
+        """
+        @return     dict of router_ip: JSON config for every router, without
+                    the list of all routers, see payload
+        """
+        return {
+            host: json.dumps(
+                {k: v for k, v in config.items() if k != 'routers'},
+                sort_keys=True,
+            )
+            for host, config in self.topology.items()
+        }
+
+    def update_routers(self):
+        """Bumps routers_version if routers were added to or removed from
+        the topology.
+        """
+        routers = sorted(self.topology)
+        if routers != self.routers:
+            self.routers = routers
+            self.routers_version += 1
+
+    def payload(self, host, config):
+        """
+        @config     JSON config of host, see configs
+        @return     config payload for host. Routers that do not have the
+                    latest list of all router ips also get it, so they can
+                    prefetch their keys. It makes up most of a payload in
+                    large topologies, so it is not sent every time.
+        """
+        if self.has_routers.get(host) == self.routers_version:
+            return config
+        return json.dumps(dict(json.loads(config), routers=self.routers),
+                          sort_keys=True)
+
+    def forget(self, host):
+        """Forgets what host received, it is sent its config and the list of
+        all routers on the next push.
+        """
+        self.pushed.pop(host, None)
+        self.has_routers.pop(host, None)
+
+    def push(self):
+        """Sends every router whose config changed its config, concurrently.
+        Routers that cannot be reached in time are retried on the next push,
+        pushes that did not start by then are cancelled.
+        @return     dict of stats of this push
+        """
+        start = time.monotonic()
+        self.prune_closed()
+        self.update_routers()
+        configs = self.configs()
+        full = self.push_count % self.full_push_interval == 0
+        self.push_count += 1
+        # A push still running past an earlier deadline owns its host's
+        # connection, the host is retried once it finished
+        self.running = {
+            host: future for host, future in self.running.items()
+            if not future.done()
+        }
+        changed = {
+            host: payload for host, payload in configs.items()
+            if (full or self.pushed.get(host) != payload
+                or self.has_routers.get(host) != self.routers_version)
+            and host not in self.running
+        }
+        # Routers removed from the topology are no longer configured
+        for host in set(self.sockets) - set(configs):
+            self.disconnect(host)
+        for host in (set(self.pushed) | set(self.has_routers)) - set(configs):
+            self.forget(host)
+
+        futures = {}
+        sent = 0
+        for host, config in changed.items():
+            payload = self.payload(host, config)
+            sent += len(payload)
+            routers_version = None if payload is config \
+                else self.routers_version
+            futures[self.executor.submit(
+                self.push_config, host, payload, config,
+                routers_version)] = host
+        done, not_done = wait(futures, timeout=self.deadline)
+        latencies = sorted(f.result() for f in done if f.result() is not None)
+        for future in not_done:
+            host = futures[future]
+            self.forget(host)
+            # Still connecting or sending, it will time out on its own
+            if not future.cancel():
+                self.running[host] = future
+
+        self.last_push = {
+            'routers': len(configs),
+            'changed': len(changed),
+            'pushed': len(latencies),
+            'failed': len(changed) - len(latencies),
+            'running': len(self.running),
+            'bytes': sent,
+            'seconds': time.monotonic() - start,
+            'max_latency': latencies[-1] if latencies else 0,
+        }
+        return self.last_push
+
+    def push_config(self, host, payload, config=None, routers_version=None):
+        """Sends payload to host, over a pooled connection if there is one.
+        @config             config recorded as delivered, payload if None
+        @routers_version    routers_version of the list of all routers
+                            payload carries, None if it carries none
+        @return             seconds it took, None if it failed
+        """
+        start = time.monotonic()
+        try:
+            host_socket = self.connect(host)
+            with self.seq_lock:
+                seq_num = self.seq_num
+                self.seq_num += 1
+            # create configuration packet and send it to the host.
+            config_packet = BBBPacket(
+                src=host_socket.getsockname()[0],
+                dst=host,
+                type=BBBPacketType.MASTERCONFIG,
+                payload=payload,
+                seq=seq_num,
+            )
+            host_socket.sendall(encode_packet(config_packet, self.wire_format))
+        except (OSError, ValueError) as e:
+            print("could not push config to {0}: {1}".format(host, e))
+            self.disconnect(host)
+            self.forget(host)
+            return None
+        self.pushed[host] = payload if config is None else config
+        if routers_version is not None:
+            self.has_routers[host] = routers_version
+        return time.monotonic() - start
+
+    def connect(self, host):
+        """Returns the pooled connection to host, connecting if necessary.
+        """
+        with self.pool_lock:
+            host_socket = self.sockets.get(host)
+        if host_socket is None:
+            print("attempting to connect to: {0}".format(host))
+            host_socket = socket.create_connection(
+                (host, ROUTER_PORT), timeout=self.timeout)
+            with self.pool_lock:
+                self.sockets[host] = host_socket
+        return host_socket
+
+    def disconnect(self, host):
+        """Closes and forgets the pooled connection to host.
+        """
+        with self.pool_lock:
+            host_socket = self.sockets.pop(host, None)
+        if host_socket:
+            host_socket.close()
+
+    def prune_closed(self):
+        """Forgets pooled connections closed by their router, e.g. because it
+        restarted. Its config is resent on the next push.
+        """
+        with self.pool_lock:
+            pool = dict(self.sockets)
+        selector = selectors.DefaultSelector()
+        closed = []
+        for host, host_socket in pool.items():
+            try:
+                selector.register(host_socket, selectors.EVENT_READ, host)
+            except (OSError, ValueError):
+                closed.append(host)
+        # Routers never send to the master, so readable means closed
+        for key, _ in selector.select(timeout=0):
+            try:
+                if key.fileobj.recv(1, socket.MSG_PEEK):
+                    continue
+            except OSError:
+                pass
+            closed.append(key.data)
+        selector.close()
+        for host in closed:
+            self.disconnect(host)
+            self.forget(host)
+
+    def stop(self):
+        """Closes all pooled connections.
+        """
+        for host in list(self.sockets):
+            self.disconnect(host)
+        self.executor.shutdown(wait=False)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('topology', nargs='?', default='basic-byzantine.json',
+                        help='topology file, or its name in {}'.format(
+                            TOPO_DIRECTORY))
+    parser.add_argument('--period', type=float, default=TOPO_UPDATE_PERIOD,
+                        help='seconds between pushes')
+    parser.add_argument('--workers', type=int, default=PUSH_WORKERS,
+                        help='configs pushed concurrently')
+    parser.add_argument('--wire-format', default='binary',
+                        choices=[f.name.lower() for f in WireFormat])
+    args = parser.parse_args()
+    Master(
+        topo_path=args.topology,
+        update_period=args.period,
+        workers=args.workers,
+        wire_format=WireFormat[args.wire_format.upper()],
+    )
 
 if __name__ == "__main__":
-    Master(topo_path = 'basic-byzantine.json')
+    main()
@@ -0,0 +1,262 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+
+METRICS_PORT = 42426
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1,
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(names, values, extra=()):
+    """
+    @return     Prometheus label set, e.g. {type="FLOOD",direction="in"}
+    """
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    ) + '}'
+
+
+class Counter(object):
+    """Monotonic counter, one per combination of label values.
+    Increments are not locked, like the other counters in sim.
+    """
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = defaultdict(int)  # label values: count
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] += amount
+
+    def get(self, *label_values):
+        return self.values.get(label_values, 0)
+
+    def samples(self):
+        for label_values, value in sorted(self.values.items()):
+            yield self.name + format_labels(self.labels, label_values), value
+
+
+class Histogram(object):
+    """Distribution of observed values in cumulative buckets.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)     # last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """Context manager observing the seconds its block takes.
+        """
+        return Timer(self)
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield self.name + '_bucket' + format_labels(
+                (), (), [('le', bound)]), cumulative
+        yield self.name + '_sum', self.sum
+        yield self.name + '_count', self.count
+
+
+class Timer(object):
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Gauge(object):
+    """Value read from a function when the metrics are collected, so nothing
+    is done on the hot path. function returns a number, or a dict of label
+    values tuple: number.
+    """
+    def __init__(self, name, help, function, labels=(), type='gauge'):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.labels = labels
+        self.type = type
+
+    def samples(self):
+        value = self.function()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for label_values, v in sorted(value.items()):
+            yield self.name + format_labels(self.labels, label_values), v
+
+
+class Registry(object):
+    """Collection of metrics, rendered in the Prometheus text format.
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name, help, function, labels=(), type='gauge'):
+        return self.register(Gauge(name, help, function, labels, type))
+
+    def collect(self):
+        """
+        @return     dict of sample name (with labels): value
+        """
+        return {
+            name: value
+            for metric in self.metrics for name, value in metric.samples()
+        }
+
+    def render(self):
+        """
+        @return     str of all metrics in the Prometheus text format
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            for name, value in metric.samples():
+                lines.append('{} {}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+
+class RouterMetrics(Registry):
+    """Counters and histograms of a router's hot paths, and gauges of its
+    queues and caches.
+    """
+    def __init__(self, router):
+        """
+        @router     BasicRouter the gauges read from
+        """
+        super().__init__()
+        self.packets = self.counter(
+            'bbb_packets_total', 'Packets by type and direction',
+            ('type', 'direction'))
+        self.verify_results = self.counter(
+            'bbb_verify_total', 'Verified packets by result', ('result',))
+        self.sign_seconds = self.histogram(
+            'bbb_sign_seconds', 'Time taken to sign a packet')
+        self.verify_seconds = self.histogram(
+            'bbb_verify_seconds', 'Time taken to check a signature')
+        self.floods_forwarded = self.counter(
+            'bbb_floods_forwarded_total', 'FLOOD packets forwarded')
+        self.floods_delivered = self.counter(
+            'bbb_floods_delivered_total',
+            'FLOOD packets received for this router or its hosts')
+        self.data_forwarded = self.counter(
+            'bbb_data_forwarded_total', 'DATA packets sent by how they were '
+            'forwarded, along their route or flooded', ('via',))
+        self.data_delivered = self.counter(
+            'bbb_data_delivered_total',
+            'DATA packets received for this router or its hosts')
+        self.send_dropped = self.counter(
+            'bbb_send_dropped_total', 'Packets not sent to a neighbor by type '
+            'and reason', ('type', 'reason'))
+        self.admission_dropped = self.counter(
+            'bbb_admission_dropped_total', 'Received packets dropped before '
+            'verification by neighbor and reason', ('neighbor', 'reason'))
+
+        self.gauge('bbb_send_queue_depth', 'Packets queued for neighbors',
+                   lambda: sum(q.depth() for q in
+                               list(router.send_queues.values())))
+        self.gauge('bbb_send_queue_dropped', 'Packets dropped by send '
+                   'queues of connected neighbors',
+                   lambda: sum(q.dropped for q in
+                               list(router.send_queues.values())))
+        self.gauge('bbb_verify_queue_depth', 'Packets waiting for the '
+                   'verification pipeline',
+                   lambda: router.verification.incoming.qsize()
+                   if router.verification else 0)
+        self.gauge('bbb_flood_cache_total', 'FLOOD sequence numbers by '
+                   'flood cache result', lambda: {
+                       (k,): v for k, v in router.flood_cache.stats().items()
+                       if k != 'sources'
+                   }, labels=('result',), type='counter')
+        self.gauge('bbb_key_cache_total', 'Key directory lookups by result',
+                   lambda: {
+                       (k,): v for k, v in router.key_directory.stats().items()
+                       if k != 'size'
+                   } if router.key_directory else {},
+                   labels=('result',), type='counter')
+        self.gauge('bbb_routes', 'Routes in the routing table',
+                   lambda: len(router.routes))
+
+
+class MetricsHandler(StreamRequestHandler):
+    """Answers GET /metrics with the server's registry. Implements just
+    enough HTTP/1.0 for scrapers, http.server takes longer to import than
+    the rest of sim.
+    """
+    def handle(self):
+        request = self.rfile.readline(65537).decode('latin-1').split()
+        # Skip the headers
+        while self.rfile.readline(65537).strip():
+            pass
+        if len(request) < 2 or request[0] != 'GET':
+            self.respond('405 Method Not Allowed', b'')
+        elif request[1].split('?')[0] != '/metrics':
+            self.respond('404 Not Found', b'')
+        else:
+            self.respond('200 OK', self.server.registry.render().encode())
+
+    def respond(self, status, body):
+        self.wfile.write(
+            'HTTP/1.0 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n\r\n'
+            .format(status, CONTENT_TYPE, len(body)).encode() + body)
+
+
+class MetricsServer(object):
+    """Serves a Registry at http://<address>:<port>/metrics on a daemon
+    thread.
+    """
+    def __init__(self, registry, address, port=METRICS_PORT):
+        self.server = ThreadingTCPServer((address, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.registry = registry
+
+    def start(self):
+        """Dispatches the serving thread.
+        """
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,117 @@
+import threading
+import time
+
+
+FULL_SYNC_INTERVAL = 10     # route update cycles between full table syncs
+_MISSING = object()         # next hop of destinations without a route
+
+
+class RouteTable(dict):
+    """Routing table, dst_ip: next_hop_ip, that remembers which destinations
+    changed since the changes were last collected.
+    Only item assignment, del and pop are tracked, so the table must not be
+    modified through update, setdefault or clear.
+    The time of the last change is kept in last_change, which is what
+    convergence is measured with.
+    """
+    def __init__(self, *args, clock=time.monotonic, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = clock
+        self.changes_lock = threading.Lock()
+        self.changed = set(self)    # dst_ip changed since pop_changes
+        self.last_change = None
+
+    def __setitem__(self, dst, next_hop):
+        if dict.get(self, dst, self) != next_hop:
+            super().__setitem__(dst, next_hop)
+            self.record_change(dst)
+
+    def __delitem__(self, dst):
+        super().__delitem__(dst)
+        self.record_change(dst)
+
+    def pop(self, dst, *default):
+        if dst in self:
+            self.record_change(dst)
+        return super().pop(dst, *default)
+
+    def record_change(self, dst):
+        with self.changes_lock:
+            self.changed.add(dst)
+            self.last_change = self.clock()
+
+    def has_changes(self):
+        """
+        @return     True if a destination changed since pop_changes
+        """
+        return bool(self.changed)
+
+    def pop_changes(self):
+        """
+        @return     set of destinations that were added, removed or got a
+                    new next hop since the last call
+        """
+        with self.changes_lock:
+            changed, self.changed = self.changed, set()
+        return changed
+
+
+def broadcast_update(routes, neighbors, changed=None):
+    """Builds a ROUTEUPDATE payload that is signed once and sent to every
+    neighbor. Split horizon is left to the receivers: via lists the
+    destinations reached through each neighbor, which that neighbor must not
+    learn from us, see neighbor_update. They are listed by their index in
+    routes, or in add, so no destination is sent twice.
+    @routes     dict of dst_ip: next_hop_ip
+    @neighbors  ip addresses of the neighbors the update is sent to
+    @changed    destinations changed since the last update, None for the
+                full table
+    @return     {"routes": [dst_ip], "via": {neighbor_ip: [index]}} for the
+                full table, {"add": [dst_ip], "withdraw": [dst_ip],
+                "via": {neighbor_ip: [index]}} for changed destinations
+    """
+    if changed is None:
+        items = list(routes.items())
+    else:
+        items = [(dst, routes.get(dst, _MISSING)) for dst in changed]
+    # Attached hosts are routed to None
+    reachable = sorted(
+        ((dst, next_hop) for dst, next_hop in items
+         if next_hop is not _MISSING),
+        key=lambda item: item[0],
+    )
+    neighbors = set(neighbors)
+    via = {}
+    for index, (dst, next_hop) in enumerate(reachable):
+        if next_hop in neighbors:
+            via.setdefault(next_hop, []).append(index)
+    dsts = [dst for dst, _ in reachable]
+    if changed is None:
+        return {'routes': dsts, 'via': via}
+    return {
+        'add': dsts,
+        'withdraw': sorted(set(changed).difference(dsts)),
+        'via': via,
+    }
+
+
+def neighbor_update(update, neighbor):
+    """Applies split horizon to an update built by broadcast_update.
+    @update     decoded ROUTEUPDATE payload
+    @neighbor   ip address of the neighbor that received it
+    @return     the full list of destinations neighbor may route through the
+                sender, or {"add": [dst_ip], "withdraw": [dst_ip]}. Updates
+                without via are returned unchanged.
+    """
+    if not isinstance(update, dict) or 'via' not in update:
+        return update
+    dsts = update['routes'] if 'routes' in update else update['add']
+    excluded = set(update['via'].get(neighbor, []))
+    allowed = [d for i, d in enumerate(dsts) if i not in excluded]
+    if 'routes' in update:
+        return allowed
+    # Destinations that now go through neighbor are withdrawn from it
+    return {
+        'add': allowed,
+        'withdraw': update['withdraw'] + [dsts[i] for i in sorted(excluded)],
+    }
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import deque
+from enum import Enum
+from sim.log import get_logger
+
+
+SEND_QUEUE_LEN = 1024
+DRR_QUANTUM = 1024      # bytes a source may send per round of a FairSendQueue
+
+log = get_logger('sim.send_queue')
+
+class BackpressurePolicy(Enum):
+    """
+    Enum for what a full SendQueue does with a new packet
+    BLOCK:          Sender waits until the writer makes room
+    DROP_OLDEST:    Oldest queued packet is dropped to make room
+    DROP_NEWEST:    New packet is dropped
+    """
+    BLOCK = 0
+    DROP_OLDEST = 1
+    DROP_NEWEST = 2
+
+
+class SendQueue(object):
+    """Bounded outbound queue for a single neighbor connection.
+    A dedicated writer thread drains the queue into the socket, so a slow
+    neighbor only ever blocks its own writer instead of every sender.
+    """
+    def __init__(self, sock, maxlen=SEND_QUEUE_LEN,
+                 policy=BackpressurePolicy.BLOCK, tracer=None):
+        """
+        @sock           socket_instance to write to
+        @maxlen         maximum number of queued packets
+        @policy         BackpressurePolicy applied when the queue is full
+        @tracer         Tracer that a sample of the writes is timed for, as
+                        the sendall stage
+        """
+        self.socket = sock
+        self.maxlen = maxlen
+        self.policy = policy
+        self.tracer = tracer
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        # Counters
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def start(self):
+        """Dispatches the writer thread.
+        """
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def depth(self):
+        return len(self.queue)
+
+    def is_full(self, source):
+        """
+        @return     True if data from source has to wait or be dropped
+        """
+        return len(self.queue) >= self.maxlen
+
+    def append(self, data, source):
+        self.queue.append(data)
+
+    def drop_oldest(self, source):
+        """Drops the oldest data queued that a full source may replace.
+        """
+        self.queue.popleft()
+
+    def pop(self):
+        """
+        @return     the next data to send
+        """
+        return self.queue.popleft()
+
+    def clear(self):
+        self.queue.clear()
+
+    def put(self, data, source=None):
+        """Queues data for sending, applying the backpressure policy.
+        @data       bytes to send
+        @source     ip address of the packet's source
+        @return     False if data was dropped
+        """
+        with self.cond:
+            if self.closed:
+                self.dropped += 1
+                return False
+            if self.is_full(source):
+                if self.policy == BackpressurePolicy.DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                elif self.policy == BackpressurePolicy.DROP_OLDEST:
+                    self.drop_oldest(source)
+                    self.dropped += 1
+                else:
+                    self.cond.wait_for(
+                        lambda: not self.is_full(source) or self.closed)
+                    if self.closed:
+                        self.dropped += 1
+                        return False
+            self.append(data, source)
+            self.max_depth = max(self.max_depth, self.depth())
+            self.cond.notify_all()
+            return True
+
+    def run(self):
+        """Writer thread. Sends queued data until the queue is closed.
+        """
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.depth() or self.closed)
+                if self.closed:
+                    return
+                data = self.pop()
+                self.cond.notify_all()
+            try:
+                if self.tracer and self.tracer.interval \
+                        and self.sent % self.tracer.interval == 0:
+                    start = time.perf_counter()
+                    self.socket.sendall(data)
+                    self.tracer.record('sendall', time.perf_counter() - start)
+                else:
+                    self.socket.sendall(data)
+                self.sent += 1
+            except Exception as e:
+                log.info('writer stopped', error=e)
+                self.close()
+                return
+
+    def close(self):
+        """Stops the writer and drops anything still queued.
+        """
+        with self.cond:
+            self.closed = True
+            self.dropped += self.depth()
+            self.clear()
+            self.cond.notify_all()
+
+    def stats(self):
+        """
+        @return     dict of the queue's depth and counters
+        """
+        return {
+            'depth': self.depth(),
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped,
+        }
+
+
+class FairSendQueue(SendQueue):
+    """SendQueue with a buffer reserved for every source, as in NPBR.
+    Every source may queue up to maxlen packets and the backpressure policy
+    applies per source, so a source flooding the neighbor only fills, and
+    drops from, its own buffer. Sources are authenticated by the packets'
+    signatures before they are forwarded, so they cannot be spoofed to use
+    the buffers of others.
+    The writer takes turns among the sources with queued packets using
+    deficit round-robin: every turn a source may send quantum more bytes,
+    so every source gets an equal share of the link.
+    """
+    def __init__(self, sock, maxlen=SEND_QUEUE_LEN,
+                 policy=BackpressurePolicy.BLOCK, tracer=None,
+                 quantum=DRR_QUANTUM):
+        """
+        @maxlen         maximum number of queued packets per source
+        @quantum        bytes added to a source's deficit per turn
+        """
+        super().__init__(sock, maxlen=maxlen, policy=policy, tracer=tracer)
+        self.quantum = quantum
+        self.sources = {}       # source ip: deque of its queued data
+        self.deficits = {}      # source ip: bytes it may still send
+        self.active = deque()   # source ips with queued data, in turn order
+        self.turn = False       # True once active[0] got its quantum
+        self.queued = 0
+
+    def depth(self):
+        return self.queued
+
+    def is_full(self, source):
+        return len(self.sources.get(source, ())) >= self.maxlen
+
+    def append(self, data, source):
+        queue = self.sources.get(source)
+        if queue is None:
+            queue = self.sources[source] = deque()
+            self.deficits[source] = 0
+            self.active.append(source)
+        queue.append(data)
+        self.queued += 1
+
+    def drop_oldest(self, source):
+        self.sources[source].popleft()
+        self.queued -= 1
+
+    def pop(self):
+        while True:
+            source = self.active[0]
+            queue = self.sources[source]
+            if not self.turn:
+                self.deficits[source] += self.quantum
+                self.turn = True
+            if len(queue[0]) <= self.deficits[source]:
+                data = queue.popleft()
+                self.queued -= 1
+                if queue:
+                    self.deficits[source] -= len(data)
+                else:
+                    # Sources without queued packets keep no credit
+                    del self.sources[source], self.deficits[source]
+                    self.active.popleft()
+                    self.turn = False
+                return data
+            self.active.rotate(-1)
+            self.turn = False
+
+    def clear(self):
+        self.sources.clear()
+        self.deficits.clear()
+        self.active.clear()
+        self.turn = False
+        self.queued = 0
+
+    def stats(self):
+        """
+        @return     dict of the queue's depth, counters and number of
+                    sources with queued packets
+        """
+        stats = super().stats()
+        stats['sources'] = len(self.sources)
+        return stats
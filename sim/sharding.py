@@ -0,0 +1,269 @@
+"""Simulation of a topology sharded across worker processes.
+
+The routers of a topology are partitioned into one shard per worker. Every
+worker runs its shard as a simulator Network, frames for routers in other
+shards are passed between the workers over pipes by the ShardedNetwork.
+
+Shards are synchronized conservatively: all workers simulate the same window
+of virtual time, and a window is never longer than the lowest latency of a
+link between two shards. A frame sent in one window therefore always arrives
+in a later one, which is when it is handed to its shard.
+
+    python3 -m sim.sharding simple.json [--workers N] [--time SECONDS]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+
+from sim.master import TOPO_DIRECTORY
+from sim.signatures import SignatureScheme, get_scheme
+from sim.simulator import Network, load_topology
+
+
+def partition(topology, shards):
+    """Splits a topology into shards of about the same size. Routers are
+    taken in breadth first order, so neighbors mostly end up in the same
+    shard.
+    @topology   dict in the Master's JSON format
+    @shards     number of shards
+    @return     list of sets of router ips, one per shard
+    """
+    order = []
+    seen = set()
+    for root in sorted(topology):
+        if root in seen:
+            continue
+        seen.add(root)
+        queue = deque([root])
+        while queue:
+            ip = queue.popleft()
+            order.append(ip)
+            for neighbor in sorted(topology[ip]['neighbors']):
+                if neighbor in topology and neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    size = -(-len(order) // shards)
+    return [set(order[i:i + size]) for i in range(0, len(order), size)]
+
+
+def run_shard(conn, topology, local, options):
+    """Worker process. Runs the routers in local and answers the commands of
+    the ShardedNetwork on conn. Every command is answered with (frames for
+    other shards, time of the next scheduled event).
+    """
+    network = Network(topology, local=local, **options)
+    conn.send({
+        ip: (router.signature_scheme.scheme,
+             router.signature_scheme.export_public_key(router.public_key))
+        for ip, router in network.routers.items()
+    })
+    for ip, (scheme, exported) in conn.recv().items():
+        if ip not in network.routers:
+            network.key_directory.put(
+                ip, get_scheme(scheme).import_public_key(exported))
+    conn.send(network.lookahead())
+
+    while True:
+        command, *args = conn.recv()
+        if command == 'step':
+            until, frames = args
+            network.receive(frames)
+            network.run(until=until)
+        elif command == 'start_timers':
+            network.start_timers()
+        elif command == 'floods':
+            for at, src, dst, payload in args[0]:
+                network.scheduler.schedule_at(
+                    at, network.send_flood, src, dst, payload)
+        elif command == 'stats':
+            conn.send(network.stats())
+            continue
+        elif command == 'stop':
+            conn.close()
+            return
+        outbox, network.outbox = network.outbox, []
+        events = network.scheduler.events
+        conn.send((outbox, events[0][0] if events else float('inf')))
+
+
+class ShardedNetwork(object):
+    """Runs a topology on several worker processes, see run_shard.
+    The interface follows Network where it makes sense, routes converge by
+    running the routers' timers.
+    """
+    def __init__(self, topology, workers=None, seed=0, **options):
+        """
+        @topology   dict in the Master's JSON format
+        @workers    number of worker processes, defaults to the cpu count
+        @seed       seed of all randomness in the simulation
+        @options    passed on to every shard's Network, links between shards
+                    need a latency above 0
+        """
+        self.shards = partition(topology, workers or os.cpu_count())
+        self.owner = {}     # ip: index of its shard
+        for i, shard in enumerate(self.shards):
+            for ip in shard:
+                self.owner[ip] = i
+        self.rng = random.Random(seed)
+        self.now = 0
+        self.elapsed = 0
+        self.steps = 0
+        self.pending = [[] for _ in self.shards]    # frames for each shard
+        self.next_event = [0 for _ in self.shards]  # next event of each shard
+
+        self.conns = []
+        self.processes = []
+        for i, shard in enumerate(self.shards):
+            conn, worker_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_shard,
+                args=(worker_conn, topology, shard,
+                      dict(options, seed=seed * len(self.shards) + i)),
+                daemon=True,
+            )
+            process.start()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+        keys = {}
+        for conn in self.conns:
+            keys.update(conn.recv())
+        for conn in self.conns:
+            conn.send(keys)
+        self.lookahead = min(conn.recv() for conn in self.conns)
+        if self.lookahead <= 0:
+            self.close()
+            raise ValueError('Links between shards need a latency above 0')
+
+    def command(self, *command):
+        """Sends command to every shard and collects the answers.
+        """
+        for conn in self.conns:
+            conn.send(command)
+        self.collect()
+
+    def collect(self):
+        """Receives every shard's answer to the last command.
+        """
+        for i, conn in enumerate(self.conns):
+            outbox, self.next_event[i] = conn.recv()
+            for frame in outbox:
+                self.pending[self.owner[frame[2]]].append(frame)
+
+    def start_timers(self):
+        """Lets every router send route updates when its UpdateTimer says so.
+        """
+        self.command('start_timers')
+
+    def schedule_floods(self, count, start, end):
+        """Schedules count FLOOD packets between random pairs of routers at
+        random times between start and end.
+        """
+        ips = sorted(self.owner)
+        floods = [[] for _ in self.shards]
+        for i in range(count):
+            src, dst = self.rng.sample(ips, 2)
+            floods[self.owner[src]].append(
+                (self.rng.uniform(start, end), src, dst, 'hello-{}'.format(i)))
+        for conn, shard_floods in zip(self.conns, floods):
+            conn.send(('floods', shard_floods))
+        self.collect()
+
+    def run(self, until):
+        """Runs all shards until virtual time until.
+        @return     number of windows it took
+        """
+        start = time.perf_counter()
+        steps = 0
+        while True:
+            next_time = min(self.next_event + [
+                frame[0] for frames in self.pending for frame in frames])
+            if next_time > until:
+                break
+            # Nothing happens before next_time, skip straight to it
+            end = min(next_time + self.lookahead, until)
+            for i, conn in enumerate(self.conns):
+                conn.send(('step', end, self.pending[i]))
+                self.pending[i] = []
+            self.collect()
+            steps += 1
+        self.now = max(self.now, until)
+        self.steps += steps
+        self.elapsed += time.perf_counter() - start
+        return steps
+
+    def stats(self):
+        """
+        @return     dict of the counters of all shards together
+        """
+        for conn in self.conns:
+            conn.send(('stats',))
+        shards = [conn.recv() for conn in self.conns]
+        delivered = sum(s['delivered'] for s in shards)
+        total = {
+            key: sum(s[key] for s in shards)
+            for key in ['routers', 'links', 'events', 'frames', 'bytes',
+                        'delivered', 'rejected']
+        }
+        total.update({
+            'shards': len(self.shards),
+            'time': self.now,
+            'windows': self.steps,
+            'avg_hops': sum(s['avg_hops'] * s['delivered'] for s in shards)
+                / delivered if delivered else 0,
+            'max_hops': max(s['max_hops'] for s in shards),
+            'avg_latency':
+                sum(s['avg_latency'] * s['delivered'] for s in shards)
+                / delivered if delivered else 0,
+            'elapsed': self.elapsed,
+            'frames_per_sec': total['frames'] / self.elapsed
+                if self.elapsed else 0,
+        })
+        return total
+
+    def close(self):
+        """Stops the worker processes.
+        """
+        for conn in self.conns:
+            try:
+                conn.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('topology', help='topology file, or its name in {}'
+                        .format(TOPO_DIRECTORY))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--time', type=float, default=300,
+                        help='virtual seconds to simulate')
+    parser.add_argument('--floods', type=int, default=100,
+                        help='FLOOD packets between random router pairs')
+    parser.add_argument('--scheme', default='ed25519',
+                        choices=[s.name.lower() for s in SignatureScheme])
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='link latency in virtual seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    network = ShardedNetwork(load_topology(args.topology),
+                             workers=args.workers, seed=args.seed,
+                             scheme=SignatureScheme[args.scheme.upper()],
+                             latency=args.latency, latency_jitter=0.5)
+    try:
+        network.start_timers()
+        network.schedule_floods(args.floods, 0, args.time)
+        network.run(args.time)
+        for key, value in network.stats().items():
+            print('{:<16}{}'.format(key, value))
+    finally:
+        network.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import binascii
+import hashlib
+import hmac
+import os
+from enum import Enum
+
+# PyCryptodome and PyNaCl are imported by the methods that use them, so
+# importing sim does not load a crypto library that is not used.
+
+
+class SignatureScheme(Enum):
+    """
+    Enum for the schemes packets can be signed with
+    RSA_PSS:    RSA-2048 with PSS padding over a SHA256 digest
+    ED25519:    Ed25519, much faster key generation, signing and verification
+    HMAC:       HMAC-SHA256, for the simulator only. The public key is the
+                secret key, so anyone who knows it can sign
+    """
+    RSA_PSS = 0
+    ED25519 = 1
+    HMAC = 2
+
+
+class RSAPSS(object):
+    """RSA-2048 PSS signatures, the original BBB scheme.
+    """
+    scheme = SignatureScheme.RSA_PSS
+    signature_len = 256     # bytes
+    simulator_only = False
+
+    def generate(self):
+        from Crypto.PublicKey import RSA
+        return RSA.generate(2048)
+
+    def public_key(self, private_key):
+        return private_key.publickey()
+
+    def sign(self, private_key, data):
+        from Crypto.Hash import SHA256
+        from Crypto.Signature import pss
+        return pss.new(private_key).sign(SHA256.new(data))
+
+    def verify(self, public_key, data, signature):
+        """Raises ValueError if signature is not valid for data.
+        """
+        from Crypto.Hash import SHA256
+        from Crypto.Signature import pss
+        pss.new(public_key).verify(SHA256.new(data), signature)
+
+    def export_public_key(self, public_key):
+        """
+        @return     str representation of public_key (PEM)
+        """
+        return public_key.export_key().decode()
+
+    def import_public_key(self, exported):
+        from Crypto.PublicKey import RSA
+        return RSA.import_key(exported.encode())
+
+    def export_private_key(self, private_key):
+        """
+        @return     str representation of private_key (PEM)
+        """
+        return private_key.export_key().decode()
+
+    def import_private_key(self, exported):
+        from Crypto.PublicKey import RSA
+        return RSA.import_key(exported.encode())
+
+
+class Ed25519(object):
+    """Ed25519 signatures, using PyNaCl.
+    """
+    scheme = SignatureScheme.ED25519
+    signature_len = 64      # bytes
+    simulator_only = False
+
+    def generate(self):
+        from nacl.signing import SigningKey
+        return SigningKey.generate()
+
+    def public_key(self, private_key):
+        return private_key.verify_key
+
+    def sign(self, private_key, data):
+        return private_key.sign(data).signature
+
+    def verify(self, public_key, data, signature):
+        """Raises ValueError if signature is not valid for data.
+        """
+        from nacl.exceptions import BadSignatureError
+        try:
+            public_key.verify(data, signature)
+        except BadSignatureError as e:
+            raise ValueError(e)
+
+    def export_public_key(self, public_key):
+        """
+        @return     str representation of public_key (base64)
+        """
+        return binascii.b2a_base64(bytes(public_key), newline=False).decode()
+
+    def import_public_key(self, exported):
+        from nacl.signing import VerifyKey
+        return VerifyKey(binascii.a2b_base64(exported))
+
+    def export_private_key(self, private_key):
+        """
+        @return     str representation of private_key's seed (base64)
+        """
+        return binascii.b2a_base64(bytes(private_key), newline=False).decode()
+
+    def import_private_key(self, exported):
+        from nacl.signing import SigningKey
+        return SigningKey(binascii.a2b_base64(exported))
+
+
+class HMACSHA256(object):
+    """HMAC-SHA256 over a random key, which is both the private and the
+    public key. Much cheaper than the other schemes, so large simulated
+    networks spend their time on the protocol. Every router that verifies a
+    packet could also have signed it, so real routers must not use it.
+    """
+    scheme = SignatureScheme.HMAC
+    signature_len = 32      # bytes
+    simulator_only = True
+
+    def generate(self):
+        return os.urandom(32)
+
+    def public_key(self, private_key):
+        return private_key
+
+    def sign(self, private_key, data):
+        return hmac.new(private_key, data, hashlib.sha256).digest()
+
+    def verify(self, public_key, data, signature):
+        """Raises ValueError if signature is not valid for data.
+        """
+        # Keys of the other schemes are never bytes
+        if not isinstance(public_key, bytes) or not hmac.compare_digest(
+                self.sign(public_key, data), signature):
+            raise ValueError('Invalid HMAC')
+
+    def export_public_key(self, public_key):
+        """
+        @return     str representation of public_key (base64)
+        """
+        return binascii.b2a_base64(public_key, newline=False).decode()
+
+    def import_public_key(self, exported):
+        return binascii.a2b_base64(exported)
+
+    export_private_key = export_public_key
+    import_private_key = import_public_key
+
+
+SCHEMES = {
+    SignatureScheme.RSA_PSS: RSAPSS(),
+    SignatureScheme.ED25519: Ed25519(),
+    SignatureScheme.HMAC: HMACSHA256(),
+}
+
+def get_scheme(scheme):
+    """
+    @scheme     SignatureScheme, or None for packets from before schemes
+                were recorded
+    @return     implementation of scheme
+    """
+    return SCHEMES[scheme or SignatureScheme.RSA_PSS]
@@ -0,0 +1,140 @@
+import binascii
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from sim.log import get_logger
+from sim.signatures import get_scheme
+
+
+SIGN_BATCH_SIZE = 32    # packets signed per batch
+SIGN_AHEAD = 16         # batches signed ahead of sending
+
+log = get_logger('sim.signing')
+
+# Packet key of the router, loaded once per worker process
+signing_key = None
+
+
+def load_signing_key(scheme, exported):
+    """Worker process initializer, imports the router's packet key.
+    """
+    global signing_key
+    signing_key = get_scheme(scheme).import_private_key(exported)
+
+def sign_batch(scheme, batch):
+    """Signs a batch of packets. Runs in a worker process.
+    @scheme     SignatureScheme of the router's packet key
+    @batch      list of signed bytes, see BBBPacket.signed_bytes
+    @return     list of (base64 signature, seconds it took), one per item in
+                batch
+    """
+    implementation = get_scheme(scheme)
+    results = []
+    for data in batch:
+        start = time.perf_counter()
+        signature = implementation.sign(signing_key, data)
+        results.append((
+            binascii.b2a_base64(signature).decode('utf-8'),
+            time.perf_counter() - start,
+        ))
+    return results
+
+
+class SigningPipeline(object):
+    """Signs packets originated by a router on a pool of worker processes,
+    ahead of sending them.
+    Packets get their sequence numbers before they are signed, in batches,
+    on the workers. Signed batches wait in a bounded ready queue and a
+    sending thread sends them, like BasicRouter.send_originated, in sequence
+    order. Once the
+    queue is full, originating blocks until the sending thread catches up,
+    so at most ahead batches are signed but not sent.
+    The packet key is sent to the workers once, when they start.
+    """
+    def __init__(self, router, workers=None, batch_size=SIGN_BATCH_SIZE,
+                 ahead=SIGN_AHEAD):
+        """
+        @router         BasicRouter the packets are originated by
+        @workers        number of worker processes, defaults to the cpu count
+        @batch_size     packets per batch
+        @ahead          batches signed ahead of sending
+        """
+        self.router = router
+        self.workers = workers or os.cpu_count()
+        scheme = router.signature_scheme
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers,
+            initializer=load_signing_key,
+            initargs=(scheme.scheme,
+                      scheme.export_private_key(router.packet_key)),
+        )
+        self.batch_size = batch_size
+        self.ready = queue.Queue(maxsize=ahead)   # (packets, future)
+        # Counters
+        self.signed = 0
+        self.batches = 0
+
+    def start(self):
+        """Dispatches the sending thread.
+        """
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def originate(self, packets):
+        """Signs packets and sends them, in order.
+        Returns once they were all sent.
+        @packets    iterable of unsigned BBBPackets with sequence numbers
+        """
+        batch = []
+        for packet in packets:
+            batch.append(packet)
+            if len(batch) == self.batch_size:
+                self.submit(batch)
+                batch = []
+        if batch:
+            self.submit(batch)
+        self.ready.join()
+
+    def submit(self, batch):
+        """Hands a batch of packets to the workers. Blocks while ahead
+        batches are waiting to be sent.
+        """
+        scheme = self.router.signature_scheme.scheme
+        for packet in batch:
+            packet.scheme = scheme
+            packet._signed_bytes = None
+        future = self.executor.submit(
+            sign_batch, scheme, [packet.signed_bytes() for packet in batch])
+        self.ready.put((batch, future))
+        self.batches += 1
+
+    def run(self):
+        """Sending thread. Sends signed batches in the order they were
+        submitted.
+        """
+        while True:
+            batch, future = self.ready.get()
+            try:
+                for packet, (signature, seconds) in zip(batch,
+                                                        future.result()):
+                    packet.signature = signature
+                    self.router.metrics.sign_seconds.observe(seconds)
+                    self.signed += 1
+                    self.router.send_originated(packet)
+            except Exception:
+                log.exception('originating failed', packets=len(batch))
+            finally:
+                self.ready.task_done()
+
+    def stats(self):
+        """
+        @return     dict of the pipeline's counters
+        """
+        return {
+            'workers': self.workers,
+            'ready': self.ready.qsize(),
+            'batches': self.batches,
+            'signed': self.signed,
+        }
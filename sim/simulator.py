@@ -0,0 +1,450 @@
+"""In-process simulation of a whole topology.
+
+Every router of a topology runs as a BasicRouter (or a subclass) in this
+process. Links are VirtualSockets that hand the bytes written to them to a
+Network, which delivers them to the neighbor through the same FrameReader,
+verify and handle_* code a real router uses. Keys come from a
+StaticKeyDirectory instead of BigchainDB.
+
+Time is virtual: an EventScheduler runs link latencies, packet delivery and
+the routers' timers, so idle protocol time costs nothing.
+
+    python3 -m sim.simulator simple.json [--floods N] [--unicast]
+                                         [--scheme ed25519]
+                                         [--time SECONDS] [--seed N]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+
+from sim.base import BBBPacket, BBBPacketType, ROUTER_PORT, UNORDERED_TYPES
+from sim.basic_router import BasicRouter, HELLO_FLOOD_PERIOD
+from sim.byzantine_routers import FaultyFloodingRouter, GreedyFloodingRouter
+from sim.codec import FrameReader, WireFormat
+from sim.events import EventScheduler
+from sim.log import LEVELS, LOG_LEVEL, configure
+from sim.master import TOPO_DIRECTORY
+from sim.signatures import SignatureScheme
+from sim.timers import (
+    HOLD_DOWN, ROUTE_UPDATE_PERIOD, UpdateTimer, convergence_time
+)
+
+
+# Router classes by the name in a topology entry's optional "router" key
+ROUTER_CLASSES = {
+    'BasicRouter': BasicRouter,
+    'FaultyFloodingRouter': FaultyFloodingRouter,
+    'GreedyFloodingRouter': GreedyFloodingRouter,
+}
+MAX_ROUTE_ROUNDS = 1000     # route update rounds before giving up converging
+
+
+def load_topology(topo_path):
+    """Loads a topology in the Master's JSON format.
+    @topo_path      path of the file, or its name in TOPO_DIRECTORY
+    @return         dict of router_ip: {"hosts": [], "neighbors": []}
+    """
+    if not os.path.exists(topo_path):
+        topo_path = os.path.join(TOPO_DIRECTORY, topo_path)
+    with open(topo_path, 'r') as topo_file:
+        return json.load(topo_file)
+
+
+class StaticKeyDirectory(object):
+    """Stands in for KeyDirectory, every router's key is known up front.
+    """
+    def __init__(self):
+        self.keys = {}  # ip: packet_public_key
+
+    def cached(self, ip):
+        return self.keys.get(ip)
+
+    def get(self, ip):
+        return self.keys[ip]
+
+    def put(self, ip, public_key):
+        self.keys[ip] = public_key
+
+    def prefetch(self, ips):
+        return []
+
+    def stats(self):
+        return {'size': len(self.keys)}
+
+
+class VirtualSocket(object):
+    """One direction of a link. Bytes written to it are queued on the Network
+    for delivery to the router at the other end.
+    """
+    def __init__(self, network, src, dst):
+        """
+        @network    Network the link belongs to
+        @src        ip address of the router writing to the socket
+        @dst        ip address of the router reading from it
+        """
+        self.network = network
+        self.src = src
+        self.dst = dst
+        self.reader = FrameReader()     # reassembles frames for dst
+
+    def sendall(self, data):
+        self.network.transmit(self, data)
+
+    def close(self):
+        pass
+
+
+class Network(object):
+    """Runs the routers of a topology in this process.
+    Frames are delivered by an EventScheduler on a virtual clock, one at a
+    time, so all router code runs on the calling thread. Every link has a
+    latency, frames on a link arrive in the order they were sent. The
+    routers' timers, route tables and flood caches run on the virtual clock
+    as well, so runs with the same seed are identical.
+    """
+    def __init__(self, topology, scheme=SignatureScheme.ED25519,
+                 wire_format=WireFormat.BINARY, quiet=True, latency=0,
+                 latency_jitter=0, seed=0,
+                 route_update_period=ROUTE_UPDATE_PERIOD,
+                 hold_down=HOLD_DOWN, local=None):
+        """
+        @topology               dict in the Master's JSON format. Entries may
+                                name their router class in a "router" key,
+                                see ROUTER_CLASSES, and the latency of their
+                                links in a "latencies" dict of
+                                neighbor_ip: seconds
+        @scheme                 SignatureScheme every router signs with
+        @wire_format            WireFormat every router sends in
+        @quiet                  discard what the routers print
+        @latency                seconds a frame takes on links without a
+                                latency in the topology
+        @latency_jitter         fraction by which those latencies randomly
+                                differ from latency
+        @seed                   seed of all randomness in the simulation
+        @route_update_period    seconds between periodic route updates
+        @hold_down              minimum seconds between route updates
+        @local                  ips of the routers to run, None runs all.
+                                Frames for other routers are collected in
+                                outbox, see sim/sharding.py
+        """
+        self.topology = topology
+        self.quiet = quiet
+        self.devnull = open(os.devnull, 'w')
+        self.rng = random.Random(seed)
+        self.scheduler = EventScheduler()
+        self.key_directory = StaticKeyDirectory()
+        self.routers = {}       # ip: router
+        self.latencies = {}     # VirtualSocket: seconds
+        self.incoming = {}      # (src_ip, dst_ip): VirtualSocket from outside
+        # (arrival time, src_ip, dst_ip, bytes, hops, origin) of frames for
+        # routers that are not run here
+        self.outbox = []
+        self.updates = {}       # ip: time of its next scheduled route update
+        self.timers = False     # True once start_timers was called
+        # Frame being delivered, frames sent meanwhile are forwarded by it
+        self.hops = 0
+        self.origin = None
+        # Counters
+        self.frames = 0
+        self.bytes = 0
+        self.delivered = 0
+        self.delivered_hops = 0
+        self.delivered_latency = 0
+        self.max_hops = 0
+        self.rejected = 0
+        self.elapsed = 0
+
+        with self.output():
+            for ip, config in topology.items():
+                if local is not None and ip not in local:
+                    continue
+                router_cls = ROUTER_CLASSES[config.get('router', 'BasicRouter')]
+                router = router_cls(ip, test=True, wire_format=wire_format,
+                                    scheme=scheme)
+                router.key_directory = self.key_directory
+                self.key_directory.put(ip, router.public_key)
+                router.routes.clock = self.scheduler.clock
+                router.flood_cache.clock = self.scheduler.clock
+                if router.admission:
+                    router.admission.clock = self.scheduler.clock
+                router.route_timer = UpdateTimer(
+                    period=route_update_period,
+                    hold_down=hold_down,
+                    clock=self.scheduler.clock,
+                    rng=random.Random(self.rng.random()),
+                )
+                self.routers[ip] = router
+
+            # Configure every router like the Master would, then connect it
+            # to its neighbors
+            for ip in self.routers:
+                config = topology[ip]
+                router = self.routers[ip]
+                router.handle_masterconfig(BBBPacket(
+                    src='0.0.0.0',
+                    dst=ip,
+                    type=BBBPacketType.MASTERCONFIG,
+                    payload=json.dumps(config),
+                    seq=0,
+                ))
+                latencies = config.get('latencies', {})
+                for neighbor in sorted(router.neighbors):
+                    link = VirtualSocket(self, ip, neighbor)
+                    router.sockets[neighbor] = link
+                    self.latencies[link] = latencies.get(
+                        neighbor,
+                        latency * (1 + self.rng.uniform(
+                            -latency_jitter, latency_jitter)),
+                    )
+
+    def output(self):
+        """Context manager that discards router output if quiet is set.
+        """
+        if self.quiet:
+            return contextlib.redirect_stdout(self.devnull)
+        return contextlib.nullcontext()
+
+    def now(self):
+        """
+        @return     current virtual time in seconds
+        """
+        return self.scheduler.now
+
+    def transmit(self, link, data):
+        """Called by VirtualSockets, schedules the delivery of data.
+        """
+        origin = self.scheduler.now if self.origin is None else self.origin
+        if link.dst in self.routers:
+            self.scheduler.schedule(self.latencies[link], self.deliver,
+                                    link, data, self.hops + 1, origin)
+        else:
+            self.outbox.append((
+                self.scheduler.now + self.latencies[link],
+                link.src, link.dst, data, self.hops + 1, origin,
+            ))
+        self.frames += 1
+        self.bytes += len(data)
+
+    def receive(self, frames):
+        """Schedules the delivery of frames sent by routers run elsewhere.
+        @frames     iterable of frames in the format of outbox
+        """
+        for arrival, src, dst, data, hops, origin in frames:
+            link = self.incoming.get((src, dst))
+            if link is None:
+                link = self.incoming[(src, dst)] = VirtualSocket(self, src, dst)
+            self.scheduler.schedule_at(arrival, self.deliver,
+                                       link, data, hops, origin)
+
+    def lookahead(self):
+        """
+        @return     lowest latency of the links to routers not run here,
+                    infinity if there are none
+        """
+        return min((latency for link, latency in self.latencies.items()
+                    if link.dst not in self.routers), default=float('inf'))
+
+    def run(self, until=None):
+        """Runs the simulation.
+        @until      virtual time to stop at. None runs until no frames are in
+                    flight, which never happens once start_timers was called.
+        @return     number of events run
+        """
+        if until is None and self.timers:
+            raise ValueError('Timers never stop, pass until')
+        start = time.perf_counter()
+        with self.output():
+            count = self.scheduler.run(until)
+        self.elapsed += time.perf_counter() - start
+        return count
+
+    def deliver(self, link, data, hops, origin):
+        """Hands data to the router at the end of link, like handle_client
+        would.
+        """
+        router = self.routers.get(link.dst)
+        if router is None:
+            return
+        address = (link.src, ROUTER_PORT)
+        self.hops = hops
+        self.origin = origin
+        for packet in link.reader.feed(data):
+            router.peer_formats[link.src] = link.reader.wire_format
+            if not router.receive_packet(packet, address):
+                self.rejected += 1
+            elif packet.type in UNORDERED_TYPES and (
+                    packet.dst == router.ip_address
+                    or packet.dst in router.hosts):
+                self.delivered += 1
+                self.delivered_hops += hops
+                self.delivered_latency += self.scheduler.now - origin
+                self.max_hops = max(self.max_hops, hops)
+        self.hops = 0
+        self.origin = None
+        if self.timers and router.route_timer.triggered_at is not None:
+            self.schedule_update(router)
+
+    def converge(self, max_rounds=MAX_ROUTE_ROUNDS):
+        """Exchanges route updates in rounds until no routing table changes
+        any more, without waiting for the routers' timers. The first round
+        sends full tables, later rounds triggered deltas.
+        @return     number of rounds it took
+        """
+        for rounds in range(1, max_rounds + 1):
+            with self.output():
+                for router in self.routers.values():
+                    router.send_route_updates(periodic=rounds == 1)
+            self.run()
+            if not any(r.routes.has_changes() for r in self.routers.values()):
+                return rounds
+        raise RuntimeError('Routes did not converge in {} rounds'.format(
+            max_rounds))
+
+    def start_timers(self):
+        """Lets every router send route updates when its UpdateTimer says so,
+        like its ROUTEUPDATE thread would. The first update is sent now.
+        """
+        self.timers = True
+        for router in self.routers.values():
+            self.updates[router.ip_address] = self.scheduler.now
+            self.scheduler.schedule(0, self.send_route_updates, router,
+                                    self.scheduler.now, True)
+
+    def schedule_update(self, router):
+        """Schedules router's next route update, unless one is already
+        scheduled at the same time or earlier.
+        """
+        deadline, periodic = router.route_timer.deadline()
+        scheduled = self.updates.get(router.ip_address)
+        if scheduled is not None and scheduled <= deadline:
+            return
+        self.updates[router.ip_address] = deadline
+        self.scheduler.schedule_at(deadline, self.send_route_updates,
+                                   router, deadline, periodic)
+
+    def send_route_updates(self, router, deadline, periodic):
+        """Timer event, sends router's route updates unless the update was
+        rescheduled meanwhile.
+        """
+        if self.updates.get(router.ip_address) != deadline:
+            return
+        del self.updates[router.ip_address]
+        router.send_route_updates(periodic)
+        router.route_timer.sent(periodic)
+        self.schedule_update(router)
+
+    def convergence_time(self, since):
+        """
+        @return     virtual seconds from since until the last route change,
+                    None if no route changed since then
+        """
+        return convergence_time(self.routers.values(), since)
+
+    def flood(self, src, dst, payload):
+        """Originates a FLOOD packet at src. Without timers the packet is
+        delivered before this returns.
+        """
+        self.send_flood(src, dst, payload)
+        if not self.timers:
+            self.run()
+
+    def send_flood(self, src, dst, payload):
+        """Originates a FLOOD packet at src.
+        """
+        with self.output():
+            self.routers[src].send_flood(dst, payload)
+
+    def send_data(self, src, dst, payload):
+        """Originates a DATA packet at src.
+        """
+        with self.output():
+            self.routers[src].send_data(dst, payload)
+
+    def schedule_floods(self, src, dst, count, period=HELLO_FLOOD_PERIOD):
+        """Schedules count FLOOD packets from src to dst, period seconds
+        apart starting now, like the flood CLI command. They are sent by run.
+        """
+        for i in range(int(count)):
+            self.scheduler.schedule(i * period, self.send_flood, src, dst,
+                                    'hello-{0}'.format(i))
+
+    def stats(self):
+        """
+        @return     dict of the simulation's counters
+        """
+        return {
+            'routers': len(self.routers),
+            'links': len(self.latencies),
+            'time': self.scheduler.now,
+            'events': self.scheduler.processed,
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'delivered': self.delivered,
+            'rejected': self.rejected,
+            'avg_hops': self.delivered_hops / self.delivered
+                if self.delivered else 0,
+            'max_hops': self.max_hops,
+            'avg_latency': self.delivered_latency / self.delivered
+                if self.delivered else 0,
+            'elapsed': self.elapsed,
+            'frames_per_sec': self.frames / self.elapsed
+                if self.elapsed else 0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('topology', help='topology file, or its name in {}'
+                        .format(TOPO_DIRECTORY))
+    parser.add_argument('--floods', type=int, default=100,
+                        help='FLOOD packets between random router pairs')
+    parser.add_argument('--unicast', action='store_true',
+                        help='send DATA packets along the routes instead of '
+                             'FLOODs')
+    parser.add_argument('--scheme', default='ed25519',
+                        choices=[s.name.lower() for s in SignatureScheme])
+    parser.add_argument('--time', type=float, default=0,
+                        help='virtual seconds to run the routers\' timers '
+                             'for, by default routes are converged in rounds')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='link latency in virtual seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log-level', default=LOG_LEVEL, choices=LEVELS)
+    args = parser.parse_args()
+    configure(args.log_level)
+
+    start = time.perf_counter()
+    network = Network(load_topology(args.topology),
+                      scheme=SignatureScheme[args.scheme.upper()],
+                      latency=args.latency, latency_jitter=0.5,
+                      seed=args.seed)
+    print('Started {} routers in {:.2f}s'.format(
+        len(network.routers), time.perf_counter() - start))
+    rng = random.Random(args.seed)
+    ips = sorted(network.routers)
+    send = network.send_data if args.unicast else network.send_flood
+    if args.time:
+        network.start_timers()
+        for i in range(args.floods):
+            src, dst = rng.sample(ips, 2)
+            network.scheduler.schedule(rng.uniform(0, args.time),
+                                       send, src, dst,
+                                       'hello-{}'.format(i))
+        network.run(until=args.time)
+        print('Routes converged after {:.3f}s of virtual time'.format(
+            network.convergence_time(0) or 0))
+    else:
+        rounds = network.converge()
+        print('Routes converged in {} rounds'.format(rounds))
+        for i in range(args.floods):
+            src, dst = rng.sample(ips, 2)
+            send(src, dst, 'hello-{}'.format(i))
+            network.run()
+    for key, value in network.stats().items():
+        print('{:<16}{}'.format(key, value))
+
+if __name__ == "__main__":
+    main()
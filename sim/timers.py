@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+
+
+ROUTE_UPDATE_PERIOD = 30    # seconds between periodic route updates
+HOLD_DOWN = 1               # minimum seconds between two route updates
+UPDATE_JITTER = 0.5         # maximum random delay added to every update
+
+
+class UpdateTimer(object):
+    """Decides when a router sends its next route update.
+    Updates are sent every period seconds, and as soon as possible after
+    trigger is called, but never less than hold_down seconds after the last
+    update. Every deadline is delayed by a random amount of up to jitter
+    seconds so neighboring routers do not synchronize their updates.
+    The time from the first trigger to the update that carries it is
+    recorded as the router's advertisement delay.
+    """
+    def __init__(self, period=ROUTE_UPDATE_PERIOD, hold_down=HOLD_DOWN,
+                 jitter=UPDATE_JITTER, clock=time.monotonic, rng=None):
+        """
+        @period         seconds between periodic updates
+        @hold_down      minimum seconds between two updates
+        @jitter         maximum random delay of an update in seconds
+        @clock          function returning the current time in seconds
+        @rng            random.Random used for the jitter
+        """
+        self.period = period
+        self.hold_down = hold_down
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.condition = threading.Condition()
+        self.last_update = clock()
+        self.last_periodic = self.last_update
+        self.triggered_at = None    # time of the first unsent trigger
+        self.delay = self.rng.uniform(0, jitter)
+        # Counters
+        self.periodic = 0
+        self.triggered = 0
+        self.advertise_delay_max = 0
+        self.advertise_delay_total = 0
+
+    def trigger(self):
+        """Requests an update because the routing table changed.
+        """
+        with self.condition:
+            if self.triggered_at is None:
+                self.triggered_at = self.clock()
+            self.condition.notify_all()
+
+    def deadline(self):
+        """
+        @return     (time of the next update, True if it is a periodic one)
+        """
+        with self.condition:
+            periodic = self.last_periodic + self.period + self.delay
+            if self.triggered_at is not None:
+                triggered = max(self.triggered_at,
+                                self.last_update + self.hold_down) + self.delay
+                if triggered < periodic:
+                    return triggered, False
+            return periodic, True
+
+    def timeout(self):
+        """
+        @return     (seconds until the next update, True if it is periodic)
+        """
+        deadline, periodic = self.deadline()
+        return max(0, deadline - self.clock()), periodic
+
+    def wait(self):
+        """Blocks until the next update is due.
+        @return     True if it is a periodic update
+        """
+        with self.condition:
+            while True:
+                timeout, periodic = self.timeout()
+                if timeout <= 0:
+                    return periodic
+                self.condition.wait(timeout)
+
+    def sent(self, periodic):
+        """Records that an update was just sent.
+        @periodic   True if it was a periodic update
+        """
+        with self.condition:
+            now = self.clock()
+            if self.triggered_at is not None:
+                delay = now - self.triggered_at
+                self.advertise_delay_max = max(self.advertise_delay_max, delay)
+                self.advertise_delay_total += delay
+                self.triggered += 1
+                self.triggered_at = None
+            if periodic:
+                self.last_periodic = now
+                self.periodic += 1
+            self.last_update = now
+            self.delay = self.rng.uniform(0, self.jitter)
+
+    def stats(self):
+        """
+        @return     dict of the timer's settings and counters
+        """
+        return {
+            'period': self.period,
+            'hold_down': self.hold_down,
+            'periodic': self.periodic,
+            'triggered': self.triggered,
+            'advertise_delay_max': self.advertise_delay_max,
+            'advertise_delay_avg':
+                self.advertise_delay_total / self.triggered
+                if self.triggered else 0,
+        }
+
+
+def convergence_time(routers, since):
+    """Network convergence time after a topology change.
+    @routers    iterable of routers
+    @since      time of the topology change, in the routers' RouteTable clock
+    @return     seconds from since to the last route change of any router,
+                or None if no router changed a route since then
+    """
+    changes = [r.routes.last_change for r in routers
+               if r.routes.last_change is not None
+               and r.routes.last_change >= since]
+    return max(changes) - since if changes else None
@@ -0,0 +1,298 @@
+"""Synthetic topologies in the Master's JSON format.
+
+    python3 -m sim.topology grid --size 100 [--degree N] [--hosts N]
+        [--byzantine FRACTION] [--placement random|degree|clustered]
+        [--seed N] [-o sim/topologies/grid-100.json]
+"""
+import argparse
+import json
+import random
+import sys
+from collections import deque
+
+
+BYZANTINE_ROUTER = 'FaultyFloodingRouter'
+PLACEMENTS = ['random', 'degree', 'clustered']
+
+
+def address(i, prefix=10):
+    """
+    @return     i-th ip address in prefix.0.0.0/8
+    """
+    return '{}.{}.{}.{}'.format(prefix, i >> 16 & 255, i >> 8 & 255, i & 255)
+
+
+def ring(size, rng):
+    """Every router connected to the next one, the last to the first.
+    """
+    edges = [(i, i + 1) for i in range(size - 1)]
+    if size > 2:
+        edges.append((size - 1, 0))
+    return edges
+
+
+def grid_side(size):
+    """
+    @return     side of the square grid closest to size routers
+    """
+    return max(2, round(size ** 0.5))
+
+
+def grid(size, rng):
+    """Square grid of about size routers, every router connected to the
+    routers above, below, left and right of it.
+    """
+    side = grid_side(size)
+    edges = []
+    for i in range(side * side):
+        row, column = divmod(i, side)
+        if row < side - 1:
+            edges.append((i, i + side))
+        if column < side - 1:
+            edges.append((i, i + 1))
+    return edges
+
+
+def random_regular(size, degree, rng):
+    """Random graph where every router has degree neighbors, using the
+    pairing model. Stubs that paired into self loops or parallel links are
+    shuffled and paired again, the pairing only restarts once no valid pair
+    is left among them.
+    """
+    if size * degree % 2 or degree >= size:
+        raise ValueError('No {}-regular graph on {} routers'.format(
+            degree, size))
+    for _ in range(100):
+        stubs = [i for i in range(size) for _ in range(degree)]
+        edges = set()
+        while stubs and can_pair(set(stubs), edges):
+            rng.shuffle(stubs)
+            left = []
+            for a, b in zip(stubs[::2], stubs[1::2]):
+                edge = (min(a, b), max(a, b))
+                if a == b or edge in edges:
+                    left.extend(edge)
+                else:
+                    edges.add(edge)
+            stubs = left
+        if not stubs:
+            return sorted(edges)
+    raise ValueError('Could not pair up a {}-regular graph'.format(degree))
+
+
+def can_pair(routers, edges):
+    """
+    @return     True if two of routers are not linked yet
+    """
+    routers = sorted(routers)
+    return any((a, b) not in edges
+               for i, a in enumerate(routers) for b in routers[i + 1:])
+
+
+def erdos_renyi(size, degree, rng):
+    """Erdos-Renyi G(n, m) graph with size * degree / 2 links picked
+    uniformly at random, so the average degree is degree.
+    """
+    links = min(size * degree // 2, size * (size - 1) // 2)
+    edges = set()
+    while len(edges) < links:
+        a, b = rng.randrange(size), rng.randrange(size)
+        if a != b:
+            edges.add((min(a, b), max(a, b)))
+    return sorted(edges)
+
+
+def scale_free(size, degree, rng):
+    """Barabasi-Albert graph, every new router links to degree // 2
+    existing routers picked proportionally to their degree. Graphs of no
+    more than degree // 2 routers are complete.
+    """
+    m = min(max(1, degree // 2), size - 1)
+    edges = [(i, j) for i in range(m + 1) for j in range(i + 1, m + 1)]
+    targets = [v for edge in edges for v in edge]
+    for i in range(m + 1, size):
+        chosen = set()
+        while len(chosen) < m:
+            chosen.add(rng.choice(targets))
+        for j in chosen:
+            edges.append((j, i))
+            targets.extend((i, j))
+    return edges
+
+
+def fat_tree(k):
+    """k-ary fat-tree: (k/2)^2 core switches and k pods of k/2 aggregation
+    and k/2 edge switches. Edge switches come last.
+    @return     (edges, number of routers, indices of the edge switches)
+    """
+    half = k // 2
+    core = half * half
+    edges = []
+    edge_switches = []
+    for pod in range(k):
+        aggregation = core + pod * k
+        for a in range(half):
+            for c in range(half):
+                edges.append((a * half + c, aggregation + a))
+            for e in range(half):
+                edges.append((aggregation + a, aggregation + half + e))
+        edge_switches.extend(range(aggregation + half, aggregation + k))
+    return edges, core + k * k, edge_switches
+
+
+def connect(size, edges, rng):
+    """Links the components of a graph with one random link each, so every
+    router can reach every other.
+    @return     edges plus the added links
+    """
+    adjacency = [[] for _ in range(size)]
+    for a, b in edges:
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+    components = []
+    seen = set()
+    for root in range(size):
+        if root in seen:
+            continue
+        seen.add(root)
+        component = [root]
+        queue = deque([root])
+        while queue:
+            for n in adjacency[queue.popleft()]:
+                if n not in seen:
+                    seen.add(n)
+                    component.append(n)
+                    queue.append(n)
+        components.append(component)
+    edges = list(edges)
+    for previous, component in zip(components, components[1:]):
+        edges.append((rng.choice(previous), rng.choice(component)))
+    return edges
+
+
+def place_byzantine(adjacency, count, placement, rng):
+    """Picks the routers that are byzantine.
+    @adjacency  list of neighbor lists
+    @count      number of byzantine routers
+    @placement  'random', 'degree' for the best connected routers, or
+                'clustered' for a breadth first neighborhood of a random
+                router
+    @return     set of router indices
+    """
+    size = len(adjacency)
+    if placement == 'random':
+        return set(rng.sample(range(size), count))
+    if placement == 'degree':
+        order = sorted(range(size), key=lambda i: (-len(adjacency[i]), i))
+        return set(order[:count])
+    if placement == 'clustered':
+        chosen = []
+        seen = set()
+        queue = deque()
+        while len(chosen) < count:
+            if not queue:
+                root = rng.choice([i for i in range(size) if i not in seen])
+                seen.add(root)
+                queue.append(root)
+            i = queue.popleft()
+            chosen.append(i)
+            for n in adjacency[i]:
+                if n not in seen:
+                    seen.add(n)
+                    queue.append(n)
+        return set(chosen)
+    raise ValueError('Unknown placement {}'.format(placement))
+
+
+FAMILIES = {
+    'ring': lambda size, degree, rng: ring(size, rng),
+    'grid': lambda size, degree, rng: grid(size, rng),
+    'random-regular': random_regular,
+    'erdos-renyi': erdos_renyi,
+    'scale-free': scale_free,
+}
+
+
+def generate(family, size, degree=4, hosts=0, byzantine=0,
+             placement='random', byzantine_router=BYZANTINE_ROUTER, seed=0):
+    """Generates a topology.
+    @family             one of FAMILIES or 'fat-tree'
+    @size               number of routers. Grids are rounded to a square,
+                        fat-trees to the smallest k-ary fat-tree of at least
+                        size routers
+    @degree             neighbors per router (random-regular) or average
+                        degree (erdos-renyi, scale-free). Ignored by ring,
+                        grid and fat-tree
+    @hosts              number of hosts, spread over the routers (the edge
+                        switches of a fat-tree)
+    @byzantine          fraction of routers that are byzantine
+    @placement          where byzantine routers go, see place_byzantine
+    @byzantine_router   router class of byzantine routers, see
+                        sim.simulator.ROUTER_CLASSES
+    @seed               seed of all randomness
+    @return             dict in the Master's JSON format
+    """
+    rng = random.Random(seed)
+    if family == 'fat-tree':
+        k = 2
+        while 5 * k * k // 4 < size:
+            k += 2
+        edges, size, host_routers = fat_tree(k)
+    elif family in FAMILIES:
+        if family == 'grid':
+            size = grid_side(size) ** 2
+        edges = connect(size, FAMILIES[family](size, degree, rng), rng)
+        host_routers = list(range(size))
+    else:
+        raise ValueError('Unknown topology family {}'.format(family))
+
+    adjacency = [[] for _ in range(size)]
+    for a, b in edges:
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+    faulty = place_byzantine(
+        adjacency, round(byzantine * size), placement, rng)
+
+    topology = {}
+    for i in range(size):
+        topology[address(i)] = {
+            'hosts': [],
+            'neighbors': [address(n) for n in sorted(adjacency[i])],
+        }
+        if i in faulty:
+            topology[address(i)]['router'] = byzantine_router
+    for h in range(hosts):
+        router = address(host_routers[h % len(host_routers)])
+        topology[router]['hosts'].append(address(h, prefix=172))
+    return topology
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('family', choices=sorted(FAMILIES) + ['fat-tree'])
+    parser.add_argument('--size', type=int, default=16)
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--hosts', type=int, default=0)
+    parser.add_argument('--byzantine', type=float, default=0,
+                        help='fraction of byzantine routers')
+    parser.add_argument('--placement', default='random', choices=PLACEMENTS)
+    parser.add_argument('--router', default=BYZANTINE_ROUTER,
+                        help='router class of byzantine routers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='file to write, by default '
+                        'the topology is printed')
+    args = parser.parse_args()
+
+    topology = generate(args.family, args.size, degree=args.degree,
+                        hosts=args.hosts, byzantine=args.byzantine,
+                        placement=args.placement,
+                        byzantine_router=args.router, seed=args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(topology, f, indent=4)
+    else:
+        json.dump(topology, sys.stdout, indent=4)
+        print()
+
+if __name__ == "__main__":
+    main()
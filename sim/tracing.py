@@ -0,0 +1,267 @@
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from enum import Enum
+from sim.log import get_logger
+
+
+TRACE_SAMPLE_RATE = 0       # fraction of packets traced, 0 disables tracing
+TRACE_SAMPLES = 10000       # most recent spans kept per stage
+PROFILE_INTERVAL = 0.005    # seconds between samples of the sampling profiler
+
+log = get_logger('sim.tracing')
+
+
+def percentile(ordered, fraction):
+    """
+    @ordered    sorted list of values
+    @return     value below which fraction of the values are
+    """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Trace(object):
+    """Timing spans of a single packet through a router. A span is the time
+    since the previous mark, spans of the same stage add up.
+    """
+    def __init__(self, start):
+        """
+        @start      perf_counter time the packet's handling started at
+        """
+        self.start = start
+        self.last = start
+        self.spans = {}     # stage: seconds
+
+    def mark(self, stage):
+        """Ends the current span and attributes it to stage.
+        """
+        now = time.perf_counter()
+        self.spans[stage] = self.spans.get(stage, 0) + now - self.last
+        self.last = now
+
+
+class Tracer(object):
+    """Attaches a Trace to a sample of the packets a router receives, as
+    their _trace attribute, and aggregates the spans of finished traces per
+    stage. Untraced packets only cost a counter increment and getattr calls
+    at every stage.
+    """
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, maxlen=TRACE_SAMPLES):
+        """
+        @sample_rate    fraction of packets traced, 0 disables tracing
+        @maxlen         most recent spans kept per stage
+        """
+        self.maxlen = maxlen
+        self.set_rate(sample_rate)
+
+    def set_rate(self, sample_rate):
+        """Changes the sample rate and forgets all spans.
+        """
+        self.sample_rate = sample_rate
+        # Every interval-th packet is traced
+        self.interval = round(1 / sample_rate) if sample_rate > 0 else 0
+        self.count = 0
+        self.traced = 0
+        self.stages = {}    # stage: deque of seconds
+
+    def sample(self):
+        """
+        @return     True if the next packet is to be traced
+        """
+        if not self.interval:
+            return False
+        self.count += 1
+        if self.count < self.interval:
+            return False
+        self.count = 0
+        return True
+
+    def start(self, packet, start):
+        """Traces packet if it is sampled. The time since start is its
+        decode span.
+        @start      perf_counter time decoding of packet started at
+        @return     Trace of packet, or None
+        """
+        if not self.sample():
+            return None
+        trace = packet._trace = Trace(start)
+        trace.mark('decode')
+        return trace
+
+    def finish(self, packet, stage='handle'):
+        """Ends the last span of packet's trace, if it is traced, and
+        aggregates its spans.
+        """
+        trace = packet._trace
+        if trace is None:
+            return
+        packet._trace = None
+        trace.mark(stage)
+        self.traced += 1
+        for name, seconds in trace.spans.items():
+            self.record(name, seconds)
+        self.record('total', trace.last - trace.start)
+        log.debug('packet trace', src=packet.src, seq=packet.seq,
+                  type=packet.type.name,
+                  **{k: '{:.6f}'.format(v) for k, v in trace.spans.items()})
+
+    def record(self, stage, seconds):
+        """Adds a span of stage that is not part of a packet's trace.
+        """
+        samples = self.stages.get(stage)
+        if samples is None:
+            samples = self.stages[stage] = deque(maxlen=self.maxlen)
+        samples.append(seconds)
+
+    def report(self):
+        """
+        @return     dict of stage: dict of count and percentiles in ms
+        """
+        report = {}
+        for stage, samples in list(self.stages.items()):
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            report[stage] = {
+                'count': len(ordered),
+                'p50': percentile(ordered, 0.5) * 1e3,
+                'p90': percentile(ordered, 0.9) * 1e3,
+                'p99': percentile(ordered, 0.99) * 1e3,
+                'max': ordered[-1] * 1e3,
+            }
+        return report
+
+    def format_report(self):
+        """
+        @return     str table of report
+        """
+        lines = ['traced {} packets, sample rate {}'.format(
+            self.traced, self.sample_rate)]
+        lines.append('{:<18}{:>8}{:>10}{:>10}{:>10}{:>10}'.format(
+            'stage', 'count', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+        for stage, row in self.report().items():
+            lines.append('{:<18}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}'
+                         .format(stage, row['count'], row['p50'], row['p90'],
+                                 row['p99'], row['max']))
+        return '\n'.join(lines)
+
+
+class ProfileMode(Enum):
+    """
+    Enum for how a Profiler captures
+    CPROFILE:   Deterministic cProfile of packet handling, in every thread
+                that handles packets. Written as pstats
+    SAMPLE:     Statistical sampling of the stacks of all threads. Written
+                as collapsed stacks, one "frame;frame;frame count" per line,
+                as read by flamegraph tools
+    """
+    CPROFILE = 0
+    SAMPLE = 1
+
+
+class Profiler(object):
+    """Profiles a running router until stopped, and writes the result to a
+    file.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mode = None
+        self.path = None
+        self.profiles = {}      # thread id: cProfile.Profile
+        self.stacks = Counter() # collapsed stack: samples
+        self.stopped = threading.Event()
+        self.sampler = None     # sampling thread in SAMPLE mode
+
+    @property
+    def active(self):
+        return self.mode is not None
+
+    def start(self, mode, path, interval=PROFILE_INTERVAL, thread=False):
+        """Starts a capture, unless one is running.
+        @mode       ProfileMode
+        @path       file the capture is written to when stopped
+        @interval   seconds between samples in SAMPLE mode
+        @thread     in CPROFILE mode, also profile everything the calling
+                    thread does until it calls stop, e.g. an event loop
+        """
+        with self.lock:
+            if self.mode is not None:
+                raise RuntimeError('Already profiling to ' + self.path)
+            self.profiles = {}
+            self.stacks = Counter()
+            self.path = path
+            self.mode = mode
+        if mode == ProfileMode.CPROFILE and thread:
+            import cProfile
+            profile = self.profiles[threading.get_ident()] = cProfile.Profile()
+            profile.enable()
+        if mode == ProfileMode.SAMPLE:
+            self.stopped.clear()
+            self.sampler = threading.Thread(
+                target=self.sample_stacks, args=(interval,), daemon=True)
+            self.sampler.start()
+
+    @contextmanager
+    def profile(self):
+        """Context manager profiling its block in CPROFILE mode, with a
+        cProfile.Profile of the calling thread.
+        """
+        if self.mode != ProfileMode.CPROFILE:
+            yield
+            return
+        thread = threading.get_ident()
+        profile = self.profiles.get(thread)
+        if profile is None:
+            import cProfile
+            with self.lock:
+                profile = self.profiles.setdefault(thread, cProfile.Profile())
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def sample_stacks(self, interval):
+        """Sampling thread. Counts the stacks of all other threads every
+        interval seconds.
+        """
+        me = threading.get_ident()
+        while not self.stopped.wait(interval):
+            for thread, frame in sys._current_frames().items():
+                if thread == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{}:{}'.format(
+                        code.co_filename.rsplit('/', 1)[-1], code.co_name))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        """Stops the capture and writes it to its file.
+        @return     path of the file
+        """
+        with self.lock:
+            mode, path = self.mode, self.path
+            if mode is None:
+                raise RuntimeError('Not profiling')
+            self.mode = None
+        if mode == ProfileMode.SAMPLE:
+            self.stopped.set()
+            self.sampler.join()
+            with open(path, 'w') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write('{} {}\n'.format(stack, count))
+        else:
+            import pstats
+            profiles = list(self.profiles.values())
+            if not profiles:
+                raise RuntimeError('No packets were handled')
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(path)
+        return path
@@ -0,0 +1,202 @@
+import binascii
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from functools import lru_cache
+from sim.base import BBBPacketType
+from sim.log import get_logger
+from sim.signatures import get_scheme
+
+
+BATCH_SIZE = 64         # packets verified per batch
+BATCH_DELAY = 0.002     # seconds to wait for a batch to fill up
+
+log = get_logger('sim.verification')
+
+
+@lru_cache(maxsize=4096)
+def import_key(scheme, exported):
+    """Parses an exported public key, cached per worker process.
+    """
+    return get_scheme(scheme).import_public_key(exported)
+
+def verify_signatures(batch):
+    """Checks a batch of signatures. Runs in a worker process.
+    @batch      list of (SignatureScheme, exported public key, signed bytes,
+                base64 signature)
+    @return     list of bools, one per item in batch
+    """
+    results = []
+    for scheme, exported, data, signature in batch:
+        try:
+            get_scheme(scheme).verify(
+                import_key(scheme, exported),
+                data,
+                binascii.a2b_base64(signature),
+            )
+            results.append(True)
+        except Exception:
+            results.append(False)
+    return results
+
+
+class VerificationPipeline(object):
+    """Verifies packets in batches on a pool of worker processes.
+    Packets are collected into batches, their signatures are checked in
+    parallel and the results are applied in arrival order, so the per-source
+    sequence number check behaves exactly as in BasicRouter.verify.
+    Verified packets are passed on to the router's handle_packet.
+    """
+    def __init__(self, router, workers=None, batch_size=BATCH_SIZE,
+                 batch_delay=BATCH_DELAY):
+        """
+        @router         BasicRouter the packets are verified for
+        @workers        number of worker processes, defaults to the cpu count
+        @batch_size     maximum number of packets per batch
+        @batch_delay    seconds to wait for more packets before verifying
+        """
+        self.router = router
+        self.workers = workers or os.cpu_count()
+        # concurrent.futures only imports its process pool when it is used
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.incoming = queue.Queue()
+        self.exported_keys = {}     # ip: (public_key, export of it)
+        # Counters
+        self.verified = 0
+        self.rejected = 0
+        self.batches = 0
+
+    def start(self):
+        """Dispatches the batching thread.
+        """
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def submit(self, packet, address):
+        """Queues packet received from address for verification.
+        """
+        self.incoming.put((packet, address))
+
+    def run(self):
+        """Batching thread. Verifies batches of queued packets and dispatches
+        the verified ones to the router.
+        """
+        while True:
+            batch = [self.incoming.get()]
+            deadline = time.monotonic() + self.batch_delay
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.incoming.get(
+                        timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            results = self.verify_batch([packet for packet, _ in batch])
+            for (packet, address), verified in zip(batch, results):
+                if not verified:
+                    self.router.tracer.finish(packet, 'rejected')
+                    continue
+                trace = packet._trace
+                if trace:
+                    # Queued, batched and checked by the workers
+                    trace.mark('verify.batch')
+                try:
+                    self.router.handle_packet(packet, address)
+                except Exception:
+                    log.exception('handler failed', src=packet.src,
+                                  type=packet.type.name)
+                self.router.tracer.finish(packet)
+
+    def verify_batch(self, packets):
+        """Verifies a list of packets.
+        @packets    list of BBBPackets in the order they were received
+        @return     list of bools, one per packet
+        """
+        self.batches += 1
+        # None: verified without crypto, False: rejected, int: index of the
+        # packet's signature in the batch sent to the workers
+        status = []
+        signatures = []
+        for packet in packets:
+            if packet.type == BBBPacketType.MASTERCONFIG:
+                status.append(None)
+                continue
+            if self.router.is_stale(packet):
+                status.append(self.router.reject(packet, 'stale'))
+                continue
+            if not packet.signature:
+                status.append(self.router.reject(packet, 'unsigned'))
+                continue
+            scheme = packet.scheme
+            try:
+                exported = self.export_key(packet.src, scheme)
+            except Exception as e:
+                status.append(self.router.reject(packet, 'no_key', e))
+                continue
+            status.append(len(signatures))
+            signatures.append((
+                scheme,
+                exported,
+                packet.signed_bytes(),
+                packet.signature,
+            ))
+
+        checked = []
+        if signatures:
+            chunk = -(-len(signatures) // self.workers)
+            futures = [
+                self.executor.submit(verify_signatures, signatures[i:i + chunk])
+                for i in range(0, len(signatures), chunk)
+            ]
+            for future in futures:
+                checked.extend(future.result())
+
+        # Sequence numbers are checked and recorded in arrival order
+        results = []
+        for packet, s in zip(packets, status):
+            if s is None:
+                verified = True
+            elif s is False:
+                verified = False
+            elif not checked[s]:
+                verified = self.router.reject(packet, 'bad_signature')
+            elif not self.router.accept_sqn(packet):
+                verified = self.router.reject(packet, 'stale')
+            else:
+                self.router.metrics.verify_results.inc('ok')
+                verified = True
+            if verified:
+                self.verified += 1
+            else:
+                self.rejected += 1
+            results.append(verified)
+        return results
+
+    def export_key(self, ip, scheme):
+        """Returns the export of ip's public key, which is what gets sent to
+        the worker processes.
+        """
+        public_key = self.router.get_key(ip)
+        exported = self.exported_keys.get(ip)
+        if exported is None or exported[0] is not public_key:
+            exported = (
+                public_key,
+                get_scheme(scheme).export_public_key(public_key),
+            )
+            self.exported_keys[ip] = exported
+        return exported[1]
+
+    def stats(self):
+        """
+        @return     dict of the pipeline's counters
+        """
+        return {
+            'workers': self.workers,
+            'queued': self.incoming.qsize(),
+            'batches': self.batches,
+            'verified': self.verified,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,84 @@
+import sim
+
+from sim.admission import AdmissionControl, TokenBucket
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.signatures import SignatureScheme
+
+import unittest
+from unittest.mock import Mock
+
+class TestAdmission(unittest.TestCase):
+
+    def setUp(self):
+        self.router = BasicRouter('1.1.1.1', test=True,
+                                  scheme=SignatureScheme.ED25519)
+        self.sender = BasicRouter('2.2.2.2', test=True,
+                                  scheme=SignatureScheme.ED25519)
+        self.router.keys['2.2.2.2'] = self.sender.public_key
+
+    def packet(self, seq, payload='hi'):
+        packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.ROUTEUPDATE,
+                           payload, seq)
+        self.sender.sign(packet)
+        return packet
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, burst=2, now=0)
+        assert bucket.take(0)
+        assert bucket.take(0)
+        assert not bucket.take(0)
+        # A token every 0.1s
+        assert bucket.take(0.1)
+        assert not bucket.take(0.15)
+        # Never more than burst
+        assert [bucket.take(100) for _ in range(3)] == [True, True, False]
+
+    def test_check_reasons(self):
+        admission = AdmissionControl(self.router, rate=0, max_payload_len=8)
+        assert admission.check(self.packet(1), '2.2.2.2') is None
+        assert admission.check(self.packet(1, 'x' * 9), '2.2.2.2') == \
+            'oversized'
+        unsigned = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.ROUTEUPDATE,
+                             'hi', 1)
+        assert admission.check(unsigned, '2.2.2.2') == 'unsigned'
+        garbage = self.packet(1)
+        garbage.signature = garbage.signature[:-8]
+        assert admission.check(garbage, '2.2.2.2') == 'malformed'
+        # RSA-PSS signatures are longer than Ed25519 ones
+        garbage = self.packet(1)
+        garbage.scheme = SignatureScheme.RSA_PSS
+        assert admission.check(garbage, '2.2.2.2') == 'malformed'
+        self.router.sqn_numbers['2.2.2.2'] = 1
+        assert admission.check(self.packet(1), '2.2.2.2') == 'stale'
+        # MASTERCONFIGs are neither signed nor sequenced
+        config = BBBPacket('0.0.0.0', '1.1.1.1', BBBPacketType.MASTERCONFIG,
+                           '{}', 0)
+        assert admission.check(config, '0.0.0.0') is None
+
+    def test_rate_limited_per_neighbor(self):
+        now = [0]
+        admission = AdmissionControl(self.router, rate=1, burst=2,
+                                     clock=lambda: now[0])
+        assert admission.admit(self.packet(1), ('2.2.2.2', 0))
+        assert admission.admit(self.packet(2), ('2.2.2.2', 0))
+        assert not admission.admit(self.packet(3), ('2.2.2.2', 0))
+        # Other neighbors have buckets of their own
+        assert admission.admit(self.packet(3), ('4.4.4.4', 0))
+        now[0] = 1
+        assert admission.admit(self.packet(3), ('2.2.2.2', 0))
+        dropped = self.router.metrics.admission_dropped
+        assert dropped.get('2.2.2.2', 'rate_limited') == 1
+        assert admission.stats() == {'rate_limited': 1}
+
+    def test_rejected_before_verification(self):
+        self.router.handle_packet = Mock()
+        self.router.verify = Mock(return_value=True)
+        garbage = self.packet(1)
+        garbage.signature = 'AAAA'
+        assert not self.router.receive_packet(garbage, ('2.2.2.2', 0))
+        self.router.verify.assert_not_called()
+        assert self.router.receive_packet(self.packet(1), ('2.2.2.2', 0))
+        self.router.verify.assert_called_once()
+        assert self.router.metrics.admission_dropped.get(
+            '2.2.2.2', 'malformed') == 1
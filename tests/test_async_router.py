@@ -0,0 +1,113 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.async_router import AsyncRouter
+from sim.send_queue import BackpressurePolicy
+
+import asyncio
+import contextlib
+import io
+import unittest
+from unittest.mock import Mock
+
+class TestAsyncRouter(unittest.TestCase):
+
+    def test_handle_flood_flood(self):
+        router1 = AsyncRouter('1.1.1.1', test=True)
+        router1.neighbors.add('2.2.2.2')
+        router1.neighbors.add('3.3.3.3')
+        router1.sockets['2.2.2.2'] = Mock()
+        router1.sockets['3.3.3.3'] = Mock()
+
+        packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hello world', 0)
+        router1.sign(packet)
+        router1.keys['2.2.2.2'] = router1.packet_key.publickey()
+        router1.handle_flood(packet, ('2.2.2.2', 9999))
+        # Packet should be written to 3.3.3.3, but not 2.2.2.2
+        router1.sockets['2.2.2.2'].write.assert_not_called()
+        router1.sockets['3.3.3.3'].write.assert_called_with(packet.to_bytes())
+
+    def test_handle_client(self):
+        router1 = AsyncRouter('1.1.1.1', test=True)
+        router1.neighbors.add('2.2.2.2')
+        router1.neighbors.add('3.3.3.3')
+        router1.sockets['3.3.3.3'] = Mock()
+        router1.keys['2.2.2.2'] = router1.packet_key.publickey()
+
+        packets = []
+        for seq in range(3):
+            packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hello', seq)
+            router1.sign(packet)
+            packets.append(packet)
+        # A replayed packet should not be forwarded
+        packets.append(packets[0])
+
+        async def feed():
+            router1.loop = asyncio.get_running_loop()
+            reader = asyncio.StreamReader()
+            for packet in packets:
+                reader.feed_data(packet.to_bytes())
+            reader.feed_eof()
+            writer = Mock()
+            router1.sockets['2.2.2.2'] = writer
+            await router1.handle_client(reader, writer, ('2.2.2.2', 9999))
+            writer.close.assert_called_with()
+
+        asyncio.run(feed())
+        assert '2.2.2.2' not in router1.sockets
+        assert router1.sockets['3.3.3.3'].write.call_count == 3
+        assert router1.flood_cache.stats()['duplicates'] == 1
+
+    def test_backpressure(self):
+        async def fill(policy):
+            accepted = asyncio.Queue()
+            server = await asyncio.start_server(
+                lambda r, w: accepted.put_nowait(r), '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            peer = await accepted.get()
+            router = AsyncRouter('1.1.1.1', test=True, send_queue_len=4,
+                                 backpressure=policy)
+            router.register_socket('2.2.2.2', writer)
+            queue = router.send_queues['2.2.2.2']
+            # Much more than the socket buffers hold, the peer is not reading
+            data = b'x' * 65536
+            results = [queue.put(data) for _ in range(128)]
+            stats = queue.stats()
+            if policy == BackpressurePolicy.BLOCK:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(queue.wait(), 0.1)
+            await peer.readexactly(stats['sent'] * len(data))
+            if policy == BackpressurePolicy.DROP_OLDEST:
+                # The queued packets are written once the transport drained
+                while queue.depth():
+                    await peer.readexactly(len(data))
+            await asyncio.wait_for(queue.wait(), 1)
+            router.unregister_socket('2.2.2.2', writer)
+            writer.close()
+            server.close()
+            return results, stats, queue
+
+        results, stats, _ = asyncio.run(fill(BackpressurePolicy.BLOCK))
+        assert all(results)
+        assert stats['sent'] == 128 and stats['dropped'] == 0
+
+        results, stats, _ = asyncio.run(fill(BackpressurePolicy.DROP_NEWEST))
+        assert results.count(False) == stats['dropped'] > 0
+        assert stats['sent'] + stats['dropped'] == 128
+        assert stats['buffered'] <= 4 * 1024 + 65536
+
+        results, stats, queue = asyncio.run(
+            fill(BackpressurePolicy.DROP_OLDEST))
+        assert all(results)
+        assert stats['depth'] == stats['max_depth'] == 4
+        assert stats['sent'] + stats['depth'] + stats['dropped'] == 128
+        assert queue.sent == stats['sent'] + 4 and queue.dropped > 0
+
+    def test_cli_shared_with_basic_router(self):
+        router1 = AsyncRouter('1.1.1.1', test=True)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            router1.handle_cli('diagnostics')
+        assert 'unrecognized command' not in output.getvalue()
+        assert 'bbb_packets_total' in output.getvalue()
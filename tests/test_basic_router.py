@@ -97,6 +97,61 @@ class TestBasicRouter(unittest.TestCase):
         router1.sockets['2.2.2.2'].sendall.assert_not_called()
         router1.sockets['3.3.3.3'].sendall.assert_called_with(packet.to_bytes())
 
+    def test_handle_data(self):
+        router1 = BasicRouter('1.1.1.1', test=True)
+        for neighbor in ['2.2.2.2', '3.3.3.3', '4.4.4.4']:
+            router1.neighbors.add(neighbor)
+            router1.sockets[neighbor] = Mock()
+            router1.routes[neighbor] = neighbor
+        router1.routes['5.5.5.5'] = '3.3.3.3'
+
+        message = 'hello world'
+        packet = BBBPacket('2.2.2.2', '5.5.5.5', BBBPacketType.DATA, message, 0)
+        router1.handle_packet(packet, ('2.2.2.2', 9999))
+        # Only sent to the next hop of 5.5.5.5
+        router1.sockets['3.3.3.3'].sendall.assert_called_with(packet.to_bytes())
+        router1.sockets['4.4.4.4'].sendall.assert_not_called()
+
+        # No route, flooded out of all other links
+        packet = BBBPacket('2.2.2.2', '6.6.6.6', BBBPacketType.DATA, message, 1)
+        router1.handle_packet(packet, ('2.2.2.2', 9999))
+        router1.sockets['2.2.2.2'].sendall.assert_not_called()
+        router1.sockets['4.4.4.4'].sendall.assert_called_with(packet.to_bytes())
+        assert router1.metrics.data_forwarded.get('route') == 1
+        assert router1.metrics.data_forwarded.get('flood') == 1
+
+        # Destined for router1
+        packet = BBBPacket('2.2.2.2', '1.1.1.1', BBBPacketType.DATA, message, 2)
+        router1.handle_packet(packet, ('2.2.2.2', 9999))
+        assert router1.metrics.data_delivered.get() == 1
+        assert router1.sockets['3.3.3.3'].sendall.call_count == 2
+
+    def test_unreachable_neighbor(self):
+        router1 = BasicRouter('1.1.1.1', test=True)
+        # Nothing listens on 127.0.77.99, so the connection is refused
+        router1.neighbors.add('127.0.77.99')
+        router1.connect_neighbors()
+        assert '127.0.77.99' not in router1.sockets
+        # Retried on the next route update
+        router1.connect_neighbor = Mock()
+        router1.connect_neighbors()
+        router1.connect_neighbor.assert_called_once_with('127.0.77.99')
+
+    def test_unconnected_neighbor(self):
+        router1 = BasicRouter('1.1.1.1', test=True)
+        # 3.3.3.3 is configured, but not connected yet
+        router1.neighbors.update(['2.2.2.2', '3.3.3.3', '4.4.4.4'])
+        router1.sockets['2.2.2.2'] = Mock()
+        router1.sockets['4.4.4.4'] = Mock()
+
+        packet = BBBPacket('2.2.2.2', '6.6.6.6', BBBPacketType.DATA, 'hi', 0)
+        router1.handle_packet(packet, ('2.2.2.2', 9999))
+        router1.sockets['4.4.4.4'].sendall.assert_called_with(packet.to_bytes())
+        router1.send_flood('6.6.6.6', 'hi')
+        assert router1.sockets['4.4.4.4'].sendall.call_count == 2
+        assert router1.metrics.send_dropped.get('DATA', 'not_connected') == 1
+        assert router1.metrics.send_dropped.get('FLOOD', 'not_connected') == 1
+
     def test_handle_route_update(self):
         router1 = BasicRouter('1.1.1.1', test=True)
         router2 = BasicRouter('2.2.2.2', test=True)
@@ -127,7 +182,9 @@ class TestBasicRouter(unittest.TestCase):
         packet_bytes = packet.to_bytes()
         packet_redux = BBBPacket.from_bytes(packet_bytes)
 
-        assert packet.__dict__ == packet_redux.__dict__
+        for field in ['src', 'dst', 'type', 'payload', 'seq', 'signature',
+                      'scheme']:
+            assert getattr(packet, field) == getattr(packet_redux, field)
 
         h = SHA256.new(packet_bytes)
         h_redux = SHA256.new(packet_redux.to_bytes())
@@ -141,10 +198,14 @@ class TestBasicRouter(unittest.TestCase):
         packet_redux = BBBPacket.from_bytes(packet_bytes)
 
 
-        assert packet.__dict__ == packet_redux.__dict__
+        for field in ['src', 'dst', 'type', 'payload', 'seq', 'signature',
+                      'scheme']:
+            assert getattr(packet, field) == getattr(packet_redux, field)
         router1.keys['2.2.2.2'] = router1.packet_key.publickey()
         assert router1.verify(packet_redux)
         router1.sqn_numbers['2.2.2.2'] = -1
+        # FLOOD packets are deduplicated by the flood cache, reset it too
+        router1.flood_cache.forget('2.2.2.2')
         assert router1.verify(packet)
 
     def test_sqn_numbers(self):
@@ -2,8 +2,10 @@ import sim
 
 from sim.base import BBBPacket, BBBPacketType
 from sim.basic_router import BasicRouter
-from sim.byzantine_routers import FaultyFloodingRouter
+from sim.byzantine_routers import FaultyFloodingRouter, GreedyFloodingRouter
+from sim.signatures import SignatureScheme
 
+import time
 import unittest
 from unittest.mock import Mock
 
@@ -27,3 +29,14 @@ class TestByzantineRouter(unittest.TestCase):
         # Packet should be dropped
         router1.sockets['2.2.2.2'].sendall.assert_not_called()
         router1.sockets['3.3.3.3'].sendall.assert_not_called()
+
+    def test_greedy_flooding_ignores_period(self):
+        router1 = GreedyFloodingRouter('1.1.1.1', test=True,
+                                       scheme=SignatureScheme.ED25519)
+        router1.neighbors.add('2.2.2.2')
+        router1.sockets['2.2.2.2'] = Mock()
+
+        start = time.monotonic()
+        router1.send_hello_flood('3.3.3.3', 3, period=10)
+        assert time.monotonic() - start < 10
+        assert router1.sockets['2.2.2.2'].sendall.call_count == 3
@@ -0,0 +1,113 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.codec import (
+    FrameReader, WireFormat, decode_binary, encode_binary, encode_packet,
+    FRAME_PREFIX, MAX_FRAME_LEN, PACKET_HEADERS
+)
+
+import binascii
+import socket
+
+import unittest
+from unittest.mock import Mock
+
+def fields(packet):
+    """Attributes of packet that are sent on the wire.
+    """
+    return {k: getattr(packet, k) for k in packet.__slots__
+            if not k.startswith('_')}
+
+class TestCodec(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.router = BasicRouter('1.1.1.1', test=True)
+
+    def signed_packet(self, seq, payload='hello world'):
+        packet = BBBPacket('1.1.1.1', '2.2.2.2', BBBPacketType.FLOOD, payload, seq)
+        self.router.sign(packet)
+        return packet
+
+    def test_binary_encoding(self):
+        packet = self.signed_packet(7)
+        frame = encode_binary(packet)
+        packet_redux = decode_binary(frame[FRAME_PREFIX.size:])
+
+        assert fields(packet) == fields(packet_redux)
+        assert packet_redux._signed_bytes == packet.signed_bytes()
+        assert len(frame) < len(packet.to_bytes())
+        self.router.keys['1.1.1.1'] = self.router.packet_key.publickey()
+        assert self.router.verify(packet_redux)
+
+    def test_unsigned_binary_encoding(self):
+        packet = BBBPacket('1.1.1.1', '2.2.2.2', BBBPacketType.MASTERCONFIG, '{}', 0)
+        packet_redux = decode_binary(encode_binary(packet)[FRAME_PREFIX.size:])
+        assert fields(packet) == fields(packet_redux)
+
+    def test_decode_version_2(self):
+        packet = self.signed_packet(3)
+        signature = binascii.a2b_base64(packet.signature)
+        payload = packet.payload.encode()
+        body = PACKET_HEADERS[2].pack(
+            2, packet.type.value, packet.scheme.value, packet.seq,
+            socket.inet_aton(packet.src), socket.inet_aton(packet.dst),
+            len(payload), len(signature),
+        ) + payload + signature
+        packet_redux = decode_binary(body)
+        assert fields(packet) == fields(packet_redux)
+        assert packet_redux.signed_bytes() == packet.signed_bytes()
+
+    def test_large_payload(self):
+        packet = self.signed_packet(0, payload='x' * 10000)
+        packets = list(FrameReader().feed(encode_binary(packet)))
+        assert packets[0].payload == packet.payload
+
+    def test_oversized_json_packet(self):
+        packet = self.signed_packet(0, payload='x' * 1500)
+        with self.assertRaises(ValueError):
+            packet.to_bytes()
+        # Sent as a binary frame instead of desyncing the stream
+        stream = encode_packet(packet, WireFormat.JSON) + \
+            encode_packet(self.signed_packet(1), WireFormat.JSON)
+        reader = FrameReader()
+        assert [p.payload for p in reader.feed(stream)] == [
+            packet.payload, self.signed_packet(1).payload]
+
+    def test_frame_reader_split_and_coalesced(self):
+        packets = [self.signed_packet(seq) for seq in range(4)]
+        stream = b''.join([
+            encode_packet(packets[0], WireFormat.BINARY),
+            encode_packet(packets[1], WireFormat.JSON),
+            encode_packet(packets[2], WireFormat.BINARY),
+            encode_packet(packets[3], WireFormat.JSON),
+        ])
+        reader = FrameReader()
+        decoded = []
+        formats = []
+        # Feed the stream in chunks that never line up with packet boundaries
+        for i in range(0, len(stream), 100):
+            for packet in reader.feed(stream[i:i + 100]):
+                decoded.append(packet)
+                formats.append(reader.wire_format)
+
+        assert [fields(p) for p in decoded] == [fields(p) for p in packets]
+        assert formats == [WireFormat.BINARY, WireFormat.JSON] * 2
+
+    def test_frame_too_large(self):
+        reader = FrameReader()
+        with self.assertRaises(ValueError):
+            list(reader.feed(FRAME_PREFIX.pack(MAX_FRAME_LEN + 1)))
+
+    def test_answer_in_peer_format(self):
+        router = self.router
+        router.sockets['2.2.2.2'] = Mock()
+        packet = self.signed_packet(0)
+
+        router.send_packet('2.2.2.2', packet)
+        router.sockets['2.2.2.2'].sendall.assert_called_with(packet.to_bytes())
+
+        router.peer_formats['2.2.2.2'] = WireFormat.BINARY
+        router.send_packet('2.2.2.2', packet)
+        router.sockets['2.2.2.2'].sendall.assert_called_with(encode_binary(packet))
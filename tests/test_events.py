@@ -0,0 +1,32 @@
+import sim
+
+from sim.events import EventScheduler
+
+import unittest
+
+class TestEvents(unittest.TestCase):
+
+    def test_order_and_clock(self):
+        scheduler = EventScheduler()
+        ran = []
+        scheduler.schedule(2, ran.append, 'b')
+        scheduler.schedule(1, ran.append, 'a')
+        # Same time, runs in the order it was scheduled
+        scheduler.schedule(2, ran.append, 'c')
+        assert scheduler.run(until=1.5) == 1
+        assert ran == ['a']
+        assert scheduler.clock() == 1.5
+
+        # Events scheduled by events run in the same call
+        scheduler.schedule(0, lambda: scheduler.schedule(10, ran.append, 'd'))
+        assert scheduler.run() == 4
+        assert ran == ['a', 'b', 'c', 'd']
+        assert scheduler.now == 11.5
+        assert scheduler.pending() == 0
+
+    def test_past_events_run_now(self):
+        scheduler = EventScheduler(start=5)
+        times = []
+        scheduler.schedule_at(1, lambda: times.append(scheduler.now))
+        scheduler.run()
+        assert times == [5]
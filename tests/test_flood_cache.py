@@ -0,0 +1,95 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.flood_cache import FloodCache
+from sim.signatures import SignatureScheme
+
+import json
+import unittest
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class TestFloodCache(unittest.TestCase):
+
+    def test_duplicates_and_reordering(self):
+        cache = FloodCache(window=8)
+        assert cache.add('1.1.1.1', 5)
+        assert not cache.add('1.1.1.1', 5)
+        # Older sequence numbers inside the window are accepted once
+        assert cache.add('1.1.1.1', 3)
+        assert not cache.check('1.1.1.1', 3)
+        assert cache.check('1.1.1.1', 4)
+        assert cache.add('1.1.1.1', 20)
+        # Sequence numbers older than the window are rejected
+        assert not cache.add('1.1.1.1', 12)
+        assert cache.add('1.1.1.1', 13)
+        assert cache.stats() == {
+            'sources': 1, 'accepted': 4, 'duplicates': 2, 'too_old': 1, 'evicted': 0,
+        }
+
+    def test_large_jump(self):
+        cache = FloodCache(window=8)
+        assert cache.add('1.1.1.1', 5)
+        # Does not allocate a 2**64 bit bitmap
+        assert cache.add('1.1.1.1', 2 ** 64)
+        assert cache.sources['1.1.1.1'][:2] == [2 ** 64, 1]
+        assert not cache.add('1.1.1.1', 2 ** 64)
+        assert not cache.add('1.1.1.1', 5)
+        assert cache.add('1.1.1.1', 2 ** 64 - 7)
+
+    def test_eviction(self):
+        clock = Clock()
+        cache = FloodCache(max_sources=2, ttl=10, clock=clock)
+        cache.add('1.1.1.1', 0)
+        cache.add('2.2.2.2', 0)
+        cache.add('3.3.3.3', 0)
+        assert list(cache.sources) == ['2.2.2.2', '3.3.3.3']
+
+        clock.now = 5
+        cache.add('3.3.3.3', 1)
+        clock.now = 12
+        cache.add('4.4.4.4', 0)
+        assert list(cache.sources) == ['3.3.3.3', '4.4.4.4']
+        assert cache.evicted == 2
+
+    def test_replay_after_eviction(self):
+        clock = Clock()
+        cache = FloodCache(max_sources=1, ttl=10, clock=clock)
+        cache.add('1.1.1.1', 5)
+        cache.add('1.1.1.1', 3)
+        clock.now = 20
+        # 1.1.1.1 expired, its old packets are still rejected
+        cache.add('2.2.2.2', 0)
+        assert '1.1.1.1' not in cache.sources
+        assert not cache.check('1.1.1.1', 4)
+        assert not cache.add('1.1.1.1', 5)
+        assert cache.add('1.1.1.1', 6)
+        assert not cache.add('1.1.1.1', 4)
+        # Evicted least recently seen first
+        assert not cache.add('2.2.2.2', 0)
+        assert cache.add('2.2.2.2', 1)
+        cache.forget('1.1.1.1')
+        assert cache.add('1.1.1.1', 5)
+
+    def test_flood_independent_of_route_updates(self):
+        router1 = BasicRouter('1.1.1.1', test=True, scheme=SignatureScheme.ED25519)
+        router2 = BasicRouter('2.2.2.2', test=True, scheme=SignatureScheme.ED25519)
+        router1.keys['2.2.2.2'] = router2.public_key
+
+        flood = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hi', 0)
+        router2.sign(flood)
+        route = BBBPacket('2.2.2.2', '1.1.1.1', BBBPacketType.ROUTEUPDATE,
+                          json.dumps([]), 1)
+        router2.sign(route)
+
+        # The FLOOD arrives after a later ROUTEUPDATE, but is still accepted
+        assert router1.verify(route)
+        assert router1.verify(flood)
+        assert not router1.verify(flood)
+        assert router1.flood_cache.duplicates == 1
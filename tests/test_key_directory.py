@@ -0,0 +1,138 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.key_directory import KeyDirectory
+from sim.signatures import SCHEMES, SignatureScheme
+
+import json
+import threading
+import unittest
+
+class FakeAssets(object):
+    def __init__(self, bdb):
+        self.bdb = bdb
+
+    def get(self, search):
+        self.bdb.requests.append(search)
+        self.bdb.release.wait()
+        return [
+            {'data': dict(key, ip_address=ip) if isinstance(key, dict)
+                     else {'ip_address': ip, 'public_key': key}}
+            for ip, keys in self.bdb.keys.items() if search in ip
+            for key in (keys if isinstance(keys, list) else [keys])
+        ]
+
+class FakeBigchainDB(object):
+    """Stands in for bigchaindb_driver.BigchainDB, serving key assets from
+    memory. Lookups block until release is set.
+    """
+    def __init__(self):
+        self.keys = {}      # ip: exported public key or asset data, or a
+                            # list of them
+        self.requests = []
+        self.release = threading.Event()
+        self.release.set()
+        self.assets = FakeAssets(self)
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class TestKeyDirectory(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.router = BasicRouter('2.2.2.2', test=True)
+        cls.pem = cls.router.packet_key.publickey().export_key().decode()
+
+    def setUp(self):
+        self.bdb = FakeBigchainDB()
+        for ip in ['2.2.2.2', '3.3.3.3', '4.4.4.4', '22.2.2.2']:
+            self.bdb.keys[ip] = self.pem
+        self.clock = Clock()
+        self.directory = KeyDirectory(self.bdb, ttl=10, maxsize=2, clock=self.clock)
+
+    def test_cache_and_ttl(self):
+        key = self.directory.get('2.2.2.2')
+        assert key == self.router.packet_key.publickey()
+        self.directory.get('2.2.2.2')
+        assert self.bdb.requests == ['2.2.2.2']
+
+        self.clock.now = 10
+        assert self.directory.cached('2.2.2.2') is None
+        self.directory.get('2.2.2.2')
+        assert self.bdb.requests == ['2.2.2.2', '2.2.2.2']
+        assert self.directory.stats() == {'size': 1, 'hits': 1, 'misses': 2, 'fetches': 2}
+
+    def test_lru_eviction(self):
+        self.directory.get('2.2.2.2')
+        self.directory.get('3.3.3.3')
+        self.directory.get('2.2.2.2')
+        self.directory.get('4.4.4.4')
+        assert list(self.directory.cache) == ['2.2.2.2', '4.4.4.4']
+
+    def test_unknown_ip(self):
+        with self.assertRaises(KeyError):
+            self.directory.get('5.5.5.5')
+
+    def test_signature_scheme(self):
+        ed25519 = SCHEMES[SignatureScheme.ED25519]
+        public_key = ed25519.public_key(ed25519.generate())
+        self.bdb.keys['5.5.5.5'] = {
+            'public_key': ed25519.export_public_key(public_key),
+            'signature_scheme': 'ED25519',
+        }
+        assert self.directory.get('5.5.5.5') == public_key
+
+    def test_latest_key_asset(self):
+        ed25519 = SCHEMES[SignatureScheme.ED25519]
+        old, new = (ed25519.public_key(ed25519.generate()) for _ in range(2))
+        assets = [
+            {'public_key': ed25519.export_public_key(key),
+             'signature_scheme': 'ED25519', 'registered_at': registered_at}
+            for key, registered_at in [(old, 1), (new, 2)]
+        ]
+        # Whatever order BigchainDB returns the assets in
+        self.bdb.keys['5.5.5.5'] = assets[::-1]
+        self.bdb.keys['6.6.6.6'] = assets
+        assert self.directory.get('5.5.5.5') == new
+        assert self.directory.get('6.6.6.6') == new
+
+    def test_concurrent_misses_collapse(self):
+        self.bdb.release.clear()
+        keys = []
+        threads = [
+            threading.Thread(target=lambda: keys.append(self.directory.get('3.3.3.3')))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        self.bdb.release.set()
+        for thread in threads:
+            thread.join()
+        assert len(keys) == 5
+        assert self.bdb.requests == ['3.3.3.3']
+
+    def test_masterconfig_prefetch(self):
+        router = self.router
+        router.key_directory = KeyDirectory(self.bdb)
+        config = {
+            'hosts': [],
+            'neighbors': ['3.3.3.3'],
+            'routers': ['2.2.2.2', '3.3.3.3', '4.4.4.4'],
+        }
+        packet = BBBPacket('9.9.9.9', '2.2.2.2', BBBPacketType.MASTERCONFIG,
+                           json.dumps(config), 0)
+        router.handle_masterconfig(packet)
+        router.key_directory.executor.shutdown(wait=True)
+        assert sorted(self.bdb.requests) == ['2.2.2.2', '3.3.3.3', '4.4.4.4']
+
+        # Verification is served from the cache
+        flood = BBBPacket('4.4.4.4', '2.2.2.2', BBBPacketType.FLOOD, 'hi', 0)
+        router.sign(flood)
+        assert router.verify(flood)
+        assert len(self.bdb.requests) == 3
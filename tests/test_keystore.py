@@ -0,0 +1,74 @@
+import sim
+
+from sim.basic_router import BasicRouter
+from sim.keystore import key_path, load_key, load_or_generate
+from sim.signatures import SignatureScheme, get_scheme
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+class TestKeystore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_or_generate(self):
+        for scheme in map(get_scheme, SignatureScheme):
+            assert load_key(self.directory, '1.1.1.1', scheme) is None
+            key = load_or_generate(self.directory, '1.1.1.1', scheme)
+            again = load_or_generate(self.directory, '1.1.1.1', scheme)
+            assert scheme.export_public_key(scheme.public_key(key)) == \
+                scheme.export_public_key(scheme.public_key(again))
+            path = key_path(self.directory, '1.1.1.1', scheme)
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert len(os.listdir(self.directory)) == len(SignatureScheme)
+
+    def test_router_reuses_key(self):
+        routers = [
+            BasicRouter('1.1.1.1', test=True, scheme=SignatureScheme.ED25519,
+                        key_dir=self.directory)
+            for _ in range(2)
+        ]
+        assert bytes(routers[0].public_key) == bytes(routers[1].public_key)
+
+    def test_register_key_is_idempotent(self):
+        router = BasicRouter('1.1.1.1', test=True,
+                             scheme=SignatureScheme.ED25519)
+        router.bdb = Mock()
+        router.bdb_keypair = Mock()
+        data = router.key_asset()
+
+        # Another key of the same ip is registered
+        router.bdb.assets.get.return_value = [
+            {'data': dict(data, public_key='old')}]
+        router.register_key()
+        assert router.bdb.transactions.send.call_count == 1
+        assert router.registered.is_set()
+
+        # The same key is registered
+        router.bdb.assets.get.return_value = [{'data': data}]
+        router.register_key()
+        assert router.bdb.transactions.send.call_count == 1
+
+        # The same key was registered, but another one after it
+        router.bdb.assets.get.return_value = [
+            {'data': dict(data, registered_at=0)},
+            {'data': dict(data, public_key='new')}]
+        router.register_key()
+        assert router.bdb.transactions.send.call_count == 2
+
+    def test_register_key_retries(self):
+        router = BasicRouter('1.1.1.1', test=True,
+                             scheme=SignatureScheme.ED25519)
+        router.bdb = Mock()
+        router.bdb_keypair = Mock()
+        router.bdb.assets.get.side_effect = [ConnectionError(), []]
+        router.register_key(retry=0)
+        assert router.bdb.transactions.send.call_count == 1
@@ -0,0 +1,190 @@
+import sim
+
+from sim.base import ROUTER_PORT
+from sim.codec import FrameReader
+from sim.master import Master
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+class FakeRouter(object):
+    """Listens like a router and records the configs it receives.
+    """
+    def __init__(self, ip):
+        self.configs = []
+        self.connections = []
+        self.socket = socket.socket()
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((ip, ROUTER_PORT))
+        self.socket.listen()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except OSError:
+                return
+            self.connections.append(client)
+            threading.Thread(target=self.read, args=(client,),
+                             daemon=True).start()
+
+    def read(self, client):
+        reader = FrameReader()
+        while True:
+            try:
+                data = client.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            for packet in reader.feed(data):
+                self.configs.append(json.loads(packet.payload))
+
+    def close(self):
+        # shutdown wakes up the thread blocked in accept
+        for s in [self.socket] + self.connections:
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            s.close()
+
+def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+class TestMaster(unittest.TestCase):
+
+    def setUp(self):
+        self.ips = ['127.0.77.{}'.format(i) for i in range(1, 4)]
+        self.routers = {ip: FakeRouter(ip) for ip in self.ips}
+        self.topology = {
+            ip: {'hosts': [], 'neighbors': [n for n in self.ips if n != ip]}
+            for ip in self.ips
+        }
+        fd, self.topo_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.write_topology()
+
+    def tearDown(self):
+        for router in self.routers.values():
+            router.close()
+        os.remove(self.topo_path)
+
+    def write_topology(self):
+        with open(self.topo_path, 'w') as f:
+            json.dump(self.topology, f)
+        # Make sure the modification time changes
+        os.utime(self.topo_path, ns=(time.time_ns(), time.time_ns()))
+
+    def test_push_only_changed(self):
+        master = Master(self.topo_path, test=True)
+        try:
+            stats = master.push()
+            assert stats['pushed'] == 3 and stats['failed'] == 0
+            assert wait_for(lambda: all(
+                len(r.configs) == 1 for r in self.routers.values()))
+            config = self.routers[self.ips[0]].configs[0]
+            assert config['neighbors'] == self.ips[1:]
+            assert sorted(config['routers']) == self.ips
+
+            # Nothing changed
+            assert master.push()['changed'] == 0
+
+            # Hot reload, only the changed router gets its config
+            self.topology[self.ips[1]]['hosts'] = ['172.0.0.1']
+            self.write_topology()
+            assert master.reload()
+            assert not master.reload()
+            stats = master.push()
+            assert stats['changed'] == stats['pushed'] == 1
+            assert wait_for(
+                lambda: len(self.routers[self.ips[1]].configs) == 2)
+            assert self.routers[self.ips[1]].configs[1]['hosts'] == \
+                ['172.0.0.1']
+            # The router list did not change, so it is not sent again
+            assert 'routers' not in self.routers[self.ips[1]].configs[1]
+            # Every config went over the same pooled connection
+            assert len(self.routers[self.ips[1]].connections) == 1
+        finally:
+            master.stop()
+
+    def test_router_list_sent_when_changed(self):
+        master = Master(self.topo_path, full_push_interval=1, test=True)
+        try:
+            first = master.push()
+            # Full pushes do not resend the router list
+            full = master.push()
+            assert full['changed'] == 3 and full['bytes'] < first['bytes']
+            assert wait_for(lambda: all(
+                len(r.configs) == 2 for r in self.routers.values()))
+            assert all('routers' not in r.configs[1]
+                       for r in self.routers.values())
+
+            ip = '127.0.77.4'
+            self.routers[ip] = FakeRouter(ip)
+            self.topology[ip] = {'hosts': [], 'neighbors': []}
+            self.write_topology()
+            master.reload()
+            # Every router gets the new list, although only one config is new
+            assert master.push()['pushed'] == 4
+            assert wait_for(lambda: all(
+                r.configs and sorted(r.configs[-1].get('routers', [])) ==
+                self.ips + [ip] for r in self.routers.values()))
+        finally:
+            master.stop()
+
+    def test_unreachable_router_is_retried(self):
+        down = '127.0.77.9'
+        self.topology[down] = {'hosts': [], 'neighbors': []}
+        self.write_topology()
+        master = Master(self.topo_path, timeout=1, test=True)
+        try:
+            stats = master.push()
+            assert stats['pushed'] == 3 and stats['failed'] == 1
+            assert master.push()['changed'] == 1
+
+            # A router that restarted gets its config again
+            self.routers[self.ips[0]].close()
+            self.routers[self.ips[0]] = FakeRouter(self.ips[0])
+            assert wait_for(lambda: master.push()['pushed'] == 1)
+            assert wait_for(
+                lambda: len(self.routers[self.ips[0]].configs) == 1)
+        finally:
+            master.stop()
+
+    def test_stuck_push_not_repeated(self):
+        master = Master(self.topo_path, workers=1, deadline=0.2, test=True)
+        release = threading.Event()
+        calls = []
+
+        def push_config(host, payload, *args):
+            calls.append(host)
+            release.wait(5)
+            return 0
+
+        master.push_config = push_config
+        try:
+            stats = master.push()
+            # One push is stuck, the ones queued behind it are cancelled
+            assert calls == [self.ips[0]]
+            assert stats['pushed'] == 0 and stats['running'] == 1
+            stats = master.push()
+            # The stuck host is not pushed to twice at the same time
+            assert stats['changed'] == 2 and stats['running'] == 1
+            assert calls == [self.ips[0]]
+            release.set()
+            assert wait_for(lambda: master.push()['running'] == 0)
+            assert calls.count(self.ips[0]) == 2
+        finally:
+            release.set()
+            master.stop()
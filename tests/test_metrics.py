@@ -0,0 +1,90 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.log import configure, get_logger
+from sim.metrics import MetricsServer, Registry
+from sim.signatures import SignatureScheme
+
+import io
+import unittest
+import urllib.request
+from unittest.mock import Mock
+
+class TestMetrics(unittest.TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        packets = registry.counter('packets_total', 'Packets',
+                                   ('type', 'direction'))
+        latency = registry.histogram('latency_seconds', 'Latency',
+                                     buckets=(0.1, 1))
+        registry.gauge('depth', 'Depth', lambda: 3)
+        packets.inc('FLOOD', 'in')
+        packets.inc('FLOOD', 'in')
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        text = registry.render()
+        assert '# TYPE packets_total counter' in text
+        assert 'packets_total{type="FLOOD",direction="in"} 2' in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+        assert 'depth 3' in text
+
+    def test_router_counters(self):
+        router = BasicRouter('1.1.1.1', test=True,
+                             scheme=SignatureScheme.ED25519)
+        sender = BasicRouter('2.2.2.2', test=True,
+                             scheme=SignatureScheme.ED25519)
+        router.handle_packet = Mock()
+        router.sockets['3.3.3.3'] = Mock()
+
+        packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hi', 0)
+        sender.sign(packet)
+        # Unknown key, then accepted, then a duplicate
+        assert not router.receive_packet(packet, ('2.2.2.2', 0))
+        router.keys['2.2.2.2'] = sender.public_key
+        assert router.receive_packet(packet, ('2.2.2.2', 0))
+        assert not router.receive_packet(packet, ('2.2.2.2', 0))
+        router.send_packet('3.3.3.3', packet)
+
+        metrics = router.metrics
+        assert metrics.packets.get('FLOOD', 'in') == 3
+        assert metrics.packets.get('FLOOD', 'out') == 1
+        assert metrics.verify_results.get('no_key') == 1
+        assert metrics.verify_results.get('ok') == 1
+        # The duplicate is dropped before verification
+        assert metrics.verify_results.get('stale') == 0
+        assert metrics.admission_dropped.get('2.2.2.2', 'stale') == 1
+        assert metrics.verify_seconds.count == 1
+        assert sender.metrics.sign_seconds.count == 1
+        samples = metrics.collect()
+        assert samples['bbb_flood_cache_total{result="duplicates"}'] == 1
+
+    def test_http_endpoint(self):
+        registry = Registry()
+        registry.counter('requests_total', 'Requests').inc()
+        server = MetricsServer(registry, '127.0.0.1', 0).start()
+        try:
+            port = server.server.server_address[1]
+            with urllib.request.urlopen(
+                    'http://127.0.0.1:{}/metrics'.format(port)) as response:
+                assert 'requests_total 1' in response.read().decode()
+        finally:
+            server.stop()
+
+    def test_structured_log(self):
+        stream = io.StringIO()
+        configure('info', stream)
+        log = get_logger('sim.test')
+        log.debug('hidden')
+        log.info('flood delivered', src='1.1.1.1', payload='hello world')
+        configure('warning', io.StringIO())
+        line = stream.getvalue().strip()
+        assert '\n' not in line
+        assert 'level=info logger=sim.test msg="flood delivered"' in line
+        assert 'src=1.1.1.1 payload="hello world"' in line
@@ -0,0 +1,167 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType, PACKET_LEN
+from sim.basic_router import BasicRouter
+from sim.codec import WireFormat, decode_binary
+from sim.routing import RouteTable, broadcast_update, neighbor_update
+from sim.signatures import SignatureScheme
+
+import json
+import time
+import unittest
+from unittest.mock import Mock
+
+def sent_payloads(router, neighbor):
+    """Decodes the ROUTEUPDATE payloads written to neighbor's Mock socket,
+    as neighbor applies them.
+    """
+    return [
+        neighbor_update(
+            json.loads(decode_binary(call[0][0][4:]).payload), neighbor)
+        for call in router.sockets[neighbor].sendall.call_args_list
+    ]
+
+class TestRouting(unittest.TestCase):
+
+    def make_router(self, **kwargs):
+        router = BasicRouter('1.1.1.1', test=True,
+                             wire_format=WireFormat.BINARY,
+                             scheme=SignatureScheme.ED25519, **kwargs)
+        for neighbor in ['2.2.2.2', '3.3.3.3']:
+            router.neighbors.add(neighbor)
+            router.sockets[neighbor] = Mock()
+            router.routes[neighbor] = neighbor
+        return router
+
+    def test_route_table_changes(self):
+        routes = RouteTable()
+        routes['3.3.3.3'] = '2.2.2.2'
+        routes['4.4.4.4'] = '2.2.2.2'
+        assert routes.pop_changes() == {'3.3.3.3', '4.4.4.4'}
+        # Same next hop is not a change
+        routes['3.3.3.3'] = '2.2.2.2'
+        assert routes.pop_changes() == set()
+        routes['3.3.3.3'] = '5.5.5.5'
+        del routes['4.4.4.4']
+        routes.pop('6.6.6.6', None)
+        assert routes.pop_changes() == {'3.3.3.3', '4.4.4.4'}
+
+    def test_broadcast_update_split_horizon(self):
+        # 7.7.7.7 is an attached host
+        routes = {'2.2.2.2': '2.2.2.2', '3.3.3.3': '2.2.2.2',
+                  '4.4.4.4': '5.5.5.5', '7.7.7.7': None}
+        full = broadcast_update(routes, ['2.2.2.2', '5.5.5.5'])
+        assert neighbor_update(full, '2.2.2.2') == ['4.4.4.4', '7.7.7.7']
+        assert neighbor_update(full, '5.5.5.5') == [
+            '2.2.2.2', '3.3.3.3', '7.7.7.7']
+
+        delta = broadcast_update(routes, ['2.2.2.2', '5.5.5.5'],
+                                 ['3.3.3.3', '4.4.4.4', '6.6.6.6', '7.7.7.7'])
+        # 3.3.3.3 is reached through the neighbor itself
+        assert neighbor_update(delta, '2.2.2.2') == {
+            'add': ['4.4.4.4', '7.7.7.7'], 'withdraw': ['6.6.6.6', '3.3.3.3']}
+        assert neighbor_update(delta, '5.5.5.5') == {
+            'add': ['3.3.3.3', '7.7.7.7'], 'withdraw': ['6.6.6.6', '4.4.4.4']}
+        # Updates that are not broadcast are applied as they are
+        assert neighbor_update(['3.3.3.3'], '2.2.2.2') == ['3.3.3.3']
+
+    def test_broadcast_update_fits_json_packet(self):
+        router = BasicRouter('1.1.1.1', test=True)
+        routes = {'10.0.{}.1'.format(i): '10.0.0.{}'.format(i % 4)
+                  for i in range(16)}
+        update = broadcast_update(routes, ['10.0.0.1'])
+        # Destinations are listed once, via refers to them by index
+        assert [update['routes'][i] for i in update['via']['10.0.0.1']] == [
+            '10.0.1.1', '10.0.13.1', '10.0.5.1', '10.0.9.1']
+        packet = BBBPacket('1.1.1.1', '255.255.255.255',
+                           BBBPacketType.ROUTEUPDATE,
+                           json.dumps(update, sort_keys=True), 1)
+        router.sign(packet)
+        assert len(packet.to_bytes()) == PACKET_LEN
+
+    def test_send_route_updates_deltas(self):
+        router = self.make_router(full_sync_interval=3)
+        router.routes['4.4.4.4'] = '2.2.2.2'
+
+        router.send_route_updates()
+        assert sent_payloads(router, '2.2.2.2') == [['3.3.3.3']]
+        assert sent_payloads(router, '3.3.3.3') == [['2.2.2.2', '4.4.4.4']]
+        # Signed once for both neighbors
+        assert router.metrics.sign_seconds.count == 1
+
+        # Nothing changed, nothing is sent
+        router.send_route_updates()
+        assert router.sockets['3.3.3.3'].sendall.call_count == 1
+
+        router.routes['5.5.5.5'] = '3.3.3.3'
+        del router.routes['4.4.4.4']
+        router.send_route_updates()
+        assert sent_payloads(router, '2.2.2.2')[-1] == {
+            'add': ['5.5.5.5'], 'withdraw': ['4.4.4.4']}
+        assert sent_payloads(router, '3.3.3.3')[-1] == {
+            'add': [], 'withdraw': ['4.4.4.4', '5.5.5.5']}
+        assert router.metrics.sign_seconds.count == 2
+
+        # A new neighbor gets the full table, the others the delta
+        router.neighbors.add('6.6.6.6')
+        router.sockets['6.6.6.6'] = Mock()
+        router.routes['6.6.6.6'] = '6.6.6.6'
+        router.send_route_updates(periodic=False)
+        assert sent_payloads(router, '6.6.6.6') == [
+            ['2.2.2.2', '3.3.3.3', '5.5.5.5']]
+        assert sent_payloads(router, '2.2.2.2')[-1] == {
+            'add': ['6.6.6.6'], 'withdraw': []}
+        assert router.metrics.sign_seconds.count == 4
+
+        # Full sync
+        router.send_route_updates()
+        assert sent_payloads(router, '2.2.2.2')[-1] == [
+            '3.3.3.3', '5.5.5.5', '6.6.6.6']
+        assert router.metrics.sign_seconds.count == 5
+
+    def test_reconnected_neighbor_resynced(self):
+        router = self.make_router()
+        router.routes['4.4.4.4'] = '2.2.2.2'
+        router.send_route_updates()
+        assert '3.3.3.3' in router.synced
+
+        # 3.3.3.3 restarts between two cycles
+        old_socket = router.sockets['3.3.3.3']
+        router.register_socket('3.3.3.3', Mock())
+        router.unregister_socket('3.3.3.3', old_socket)
+        router.routes['8.8.8.8'] = '2.2.2.2'
+        router.send_route_updates()
+        # The new socket is written to by its SendQueue
+        deadline = time.time() + 5
+        while not router.sockets['3.3.3.3'].sendall.called and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        assert sent_payloads(router, '3.3.3.3') == [
+            ['2.2.2.2', '4.4.4.4', '8.8.8.8']]
+        # The neighbor that stayed connected only gets the delta
+        assert sent_payloads(router, '2.2.2.2')[-1] == {
+            'add': [], 'withdraw': ['8.8.8.8']}
+        router.unregister_socket('3.3.3.3', router.sockets['3.3.3.3'])
+        assert '3.3.3.3' not in router.synced
+
+    def test_handle_route_update_delta(self):
+        router1 = BasicRouter('1.1.1.1', test=True)
+        router1.routes['3.3.3.3'] = '2.2.2.2'
+        router1.routes['4.4.4.4'] = '5.5.5.5'
+
+        delta = BBBPacket('2.2.2.2', '1.1.1.1', BBBPacketType.ROUTEUPDATE,
+                          json.dumps({'add': ['6.6.6.6'],
+                                      'withdraw': ['3.3.3.3', '4.4.4.4']}), 0)
+        router1.handle_routeupdate(delta)
+        assert router1.routes['6.6.6.6'] == '2.2.2.2'
+        assert '3.3.3.3' not in router1.routes
+        # Not reached through the sender, so it is kept
+        assert router1.routes['4.4.4.4'] == '5.5.5.5'
+
+        # A full list replaces all routes through the sender
+        full = BBBPacket('2.2.2.2', '1.1.1.1', BBBPacketType.ROUTEUPDATE,
+                         json.dumps(['7.7.7.7']), 1)
+        router1.handle_routeupdate(full)
+        assert '6.6.6.6' not in router1.routes
+        assert router1.routes['7.7.7.7'] == '2.2.2.2'
+        assert router1.routes['2.2.2.2'] == '2.2.2.2'
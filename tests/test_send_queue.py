@@ -0,0 +1,139 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.send_queue import BackpressurePolicy, FairSendQueue, SendQueue
+
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+class BlockedSocket(object):
+    """Socket whose sendall blocks until released.
+    """
+    def __init__(self):
+        self.release = threading.Event()
+        self.sent = []
+
+    def sendall(self, data):
+        self.release.wait()
+        self.sent.append(data)
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+class TestSendQueue(unittest.TestCase):
+
+    def test_drop_newest(self):
+        queue = SendQueue(Mock(), maxlen=2, policy=BackpressurePolicy.DROP_NEWEST)
+        assert queue.put(b'1')
+        assert queue.put(b'2')
+        assert not queue.put(b'3')
+        assert list(queue.queue) == [b'1', b'2']
+        assert queue.stats() == {'depth': 2, 'max_depth': 2, 'sent': 0, 'dropped': 1}
+
+    def test_drop_oldest(self):
+        queue = SendQueue(Mock(), maxlen=2, policy=BackpressurePolicy.DROP_OLDEST)
+        for data in [b'1', b'2', b'3']:
+            assert queue.put(data)
+        assert list(queue.queue) == [b'2', b'3']
+        assert queue.dropped == 1
+
+    def test_fair_queue_reserves_per_source(self):
+        queue = FairSendQueue(Mock(), maxlen=2, quantum=2,
+                              policy=BackpressurePolicy.DROP_NEWEST)
+        for data in [b'g1', b'g2', b'g3', b'g4']:
+            queue.put(data, 'greedy')
+        # The greedy source only fills its own buffer
+        assert queue.put(b'h1', 'honest')
+        assert queue.stats() == {'depth': 3, 'max_depth': 3, 'sent': 0,
+                                 'dropped': 2, 'sources': 2}
+        assert [queue.pop() for _ in range(3)] == [b'g1', b'h1', b'g2']
+        assert queue.depth() == 0
+
+    def test_fair_queue_deficit_round_robin(self):
+        queue = FairSendQueue(Mock(), quantum=4)
+        for _ in range(4):
+            queue.put(b'aaaa', 'big')
+            queue.put(b'b', 'small')
+        queue.put(b'b', 'small')
+        # Sources get an equal number of bytes per round, not of packets
+        assert b''.join(queue.pop() for _ in range(9)) == \
+            b'aaaabbbbaaaabaaaaaaaa'
+
+    def test_block(self):
+        sock = BlockedSocket()
+        queue = SendQueue(sock, maxlen=1, policy=BackpressurePolicy.BLOCK).start()
+        queue.put(b'1')
+        # Writer is stuck sending b'1', so b'3' has to wait for b'2'
+        assert wait_until(lambda: queue.depth() == 0)
+        queue.put(b'2')
+        putter = threading.Thread(target=queue.put, args=(b'3',))
+        putter.start()
+        putter.join(0.1)
+        assert putter.is_alive()
+
+        sock.release.set()
+        putter.join(5)
+        assert wait_until(lambda: sock.sent == [b'1', b'2', b'3'])
+        assert queue.dropped == 0
+
+    def test_slow_neighbor_does_not_block_flooding(self):
+        router1 = BasicRouter('1.1.1.1', test=True,
+                              backpressure=BackpressurePolicy.DROP_NEWEST,
+                              send_queue_len=4)
+        router1.neighbors.update(['2.2.2.2', '3.3.3.3', '4.4.4.4'])
+        slow_socket = BlockedSocket()
+        fast_socket = Mock()
+        router1.register_socket('3.3.3.3', slow_socket)
+        router1.register_socket('4.4.4.4', fast_socket)
+        router1.send_queues['4.4.4.4'].maxlen = 100
+
+        slow_queue = router1.send_queues['3.3.3.3']
+        for seq in range(10):
+            packet = BBBPacket('2.2.2.2', '5.5.5.5', BBBPacketType.FLOOD, 'hi', seq)
+            router1.handle_flood(packet, ('2.2.2.2', 9999))
+            if seq == 0:
+                assert wait_until(lambda: slow_queue.depth() == 0)
+
+        assert wait_until(lambda: fast_socket.sendall.call_count == 10)
+        # One packet is stuck in sendall, four are queued, the rest dropped
+        assert slow_queue.depth() == 4
+        assert slow_queue.dropped == 5
+
+        slow_socket.release.set()
+        assert wait_until(lambda: len(slow_socket.sent) == 5)
+        router1.unregister_socket('3.3.3.3', slow_socket)
+        assert slow_queue.closed
+        assert '3.3.3.3' not in router1.sockets
+
+    def test_full_source_does_not_block_forwarding(self):
+        router1 = BasicRouter('1.1.1.1', test=True, send_queue_len=2)
+        router1.neighbors.update(['2.2.2.2', '3.3.3.3'])
+        slow_socket = BlockedSocket()
+        router1.register_socket('3.3.3.3', slow_socket)
+
+        def forward():
+            # A greedy source overflows its buffer, then an honest packet
+            # arrives on the same link
+            for seq in range(10):
+                packet = BBBPacket('2.2.2.2', '5.5.5.5', BBBPacketType.FLOOD,
+                                   'hi', seq)
+                router1.handle_flood(packet, ('2.2.2.2', 9999))
+            packet = BBBPacket('6.6.6.6', '5.5.5.5', BBBPacketType.FLOOD,
+                               'hi', 0)
+            router1.handle_flood(packet, ('2.2.2.2', 9999))
+
+        client = threading.Thread(target=forward)
+        client.start()
+        client.join(5)
+        assert not client.is_alive()
+        queue = router1.send_queues['3.3.3.3']
+        assert queue.policy == BackpressurePolicy.DROP_NEWEST
+        assert queue.stats()['sources'] == 2
+        slow_socket.release.set()
+        router1.unregister_socket('3.3.3.3', slow_socket)
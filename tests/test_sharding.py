@@ -0,0 +1,40 @@
+import sim
+
+from sim.sharding import ShardedNetwork, partition
+from sim.simulator import load_topology
+
+import unittest
+
+class TestSharding(unittest.TestCase):
+
+    def test_partition(self):
+        topology = load_topology('basic-byzantine.json')
+        shards = partition(topology, 2)
+        assert len(shards) == 2
+        assert set().union(*shards) == set(topology)
+        assert sum(len(s) for s in shards) == len(topology)
+        # Breadth first from the lowest ip keeps its neighbors together
+        assert {'169.229.226.101', '169.229.226.102'} <= shards[0]
+
+    def test_sharded_matches_single_shard(self):
+        results = []
+        for workers in [1, 2]:
+            network = ShardedNetwork(load_topology('basic-byzantine.json'),
+                                     workers=workers, latency=0.01)
+            try:
+                network.start_timers()
+                network.schedule_floods(20, 0, 100)
+                network.run(120)
+                results.append(network.stats())
+            finally:
+                network.close()
+        single, sharded = results
+        assert sharded['shards'] == 2
+        assert sharded['routers'] == single['routers'] == 5
+        # Every FLOOD reaches its destination through the other shard too
+        assert sharded['delivered'] == single['delivered'] > 0
+        assert sharded['time'] == 120
+
+    def test_needs_latency(self):
+        with self.assertRaises(ValueError):
+            ShardedNetwork(load_topology('simple.json'), workers=2)
@@ -0,0 +1,62 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.codec import FRAME_PREFIX, decode_binary, encode_binary
+from sim.signatures import SCHEMES, SignatureScheme
+
+import binascii
+import unittest
+
+class TestSignatureSchemes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rsa_router = BasicRouter('1.1.1.1', test=True)
+        cls.ed_router = BasicRouter('2.2.2.2', test=True,
+                                    scheme=SignatureScheme.ED25519)
+
+    def test_sign_verify(self):
+        for scheme in SCHEMES.values():
+            key = scheme.generate()
+            signature = scheme.sign(key, b'hello world')
+            scheme.verify(scheme.public_key(key), b'hello world', signature)
+            with self.assertRaises(ValueError):
+                scheme.verify(scheme.public_key(key), b'hello w0rld', signature)
+
+    def test_export_import(self):
+        for scheme in SCHEMES.values():
+            key = scheme.generate()
+            exported = scheme.export_public_key(scheme.public_key(key))
+            imported = scheme.import_public_key(exported)
+            scheme.verify(imported, b'hello world', scheme.sign(key, b'hello world'))
+
+    def test_mixed_scheme_traffic(self):
+        router1 = BasicRouter('3.3.3.3', test=True, scheme=SignatureScheme.ED25519)
+        router1.keys['1.1.1.1'] = self.rsa_router.public_key
+        router1.keys['2.2.2.2'] = self.ed_router.public_key
+
+        rsa_packet = BBBPacket('1.1.1.1', '3.3.3.3', BBBPacketType.FLOOD, 'hello', 0)
+        self.rsa_router.sign(rsa_packet)
+        ed_packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hello', 0)
+        self.ed_router.sign(ed_packet)
+
+        assert rsa_packet.scheme == SignatureScheme.RSA_PSS
+        assert ed_packet.scheme == SignatureScheme.ED25519
+        assert router1.verify(BBBPacket.from_bytes(rsa_packet.to_bytes()))
+        assert router1.verify(decode_binary(encode_binary(ed_packet)[FRAME_PREFIX.size:]))
+
+    def test_scheme_is_signed(self):
+        router1 = BasicRouter('3.3.3.3', test=True, scheme=SignatureScheme.ED25519)
+        router1.keys['2.2.2.2'] = self.ed_router.public_key
+        packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hello', 0)
+        self.ed_router.sign(packet)
+        packet.scheme = SignatureScheme.RSA_PSS
+        assert not router1.verify(packet)
+        # An HMAC keyed with a public key of another scheme is no signature
+        packet.scheme = SignatureScheme.HMAC
+        packet.signature = None
+        hmac = SCHEMES[SignatureScheme.HMAC]
+        packet.signature = binascii.b2a_base64(hmac.sign(
+            bytes(self.ed_router.public_key), packet.signed_bytes())).decode()
+        assert not router1.verify(packet)
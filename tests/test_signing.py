@@ -0,0 +1,52 @@
+import sim
+
+from sim.basic_router import BasicRouter
+from sim.codec import FrameReader, WireFormat
+from sim.signatures import SignatureScheme
+
+import unittest
+from unittest.mock import Mock
+
+class TestSigningPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.router1 = BasicRouter('1.1.1.1', test=True,
+                                   wire_format=WireFormat.BINARY,
+                                   scheme=SignatureScheme.ED25519,
+                                   sign_workers=2)
+        self.router1.signing.batch_size = 8
+        for neighbor in ['2.2.2.2', '3.3.3.3']:
+            self.router1.neighbors.add(neighbor)
+            self.router1.sockets[neighbor] = Mock()
+
+    def tearDown(self):
+        self.router1.signing.executor.shutdown()
+
+    def sent_packets(self, neighbor):
+        reader = FrameReader()
+        return [
+            packet
+            for call in self.router1.sockets[neighbor].sendall.call_args_list
+            for packet in reader.feed(call[0][0])
+        ]
+
+    def test_flood_signed_ahead(self):
+        rate = self.router1.send_hello_flood('4.4.4.4', 20, period=0)
+        assert rate > 0
+        assert self.router1.signing.stats()['batches'] == 3
+        assert self.router1.metrics.sign_seconds.count == 20
+
+        router2 = BasicRouter('2.2.2.2', test=True)
+        router2.keys['1.1.1.1'] = self.router1.public_key
+        for neighbor in ['2.2.2.2', '3.3.3.3']:
+            packets = self.sent_packets(neighbor)
+            # Sent in sequence order, each signed once for both neighbors
+            assert [p.seq for p in packets] == list(range(20))
+            assert [p.payload for p in packets] == [
+                'hello-{}'.format(i) for i in range(20)]
+        assert all(router2.verify(p) for p in self.sent_packets('2.2.2.2'))
+
+    def test_period_signs_inline(self):
+        self.router1.send_hello_flood('4.4.4.4', 2, period=0.01)
+        assert self.router1.signing.stats()['batches'] == 0
+        assert len(self.sent_packets('3.3.3.3')) == 2
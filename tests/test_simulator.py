@@ -0,0 +1,128 @@
+import sim
+
+from sim.byzantine_routers import FaultyFloodingRouter
+from sim.signatures import SignatureScheme
+from sim.simulator import Network, load_topology
+from sim.topology import address, generate
+
+import unittest
+
+class TestSimulator(unittest.TestCase):
+
+    def test_simple_topology(self):
+        network = Network(load_topology('simple.json'))
+        network.converge()
+        ips = sorted(network.routers)
+        for router in network.routers.values():
+            # Every router has learned a route to every other router
+            assert set(router.routes) >= set(ips) - {router.ip_address}
+
+        network.flood(ips[0], ips[-1], 'hello')
+        stats = network.stats()
+        # One FLOOD is originated and delivered once, whatever the number of
+        # neighbors of the source
+        assert stats['delivered'] == 1
+        assert stats['rejected'] == 0
+        assert stats['max_hops'] >= 1
+
+    def test_hmac_scheme(self):
+        results = []
+        for scheme in [SignatureScheme.ED25519, SignatureScheme.HMAC]:
+            network = Network(generate('grid', 16), scheme=scheme)
+            network.converge()
+            network.flood(address(0), address(15), 'hello')
+            stats = network.stats()
+            results.append((stats['delivered'], stats['rejected'],
+                            stats['frames']))
+        # The protocol runs the same, only the signatures are cheaper
+        assert results[0] == results[1]
+        assert results[1][0] == 1
+
+    def test_unicast(self):
+        network = Network(generate('grid', 16))
+        network.converge()
+        src, dst = address(0), address(15)
+        frames = network.stats()['frames']
+        network.send_data(src, dst, 'hello')
+        network.run()
+        stats = network.stats()
+        assert stats['delivered'] == 1
+        # One frame per hop of the route, between opposite corners
+        assert stats['max_hops'] == 6
+        assert stats['frames'] - frames == 6
+
+        # A FLOOD crosses every link
+        network.flood(src, dst, 'hello')
+        assert network.stats()['frames'] - stats['frames'] > 20
+
+    def test_byzantine_router(self):
+        topology = load_topology('basic-byzantine.json')
+        # Only path from 169.229.226.120 to 169.229.226.115 that does not
+        # go through 169.229.226.114 is through 169.229.226.102
+        topology['169.229.226.114']['router'] = 'FaultyFloodingRouter'
+        network = Network(topology)
+        assert isinstance(network.routers['169.229.226.114'],
+                          FaultyFloodingRouter)
+        network.converge()
+        network.flood('169.229.226.120', '169.229.226.115', 'hello')
+        stats = network.stats()
+        # The copy sent through the faulty router is lost
+        assert stats['delivered'] == 1
+        assert stats['max_hops'] == 2
+
+    def test_duplicate_floods_rejected(self):
+        # Triangle of 10.0.0.0-2, with 10.0.0.3 attached to 10.0.0.2
+        topology = {
+            '10.0.0.0': {'hosts': [], 'neighbors': ['10.0.0.1', '10.0.0.2']},
+            '10.0.0.1': {'hosts': [], 'neighbors': ['10.0.0.0', '10.0.0.2']},
+            '10.0.0.2': {'hosts': [],
+                         'neighbors': ['10.0.0.0', '10.0.0.1', '10.0.0.3']},
+            '10.0.0.3': {'hosts': [], 'neighbors': ['10.0.0.2']},
+        }
+        network = Network(topology)
+        network.converge()
+        network.flood('10.0.0.0', '10.0.0.3', 'hello')
+        stats = network.stats()
+        # The copy going 10.0.0.0-2-3 is delivered first
+        assert stats['delivered'] == 1
+        assert stats['max_hops'] == 2
+        # Copies that went around the triangle, and the one going
+        # 10.0.0.0-1-2-3, are rejected as duplicates
+        assert stats['rejected'] > 0
+
+    def test_virtual_time(self):
+        topology = load_topology('basic-byzantine.json')
+        topology['169.229.226.120']['latencies'] = {'169.229.226.102': 5}
+        network = Network(topology, latency=0.01, route_update_period=30,
+                          hold_down=1)
+        network.start_timers()
+        # An hour of protocol time
+        network.run(until=3600)
+        assert network.now() == 3600
+        converged = network.convergence_time(0)
+        assert converged is not None and converged < 30
+        # Only periodic full syncs are sent once routes converged
+        router = network.routers['169.229.226.114']
+        assert router.route_timer.periodic >= 3600 // 31
+
+        network.schedule_floods('169.229.226.120', '169.229.226.115', 3)
+        network.run(until=3700)
+        stats = network.stats()
+        assert stats['delivered'] == 3
+        # The copies that wait 5 seconds on the slow link arrive too late
+        assert stats['avg_latency'] < 1
+
+    def test_deterministic(self):
+        def run(seed):
+            network = Network(load_topology('acid-arsenic-asteroid.json'),
+                              latency=0.01, latency_jitter=0.5, seed=seed)
+            network.start_timers()
+            network.schedule_floods(sorted(network.routers)[0],
+                                    sorted(network.routers)[-1], 5)
+            network.run(until=600)
+            stats = network.stats()
+            del stats['elapsed'], stats['frames_per_sec']
+            return stats
+
+        assert run(1) == run(1)
+        assert run(1)['avg_latency'] != run(2)['avg_latency']
@@ -0,0 +1,85 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.routing import RouteTable
+from sim.timers import UpdateTimer, convergence_time
+
+import json
+import random
+import unittest
+from unittest.mock import Mock
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class TestTimers(unittest.TestCase):
+
+    def test_periodic_and_triggered(self):
+        clock = Clock()
+        timer = UpdateTimer(period=30, hold_down=2, jitter=0, clock=clock)
+        assert timer.deadline() == (30, True)
+
+        clock.now = 1
+        timer.trigger()
+        # Held down until 2 seconds after the last update
+        assert timer.deadline() == (2, False)
+        clock.now = 5
+        assert timer.timeout() == (0, False)
+        assert not timer.wait()
+        timer.sent(False)
+        assert timer.stats()['advertise_delay_max'] == 4
+
+        # A trigger right after an update waits for the hold down
+        timer.trigger()
+        assert timer.deadline() == (7, False)
+        clock.now = 7
+        timer.sent(False)
+        # Periodic updates keep their own schedule
+        assert timer.deadline() == (30, True)
+        clock.now = 30
+        assert timer.wait()
+        timer.sent(True)
+        assert timer.deadline() == (60, True)
+        assert timer.stats()['triggered'] == 2
+        assert timer.stats()['periodic'] == 1
+
+    def test_jitter(self):
+        clock = Clock()
+        timer = UpdateTimer(period=30, hold_down=0, jitter=1, clock=clock,
+                            rng=random.Random(0))
+        deadline, _ = timer.deadline()
+        assert 30 <= deadline <= 31
+        timer.trigger()
+        deadline, _ = timer.deadline()
+        assert 0 <= deadline <= 1
+
+    def test_route_changes_trigger_updates(self):
+        router1 = BasicRouter('1.1.1.1', test=True)
+        router1.routes.pop_changes()
+        packet = BBBPacket('2.2.2.2', '1.1.1.1', BBBPacketType.ROUTEUPDATE,
+                           json.dumps(['3.3.3.3']), 0)
+        router1.handle_routeupdate(packet)
+        assert router1.route_timer.triggered_at is not None
+
+        router1.route_timer.sent(False)
+        router1.routes.pop_changes()
+        # The same routes again do not change the table
+        packet.seq = 1
+        router1.handle_routeupdate(packet)
+        assert router1.route_timer.triggered_at is None
+
+    def test_convergence_time(self):
+        clock = Clock()
+        routers = [Mock(routes=RouteTable(clock=clock)) for _ in range(3)]
+        clock.now = 10
+        routers[0].routes['2.2.2.2'] = '2.2.2.2'
+        assert convergence_time(routers, 10) == 0
+        clock.now = 12.5
+        routers[2].routes['2.2.2.2'] = '3.3.3.3'
+        assert convergence_time(routers, 10) == 2.5
+        assert convergence_time(routers, 20) is None
@@ -0,0 +1,86 @@
+import sim
+
+from sim.simulator import Network
+from sim.topology import FAMILIES, generate
+
+import unittest
+from collections import deque
+
+def connected(topology):
+    root = next(iter(topology))
+    seen = {root}
+    queue = deque([root])
+    while queue:
+        for n in topology[queue.popleft()]['neighbors']:
+            if n not in seen:
+                seen.add(n)
+                queue.append(n)
+    return len(seen) == len(topology)
+
+class TestTopology(unittest.TestCase):
+
+    def test_families(self):
+        for family in list(FAMILIES) + ['fat-tree']:
+            topology = generate(family, 40, degree=4, hosts=12)
+            for ip, config in topology.items():
+                assert ip not in config['neighbors']
+                for neighbor in config['neighbors']:
+                    assert ip in topology[neighbor]['neighbors']
+            assert connected(topology), family
+            assert sum(len(c['hosts']) for c in topology.values()) == 12
+
+    def test_sizes_and_degrees(self):
+        assert len(generate('ring', 10)) == 10
+        assert len(generate('grid', 40)) == 36
+        regular = generate('random-regular', 20, degree=3)
+        assert all(len(c['neighbors']) == 3 for c in regular.values())
+        # Smallest fat-tree of at least 10 switches is the 4-ary one
+        fat_tree = generate('fat-tree', 10, hosts=16)
+        assert len(fat_tree) == 20
+        # Hosts only hang off the edge switches, 2 per switch
+        assert sorted(len(c['hosts']) for c in fat_tree.values()) == \
+            [0] * 12 + [2] * 8
+
+    def test_dense_random_regular(self):
+        for degree in (6, 8, 16):
+            topology = generate('random-regular', 200, degree=degree)
+            assert all(len(c['neighbors']) == degree
+                       for c in topology.values())
+            assert all(len(set(c['neighbors'])) == degree
+                       for c in topology.values())
+
+    def test_small_scale_free(self):
+        # Fewer routers than links per new router, the graph is complete
+        topology = generate('scale-free', 3, degree=8)
+        assert all(len(c['neighbors']) == 2 for c in topology.values())
+        assert len(generate('scale-free', 1, degree=8)) == 1
+
+    def test_byzantine_placement(self):
+        topology = generate('scale-free', 50, byzantine=0.1,
+                            placement='degree')
+        faulty = [ip for ip, c in topology.items() if 'router' in c]
+        assert len(faulty) == 5
+        lowest = min(len(topology[ip]['neighbors']) for ip in faulty)
+        honest = [len(c['neighbors']) for c in topology.values()
+                  if 'router' not in c]
+        assert lowest >= max(honest)
+
+        clustered = generate('grid', 49, byzantine=0.1,
+                             placement='clustered', seed=3)
+        faulty = {ip for ip, c in clustered.items() if 'router' in c}
+        # A breadth first neighborhood is connected
+        assert connected({ip: {'neighbors': [n for n in
+                         clustered[ip]['neighbors'] if n in faulty]}
+                          for ip in faulty})
+
+    def test_seeded(self):
+        assert generate('erdos-renyi', 30, seed=1) == \
+            generate('erdos-renyi', 30, seed=1)
+        assert generate('erdos-renyi', 30, seed=1) != \
+            generate('erdos-renyi', 30, seed=2)
+
+    def test_simulates(self):
+        network = Network(generate('ring', 6, byzantine=0.2))
+        network.converge()
+        network.flood('10.0.0.0', '10.0.0.3', 'hello')
+        assert network.stats()['delivered'] >= 1
@@ -0,0 +1,82 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.signatures import SignatureScheme
+from sim.tracing import ProfileMode, Profiler, Tracer
+
+import os
+import pstats
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.router = BasicRouter('1.1.1.1', test=True,
+                                  scheme=SignatureScheme.ED25519)
+        self.sender = BasicRouter('2.2.2.2', test=True,
+                                  scheme=SignatureScheme.ED25519)
+        self.router.keys['2.2.2.2'] = self.sender.public_key
+        self.router.neighbors = {'2.2.2.2', '3.3.3.3'}
+        self.router.sockets['3.3.3.3'] = Mock()
+
+    def flood(self, seq):
+        packet = BBBPacket('2.2.2.2', '4.4.4.4', BBBPacketType.FLOOD, 'hi', seq)
+        self.sender.sign(packet)
+        return packet
+
+    def test_sampling(self):
+        tracer = Tracer(0.25)
+        assert [tracer.sample() for _ in range(8)] == [
+            False, False, False, True] * 2
+        assert not any(Tracer(0).sample() for _ in range(8))
+
+    def test_stages(self):
+        self.router.tracer.set_rate(1)
+        for seq in range(10):
+            packet = self.flood(seq)
+            self.router.tracer.start(packet, time.perf_counter())
+            assert self.router.receive_packet(packet, ('2.2.2.2', 0))
+            assert packet._trace is None
+        # Replayed packet
+        packet = self.flood(0)
+        self.router.tracer.start(packet, time.perf_counter())
+        assert not self.router.receive_packet(packet, ('2.2.2.2', 0))
+
+        report = self.router.tracer.report()
+        assert self.router.tracer.traced == 11
+        for stage in ['verify.check', 'verify.key', 'verify.serialize',
+                      'verify.signature', 'verify.sqn', 'handle', 'encode',
+                      'send']:
+            assert report[stage]['count'] == 10, stage
+        assert report['decode']['count'] == report['total']['count'] == 11
+        assert report['rejected']['count'] == 1
+        assert report['total']['p50'] <= report['total']['max']
+        assert 'verify.signature' in self.router.tracer.format_report()
+
+    def test_cprofile(self):
+        path = os.path.join(tempfile.mkdtemp(), 'router.prof')
+        self.router.handle_trace_cli(['profile', 'start', 'cprofile', path])
+        for seq in range(5):
+            self.router.receive_packet(self.flood(seq), ('2.2.2.2', 0))
+        self.router.handle_trace_cli(['profile', 'stop'])
+        stats = pstats.Stats(path)
+        assert any(name == 'verify' for _, _, name in stats.stats)
+        os.remove(path)
+
+    def test_sampling_profiler(self):
+        path = os.path.join(tempfile.mkdtemp(), 'router.folded')
+        profiler = Profiler()
+        profiler.start(ProfileMode.SAMPLE, path, interval=0.001)
+        with self.assertRaises(RuntimeError):
+            profiler.start(ProfileMode.SAMPLE, path)
+        time.sleep(0.05)
+        assert profiler.stop() == path
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert lines and all(line.rsplit(' ', 1)[1].isdigit()
+                             for line in lines)
+        os.remove(path)
@@ -0,0 +1,68 @@
+import sim
+
+from sim.base import BBBPacket, BBBPacketType
+from sim.basic_router import BasicRouter
+from sim.verification import VerificationPipeline
+
+import time
+import unittest
+from unittest.mock import Mock
+
+class TestVerificationPipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.router2 = BasicRouter('2.2.2.2', test=True)
+
+    def setUp(self):
+        self.router1 = BasicRouter('1.1.1.1', test=True)
+        self.router1.keys['2.2.2.2'] = self.router2.packet_key.publickey()
+        self.pipeline = VerificationPipeline(self.router1, workers=2)
+
+    def tearDown(self):
+        self.pipeline.executor.shutdown()
+
+    def packet(self, seq):
+        packet = BBBPacket('2.2.2.2', '3.3.3.3', BBBPacketType.FLOOD, 'hello world', seq)
+        self.router2.sign(packet)
+        return packet
+
+    def test_verify_batch(self):
+        packets = [self.packet(seq) for seq in range(4)]
+        forged = self.packet(4)
+        forged.payload = 'forged'
+        unknown = self.packet(5)
+        unknown.src = '9.9.9.9'
+        config = BBBPacket('9.9.9.9', '1.1.1.1', BBBPacketType.MASTERCONFIG, '{}', 0)
+
+        results = self.pipeline.verify_batch(packets + [forged, unknown, config])
+        assert results == [True] * 4 + [False, False, True]
+        assert self.router1.flood_cache.stats()['accepted'] == 4
+
+    def test_sequence_numbers_in_order(self):
+        packets = [self.packet(1), self.packet(0), self.packet(2), self.packet(2)]
+        results = self.pipeline.verify_batch(packets)
+        # Same outcome as verifying one packet after the other
+        assert results == [True, True, True, False]
+
+        route_packets = []
+        for seq in [4, 3, 5, 5]:
+            packet = BBBPacket('2.2.2.2', '1.1.1.1', BBBPacketType.ROUTEUPDATE, '[]', seq)
+            self.router2.sign(packet)
+            route_packets.append(packet)
+        results = self.pipeline.verify_batch(route_packets)
+        assert results == [True, False, True, False]
+        assert self.router1.sqn_numbers['2.2.2.2'] == 5
+
+    def test_dispatch(self):
+        self.router1.handle_packet = Mock()
+        self.pipeline.start()
+        packets = [self.packet(seq) for seq in range(3)]
+        for packet in packets:
+            self.pipeline.submit(packet, ('2.2.2.2', 9999))
+
+        deadline = time.time() + 10
+        while self.router1.handle_packet.call_count < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        handled = [c[0][0] for c in self.router1.handle_packet.call_args_list]
+        assert handled == packets